@@ -0,0 +1,142 @@
+# app/ann.py
+import os
+import threading
+from typing import Optional
+import numpy as np
+from app.embeddings import EmbeddingStore, normalize
+from app.logger import logger
+
+ANN_MIN_TRAIN = int(os.getenv("ANN_MIN_TRAIN", "1024"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+ANN_RETRAIN_GROWTH = 4  # retrain once the corpus is this many times larger than at the last training
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+
+def _kmeans(vectors: np.ndarray, n_lists: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (Lloyd's on the unit sphere) returning normalised centroids."""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > n_lists * KMEANS_SAMPLE_PER_LIST:
+        sample = vectors[rng.choice(len(vectors), n_lists * KMEANS_SAMPLE_PER_LIST, replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(KMEANS_ITERATIONS):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = np.bincount(labels, minlength=n_lists) == 0
+        sums[empty] = centroids[empty]  # keep the old centroid for lists that lost every member
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file ANN index over an EmbeddingStore.
+
+    Vectors are bucketed by their nearest k-means centroid (about sqrt(N)
+    lists); a query scans only the `nprobe` closest lists, so lookups touch
+    roughly nprobe/sqrt(N) of the corpus. Below `min_train` vectors the
+    index answers by exact brute force. Centroids and per-row list
+    assignments are persisted next to the store and extended on every add.
+    """
+
+    def __init__(self, store: EmbeddingStore, nprobe: int = ANN_NPROBE, min_train: int = ANN_MIN_TRAIN):
+        self.store = store
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self._centroids_path = os.path.join(store.directory, "ivf_centroids.npy")
+        self._assignments_path = os.path.join(store.directory, "ivf_assignments.i32")
+        self._centroids = None
+        self._assignments = []
+        self._lists = []
+        self._trained_size = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    def _load(self):
+        if not os.path.exists(self._centroids_path):
+            return
+        self._centroids = np.load(self._centroids_path)
+        assignments = []
+        if os.path.exists(self._assignments_path):
+            assignments = np.fromfile(self._assignments_path, dtype=np.int32).tolist()
+        assignments = assignments[:len(self.store)]
+        self._trained_size = len(assignments)
+        self._set_assignments(assignments)
+        if len(assignments) < len(self.store):
+            self._assign(range(len(assignments), len(self.store)))
+        self._persist_assignments()
+
+    def _set_assignments(self, assignments: list):
+        self._assignments = list(assignments)
+        self._lists = [[] for _ in range(len(self._centroids))]
+        for row, list_id in enumerate(self._assignments):
+            self._lists[list_id].append(row)
+
+    def _assign(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        vectors = np.asarray(self.store.matrix()[rows], dtype=np.float32)
+        for row, list_id in zip(rows, np.argmax(vectors @ self._centroids.T, axis=1)):
+            self._assignments.append(int(list_id))
+            self._lists[int(list_id)].append(row)
+
+    def _persist_assignments(self):
+        np.asarray(self._assignments, dtype=np.int32).tofile(self._assignments_path)
+
+    def _train(self):
+        vectors = np.asarray(self.store.matrix(), dtype=np.float32)
+        n_lists = max(1, int(np.sqrt(len(vectors))))
+        logger.info(f"Training IVF index: {len(vectors)} vectors, {n_lists} lists")
+        self._centroids = _kmeans(vectors, n_lists)
+        self._set_assignments(np.argmax(vectors @ self._centroids.T, axis=1).tolist())
+        self._trained_size = len(vectors)
+        np.save(self._centroids_path, self._centroids)
+        self._persist_assignments()
+
+    def add_many(self, site_ids: list, vectors: np.ndarray):
+        with self._lock:
+            start = len(self.store)
+            self.store.add_many(site_ids, vectors)
+            if len(self.store) < self.min_train:
+                return
+            if not self.trained or len(self.store) >= self._trained_size * ANN_RETRAIN_GROWTH:
+                self._train()
+                return
+            self._assign(range(start, len(self.store)))
+            with open(self._assignments_path, "ab") as f:
+                f.write(np.asarray(self._assignments[start:], dtype=np.int32).tobytes())
+
+    def add(self, site_id: str, vector: np.ndarray):
+        self.add_many([site_id], vector)
+
+    def search(self, vector: np.ndarray, k: int = 5, exclude: Optional[str] = None) -> list:
+        """Up to `k` (site_id, cosine score) pairs, best first."""
+        query = normalize(vector)[0]
+        with self._lock:
+            matrix = self.store.matrix()
+            if len(matrix) == 0:
+                return []
+            if self.trained:
+                probe = np.argsort(-(self._centroids @ query))[:self.nprobe]
+                rows = np.fromiter((row for list_id in probe for row in self._lists[list_id]), dtype=np.int64)
+            else:
+                rows = np.arange(len(matrix))
+            if len(rows) == 0:
+                return []
+            scores = np.asarray(matrix[rows], dtype=np.float32) @ query
+        order = np.argsort(-scores)
+        results = []
+        for position in order:
+            site_id = self.store.id_at(rows[position])
+            if site_id == exclude:
+                continue
+            results.append((site_id, float(scores[position])))
+            if len(results) == k:
+                break
+        return results
@@ -0,0 +1,302 @@
+# app/backends.py
+import os
+import io
+import re
+import json
+import base64
+import random
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from types import SimpleNamespace
+from typing import AsyncIterator, Optional
+import httpx
+from dotenv import load_dotenv
+from PIL import Image
+from huggingface_hub import AsyncInferenceClient
+from app.logger import logger
+
+load_dotenv()
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "hf").lower()  # hf | openai | stub
+
+HF_TOKEN = os.getenv("HUGGINGFACEHUB_API_TOKEN")
+TEXT_MODEL = os.getenv("TEXT_MODEL", "mistralai/Mixtral-8x7B-Instruct-v0.1")
+IMAGE_MODEL = os.getenv("IMAGE_MODEL", "black-forest-labs/FLUX.1-dev")
+TEXT_TIMEOUT = float(os.getenv("TEXT_INFERENCE_TIMEOUT", "120"))
+IMAGE_TIMEOUT = float(os.getenv("IMAGE_INFERENCE_TIMEOUT", "300"))
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "http://localhost:8080/v1")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", TEXT_MODEL)
+OPENAI_IMAGE_MODEL = os.getenv("OPENAI_IMAGE_MODEL", IMAGE_MODEL)
+
+STUB_LATENCY_MS = float(os.getenv("STUB_LATENCY_MS", "200"))
+STUB_IMAGE_LATENCY_MS = float(os.getenv("STUB_IMAGE_LATENCY_MS", "1000"))
+STUB_LATENCY_SIGMA = float(os.getenv("STUB_LATENCY_SIGMA", "0.5"))
+STUB_ERROR_RATE = float(os.getenv("STUB_ERROR_RATE", "0"))
+STUB_RATE_LIMIT_RATE = float(os.getenv("STUB_RATE_LIMIT_RATE", "0"))
+STUB_SEED = int(os.getenv("STUB_SEED", "0"))
+
+
+class InferenceBackend(ABC):
+    """Provider interface behind the scheduler in app.inference.
+
+    `complete` returns the text of one chat completion and the provider's
+    token usage ({"prompt_tokens", "completion_tokens"}, or None if it did not
+    report any); `stream` yields text deltas and `image` returns a PIL image.
+    Errors carrying an HTTP status should
+    expose it as `exc.response.status_code` so retries can classify them.
+    """
+
+    name = "base"
+    text_model = ""
+    image_model = ""
+
+    @abstractmethod
+    async def complete(self, prompt: str, sampling: dict) -> tuple:
+        ...
+
+    @abstractmethod
+    def stream(self, prompt: str, sampling: dict) -> AsyncIterator[str]:
+        ...
+
+    @abstractmethod
+    async def image(self, prompt: str, params: dict) -> Image.Image:
+        ...
+
+    async def aclose(self):
+        pass
+
+
+def _usage(prompt_tokens, completion_tokens) -> Optional[dict]:
+    if prompt_tokens is None:
+        return None
+    return {"prompt_tokens": int(prompt_tokens), "completion_tokens": int(completion_tokens or 0)}
+
+
+class LoopBound:
+    """Lazily (re)creates an HTTP client (or other loop-bound object) for the running event loop."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._loop = None
+        self._client = None
+
+    def get(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._client = self._factory()
+            self._loop = loop
+        return self._client
+
+    async def aclose(self, close):
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await close(self._client)
+        self._loop = self._client = None
+
+
+class HFBackend(InferenceBackend):
+    """Hugging Face Inference API through pooled async clients."""
+
+    name = "hf"
+
+    def __init__(self, text_model: str = TEXT_MODEL, image_model: str = IMAGE_MODEL):
+        self.text_model = text_model
+        self.image_model = image_model
+        self._text = LoopBound(lambda: AsyncInferenceClient(model=text_model, token=HF_TOKEN, timeout=TEXT_TIMEOUT))
+        self._image = LoopBound(lambda: AsyncInferenceClient(model=image_model, token=HF_TOKEN, timeout=IMAGE_TIMEOUT))
+
+    async def complete(self, prompt: str, sampling: dict) -> tuple:
+        messages = [{"role": "user", "content": prompt}]
+        output = await self._text.get().chat_completion(messages=messages, **sampling)
+        usage = getattr(output, "usage", None)
+        return output.choices[0].message.content or "", _usage(
+            getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+        )
+
+    async def stream(self, prompt: str, sampling: dict) -> AsyncIterator[str]:
+        messages = [{"role": "user", "content": prompt}]
+        stream = await self._text.get().chat_completion(messages=messages, stream=True, **sampling)
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+
+    async def image(self, prompt: str, params: dict) -> Image.Image:
+        return await self._image.get().text_to_image(prompt=prompt, **params)
+
+    async def aclose(self):
+        await self._text.aclose(lambda client: client.close())
+        await self._image.aclose(lambda client: client.close())
+
+
+class OpenAICompatibleBackend(InferenceBackend):
+    """Any server speaking the OpenAI chat/images API (vLLM, llama.cpp, TGI, the stub server)."""
+
+    name = "openai"
+
+    def __init__(self, base_url: str = OPENAI_BASE_URL, api_key: str = OPENAI_API_KEY,
+                 text_model: str = OPENAI_MODEL, image_model: str = OPENAI_IMAGE_MODEL):
+        self.base_url = base_url.rstrip("/")
+        self.text_model = text_model
+        self.image_model = image_model
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self._http = LoopBound(lambda: httpx.AsyncClient(
+            base_url=self.base_url, headers=headers, timeout=httpx.Timeout(TEXT_TIMEOUT, read=IMAGE_TIMEOUT)
+        ))
+
+    def _chat_body(self, prompt: str, sampling: dict, stream: bool) -> dict:
+        return {"model": self.text_model, "messages": [{"role": "user", "content": prompt}], "stream": stream, **sampling}
+
+    async def complete(self, prompt: str, sampling: dict) -> tuple:
+        response = await self._http.get().post("/chat/completions", json=self._chat_body(prompt, sampling, False))
+        response.raise_for_status()
+        body = response.json()
+        usage = body.get("usage") or {}
+        return body["choices"][0]["message"].get("content") or "", _usage(
+            usage.get("prompt_tokens"), usage.get("completion_tokens")
+        )
+
+    async def stream(self, prompt: str, sampling: dict) -> AsyncIterator[str]:
+        body = self._chat_body(prompt, sampling, True)
+        async with self._http.get().stream("POST", "/chat/completions", json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                delta = choices[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def image(self, prompt: str, params: dict) -> Image.Image:
+        body = {
+            "model": self.image_model,
+            "prompt": prompt,
+            "size": f"{params.get('width', 512)}x{params.get('height', 512)}",
+            "response_format": "b64_json",
+        }
+        response = await self._http.get().post("/images/generations", json=body)
+        response.raise_for_status()
+        data = base64.b64decode(response.json()["data"][0]["b64_json"])
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        return image
+
+    async def aclose(self):
+        await self._http.aclose(lambda client: client.aclose())
+
+
+class StubHTTPError(Exception):
+    """Simulated upstream failure, shaped like an HTTP error for retry classification."""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Stub backend simulated HTTP {status_code}")
+        self.response = SimpleNamespace(status_code=status_code, headers={})
+
+
+WORDS = (
+    "data model system practical example insight method result approach design pattern "
+    "performance quality process feature benefit context detail workflow principle guide"
+).split()
+
+
+class StubBackend(InferenceBackend):
+    """Offline backend for load tests and benchmarks.
+
+    Output is a pure function of the prompt and sampling parameters: plan
+    JSON for planning prompts, `###`-sectioned text for writing prompts and a
+    solid-colour image. Latency is log-normal around `latency_ms`, and calls
+    fail with 503 / 429 at `error_rate` / `rate_limit_rate`; those draws come
+    from a generator seeded with `seed`.
+    """
+
+    name = "stub"
+    text_model = "stub/text"
+    image_model = "stub/image"
+
+    def __init__(self, latency_ms: float = STUB_LATENCY_MS, image_latency_ms: float = STUB_IMAGE_LATENCY_MS,
+                 latency_sigma: float = STUB_LATENCY_SIGMA, error_rate: float = STUB_ERROR_RATE,
+                 rate_limit_rate: float = STUB_RATE_LIMIT_RATE, seed: int = STUB_SEED):
+        self.latency_ms = latency_ms
+        self.image_latency_ms = image_latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(seed)
+
+    async def _simulate(self, median_ms: float):
+        delay = median_ms / 1000 * self._rng.lognormvariate(0, self.latency_sigma) if median_ms > 0 else 0
+        roll = self._rng.random()
+        await asyncio.sleep(delay)
+        if roll < self.rate_limit_rate:
+            raise StubHTTPError(429)
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise StubHTTPError(503)
+
+    @staticmethod
+    def _content_rng(*parts) -> random.Random:
+        digest = hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    @staticmethod
+    def _paragraph(rng: random.Random, words: int) -> str:
+        text = " ".join(rng.choice(WORDS) for _ in range(max(5, words)))
+        return text[0].upper() + text[1:] + "."
+
+    def render(self, prompt: str, sampling: dict) -> str:
+        rng = self._content_rng(prompt, sampling)
+        words = min(120, int(sampling.get("max_tokens", 512) * 0.75))
+
+        if "JSON structure" in prompt:
+            topic = re.search(r'about: "(.*?)"', prompt)
+            topic = topic.group(1) if topic else "the topic"
+            order = re.search(r"headings in EXACT order: (.*)", prompt)
+            headings = [h.strip() for h in order.group(1).split(",")] if order else ["Introduction", "Summary"]
+            return json.dumps({
+                "title": f"{topic}: {' '.join(rng.choice(WORDS) for _ in range(3)).title()} {rng.randint(1, 999)}",
+                "meta_description": f"A practical look at {topic}. " + self._paragraph(rng, 10),
+                "image_prompt": f"Illustration of {topic}, {rng.choice(WORDS)} style",
+                "sections": [{"heading": h, "brief": self._paragraph(rng, 8)} for h in headings],
+            })
+        if 'Write ONLY the section "' in prompt:
+            return self._paragraph(rng, words)
+        headings = re.findall(r"Section \d+: ### (.+)", prompt)
+        if headings:
+            per_section = max(10, words // len(headings))
+            return "\n".join(f"### {h.strip()}\n{self._paragraph(rng, per_section)}\n" for h in headings)
+        return self._paragraph(rng, words)
+
+    async def complete(self, prompt: str, sampling: dict) -> tuple:
+        await self._simulate(self.latency_ms)
+        text = self.render(prompt, sampling)
+        return text, self.usage(prompt, text)
+
+    @staticmethod
+    def usage(prompt: str, text: str) -> dict:
+        """Reported like a real provider's, from the ~4 characters per token estimate."""
+        return {"prompt_tokens": max(1, len(prompt) // 4), "completion_tokens": max(1, len(text) // 4)}
+
+    async def stream(self, prompt: str, sampling: dict) -> AsyncIterator[str]:
+        await self._simulate(self.latency_ms)
+        text = self.render(prompt, sampling)
+        for start in range(0, len(text), 16):
+            yield text[start:start + 16]
+            await asyncio.sleep(0)
+
+    async def image(self, prompt: str, params: dict) -> Image.Image:
+        await self._simulate(self.image_latency_ms)
+        rng = self._content_rng(prompt)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        return Image.new("RGB", (params.get("width", 512), params.get("height", 512)), color)
+
+
+def make_backend(kind: str = INFERENCE_BACKEND) -> InferenceBackend:
+    backends = {"hf": HFBackend, "openai": OpenAICompatibleBackend, "stub": StubBackend}
+    if kind not in backends:
+        raise ValueError(f"Unknown INFERENCE_BACKEND '{kind}' (expected one of: {', '.join(backends)})")
+    logger.info(f"Inference backend: {kind}")
+    return backends[kind]()
@@ -0,0 +1,28 @@
+# app/db.py
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+
+def make_engine(url: str) -> Engine:
+    """Create a SQLAlchemy engine; SQLite databases get WAL mode for concurrent readers."""
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_pre_ping=True)
+
+    db_path = url.split("///", 1)[1] if "///" in url else ""
+    if not db_path or db_path == ":memory:":
+        # One shared connection, otherwise every checkout sees an empty database
+        return create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
@@ -0,0 +1,99 @@
+# app/embeddings.py
+import os
+import threading
+import numpy as np
+from app.logger import logger
+
+EMBEDDING_DIM = 384  # all-MiniLM-L6-v2
+DTYPE = np.float16
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingStore:
+    """Append-only on-disk matrix of site embeddings, addressed by site_id.
+
+    Rows are float16 in `vectors.f16` and read through a memory map; ids go to
+    `ids.txt`, one per line in row order. Vectors are L2-normalised on insert
+    so cosine similarity is a plain dot product.
+    """
+
+    def __init__(self, directory: str, dim: int = EMBEDDING_DIM):
+        self.directory = directory
+        self.dim = dim
+        self._vectors_path = os.path.join(directory, "vectors.f16")
+        self._ids_path = os.path.join(directory, "ids.txt")
+        self._row_bytes = dim * np.dtype(DTYPE).itemsize
+        self._ids = []
+        self._rows = {}
+        self._mmap = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self._ids_path):
+            with open(self._ids_path, "r", encoding="utf-8") as f:
+                self._ids = [line.strip() for line in f if line.strip()]
+        stored_rows = os.path.getsize(self._vectors_path) // self._row_bytes if os.path.exists(self._vectors_path) else 0
+        count = min(len(self._ids), stored_rows)
+        if count != len(self._ids) or count != stored_rows:
+            # An interrupted append left the two files out of step; keep the common prefix
+            logger.warning(f"Embedding store {self.directory}: truncating to {count} consistent rows")
+            self._ids = self._ids[:count]
+            with open(self._ids_path, "w", encoding="utf-8") as f:
+                f.writelines(f"{site_id}\n" for site_id in self._ids)
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(count * self._row_bytes)
+        self._rows = {site_id: row for row, site_id in enumerate(self._ids)}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, site_id: str) -> bool:
+        return site_id in self._rows
+
+    @property
+    def ids(self) -> list:
+        return list(self._ids)
+
+    def id_at(self, row: int) -> str:
+        return self._ids[row]
+
+    def add_many(self, site_ids: list, vectors: np.ndarray):
+        vectors = normalize(vectors)
+        if vectors.shape != (len(site_ids), self.dim):
+            raise ValueError(f"Expected {len(site_ids)} vectors of dim {self.dim}, got {vectors.shape}")
+        with self._lock:
+            fresh = [i for i, site_id in enumerate(site_ids) if site_id not in self._rows]
+            if not fresh:
+                return
+            with open(self._vectors_path, "ab") as f:
+                f.write(vectors[fresh].astype(DTYPE).tobytes())
+            with open(self._ids_path, "a", encoding="utf-8") as f:
+                f.writelines(f"{site_ids[i]}\n" for i in fresh)
+            for i in fresh:
+                self._rows[site_ids[i]] = len(self._ids)
+                self._ids.append(site_ids[i])
+            self._mmap = None
+
+    def add(self, site_id: str, vector: np.ndarray):
+        self.add_many([site_id], vector)
+
+    def matrix(self) -> np.ndarray:
+        """Read-only float16 view of every stored row."""
+        with self._lock:
+            if not self._ids:
+                return np.zeros((0, self.dim), dtype=DTYPE)
+            if self._mmap is None or len(self._mmap) != len(self._ids):
+                self._mmap = np.memmap(self._vectors_path, dtype=DTYPE, mode="r", shape=(len(self._ids), self.dim))
+            return self._mmap
+
+    def get_many(self, site_ids: list) -> np.ndarray:
+        """float32 rows for `site_ids`; every id must already be stored."""
+        rows = [self._rows[site_id] for site_id in site_ids]
+        return np.asarray(self.matrix()[rows], dtype=np.float32)
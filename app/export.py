@@ -0,0 +1,288 @@
+# app/export.py
+"""Static export: every saved page as a self-contained bundle for a CDN or any file server.
+
+    <EXPORT_DIR>/index.html, sitemap.xml          all topic/style groups (sitemap index)
+    <EXPORT_DIR>/<topic>/<style>/index.html       the group's newest pages
+    <EXPORT_DIR>/<topic>/<style>/page-<n>.html    older pages, EXPORT_SHARD_SIZE per listing
+    <EXPORT_DIR>/<topic>/<style>/sitemap-<n>.xml  one sitemap per listing
+    <EXPORT_DIR>/<topic>/<style>/site_<id>.html
+    <EXPORT_DIR>/static/css/<hash>.css            stylesheets lifted out of the pages
+    <EXPORT_DIR>/static/img/img_<hash>_<w>.<ext>  image variants
+
+<topic> and <style> are slugs with a short hash of the original text, so
+topics that slugify alike ("C", "C++") stay apart.
+
+Pages are added as they are saved. A group's pages are kept in shards of
+EXPORT_SHARD_SIZE: a new page rewrites only the group's open shard (its
+manifest, sitemap and index.html) and the top-level index and sitemap, so
+the cost of an add does not grow with the group. When the open shard fills
+up it is archived as page-<n>.html. `python -m app.export` backfills pages
+generated before the export was enabled.
+"""
+import os
+import re
+import json
+import asyncio
+import hashlib
+import argparse
+import threading
+from urllib.parse import quote
+from typing import Optional
+from xml.sax.saxutils import escape
+from app.images import media_type
+from app.storage import Storage, make_storage, site_key
+from app.rendering import env
+from app.logger import logger
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "./export")
+STATIC_EXPORT = os.getenv("STATIC_EXPORT", "false").lower() in ("1", "true", "yes")
+# Sitemaps need absolute URLs: where the bundle will be served from
+EXPORT_BASE_URL = os.getenv("EXPORT_BASE_URL", "http://localhost:8080").rstrip("/")
+# Pages per listing and per group sitemap; sitemaps hold at most 50,000 URLs, one is the listing itself
+EXPORT_SHARD_SIZE = int(os.getenv("EXPORT_SHARD_SIZE", "1000"))
+SITEMAP_MAX_URLS = 50_000
+
+INDEX_TEMPLATE = "export_index.html"
+
+_STYLE_BLOCK = re.compile(r"<style\b[^>]*>(.*?)</style>", re.DOTALL | re.IGNORECASE)
+_IMAGE_URL = re.compile(r"/image/([\w.-]+)")
+_NOT_SLUG = re.compile(r"[^\w]+")
+
+
+def slugify(text: str, max_length: int = 60) -> str:
+    slug = _NOT_SLUG.sub("-", text.lower()).replace("_", "-").strip("-")
+    return slug[:max_length].strip("-") or "untitled"
+
+
+def group_key(text: str) -> str:
+    """Directory name for a topic or style: readable slug plus a hash of the exact text."""
+    return f"{slugify(text)}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _write_atomic(path: str, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data.encode("utf-8") if isinstance(data, str) else data)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+class StaticExporter:
+    """Maintains the export bundle incrementally, one batch of saved pages at a time."""
+
+    def __init__(self, root: str = EXPORT_DIR, storage: Optional[Storage] = None, base_url: str = EXPORT_BASE_URL,
+                 shard_size: int = EXPORT_SHARD_SIZE):
+        self.root = root
+        self.storage = storage or make_storage()
+        self.base_url = base_url.rstrip("/")
+        self.shard_size = max(1, min(shard_size, SITEMAP_MAX_URLS - 1))
+        self._lock = threading.Lock()
+
+    def group_of(self, record: dict) -> str:
+        return f"{group_key(record['topic'])}/{group_key(record['style'])}"
+
+    def page_path(self, record: dict) -> str:
+        """Path of the exported page, relative to the bundle root."""
+        return f"{self.group_of(record)}/site_{record['site_id']}.html"
+
+    async def add(self, record: dict, html: str) -> str:
+        return (await self.add_many([(record, html)]))[0]
+
+    async def add_many(self, pages: list) -> list:
+        """Export (record, html) pairs; each affected group index is rewritten once."""
+        for directory in ("css", "img"):
+            os.makedirs(os.path.join(self.root, "static", directory), exist_ok=True)
+        # Pages sit two levels below the root, next to their group index
+        pages = [(record, await self._bundle_images(html, "../../")) for record, html in pages]
+        return await asyncio.to_thread(self._write_pages, pages)
+
+    def _write_pages(self, pages: list) -> list:
+        added = {}
+        paths = []
+        for record, html in pages:
+            path = self.page_path(record)
+            target = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # A re-exported page (--rebuild) is already listed in its group
+            listed = os.path.exists(target)
+            _write_atomic(target, self._bundle_css(html, "../../"))
+            if not listed:
+                added.setdefault(self.group_of(record), []).append(record)
+            paths.append(path)
+
+        with self._lock:
+            groups = _read_json(os.path.join(self.root, "groups.json"), {})
+            # Groups from the unsharded layout (plain slug directories) are left out of the indexes
+            groups = {group: info for group, info in groups.items() if "shards" in info}
+            for group, records in added.items():
+                groups[group] = self._update_group(group, records, groups.get(group))
+            _write_atomic(os.path.join(self.root, "groups.json"), json.dumps(groups, ensure_ascii=False))
+            self._write_root(groups)
+        logger.info(f"Exported {len(paths)} page(s) to {self.root}")
+        return paths
+
+    def _update_group(self, group: str, records: list, info: Optional[dict]) -> dict:
+        """Append `records` to the group's open shard, archiving shards as they fill up."""
+        directory = os.path.join(self.root, group)
+        info = info or {"topic": records[0]["topic"], "style": records[0]["style"],
+                        "pages": 0, "shards": 1, "updated_at": ""}
+        shard = info["shards"]
+        entries = _read_json(os.path.join(directory, f"pages-{shard}.json"), [])
+        for record in records:
+            if len(entries) >= self.shard_size:
+                self._write_shard(directory, info, shard, entries, archived=True)
+                shard, entries = shard + 1, []
+            entries.append({
+                "site_id": record["site_id"],
+                "title": record.get("title") or "Untitled",
+                "meta_description": record.get("meta_description"),
+                "created_at": record.get("created_at") or "",
+            })
+        info = {**info, "pages": info["pages"] + len(records), "shards": shard,
+                "updated_at": max([info["updated_at"], *(entry["created_at"] for entry in entries)])}
+        self._write_shard(directory, info, shard, entries, archived=False)
+        return info
+
+    def _write_shard(self, directory: str, info: dict, shard: int, entries: list, archived: bool):
+        """Manifest, listing and sitemap of one shard; the open shard's listing is the group index."""
+        _write_atomic(os.path.join(directory, f"pages-{shard}.json"), json.dumps(entries, ensure_ascii=False))
+        group = os.path.relpath(directory, self.root).replace(os.sep, "/")
+        listing = f"page-{shard}.html" if archived else "index.html"
+        newest = sorted(entries, key=lambda entry: entry["created_at"], reverse=True)
+        items = [
+            {"href": f"site_{entry['site_id']}.html", "title": entry["title"],
+             "description": entry["meta_description"], "note": entry["created_at"]}
+            for entry in newest
+        ]
+        # The group index links every archived listing; archives link back to the index
+        shards = [{"href": "index.html", "label": "Newest"}] if archived else [
+            {"href": f"page-{n}.html", "label": f"Older ({n})"} for n in range(info["shards"] - 1, 0, -1)
+        ]
+        self._write_index(directory, f"{info['topic']} · {info['style']}", items, prefix="../../",
+                          parent="../../index.html", filename=listing, sitemap=f"sitemap-{shard}.xml", shards=shards)
+        urls = [(f"{group}/{listing}", newest[0]["created_at"] if newest else None)]
+        urls += [(f"{group}/site_{entry['site_id']}.html", entry["created_at"]) for entry in entries]
+        _write_atomic(os.path.join(directory, f"sitemap-{shard}.xml"), self._sitemap("urlset", "url", urls))
+
+    def _write_root(self, groups: dict):
+        ordered = sorted(groups.items(), key=lambda item: item[1]["updated_at"], reverse=True)
+        items = [
+            {"href": f"{group}/index.html", "title": info["topic"], "description": None,
+             "note": f"{info['style']} · {info['pages']} page(s)"}
+            for group, info in ordered
+        ]
+        self._write_index(self.root, "Generated sites", items, prefix="")
+        # Only the open shard's sitemap still changes; archived ones carry no lastmod
+        sitemaps = [
+            (f"{group}/sitemap-{n}.xml", info["updated_at"] if n == info["shards"] else None)
+            for group, info in ordered for n in range(info["shards"], 0, -1)
+        ]
+        for number, start in enumerate(range(0, max(len(sitemaps), 1), SITEMAP_MAX_URLS), start=1):
+            name = "sitemap.xml" if number == 1 else f"sitemap-{number}.xml"
+            chunk = sitemaps[start:start + SITEMAP_MAX_URLS]
+            _write_atomic(os.path.join(self.root, name), self._sitemap("sitemapindex", "sitemap", chunk))
+
+    def _write_index(self, directory: str, title: str, items: list, prefix: str, parent: str = None,
+                     filename: str = "index.html", sitemap: str = "sitemap.xml", shards: Optional[list] = None):
+        html = env.get_template(INDEX_TEMPLATE).render(
+            title=title, items=items, parent=parent, sitemap=sitemap, shards=shards or []
+        )
+        _write_atomic(os.path.join(directory, filename), self._bundle_css(html, prefix))
+
+    def _sitemap(self, root_tag: str, entry_tag: str, entries: list) -> str:
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+                 f'<{root_tag} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+        for path, lastmod in entries:
+            loc = escape(f"{self.base_url}/{quote(path)}")
+            modified = f"<lastmod>{escape(lastmod)}</lastmod>" if lastmod else ""
+            lines.append(f"<{entry_tag}><loc>{loc}</loc>{modified}</{entry_tag}>")
+        lines.append(f"</{root_tag}>")
+        return "\n".join(lines) + "\n"
+
+    def _bundle_css(self, html: str, prefix: str) -> str:
+        """Move inline <style> blocks into content-addressed files shared by every page that uses them."""
+        def lift(match):
+            css = match.group(1).strip()
+            if not css:
+                return ""
+            name = f"{hashlib.sha256(css.encode('utf-8')).hexdigest()[:16]}.css"
+            path = os.path.join(self.root, "static", "css", name)
+            if not os.path.exists(path):
+                _write_atomic(path, css)
+            return f'<link rel="stylesheet" href="{prefix}static/css/{name}">'
+
+        return _STYLE_BLOCK.sub(lift, html)
+
+    async def _bundle_images(self, html: str, prefix: str) -> str:
+        """Point /image/ URLs at copies under static/img, fetched from storage once per image."""
+        directory = os.path.join(self.root, "static", "img")
+        names = {name for name in _IMAGE_URL.findall(html) if media_type(name)}
+        wanted = [name for name in names if not os.path.exists(os.path.join(directory, name))]
+        for name, blob in zip(wanted, await asyncio.gather(*(self.storage.get(name) for name in wanted))):
+            if blob is None:
+                logger.warning(f"Export: image not found, link left as is: {name}")
+                names.discard(name)
+            else:
+                await asyncio.to_thread(_write_atomic, os.path.join(directory, name), blob.data)
+
+        def relink(match):
+            return f"{prefix}static/img/{match.group(1)}" if match.group(1) in names else match.group(0)
+
+        return _IMAGE_URL.sub(relink, html)
+
+
+async def backfill(exporter: StaticExporter, registry, rebuild: bool = False, batch_size: int = 200) -> int:
+    """Export registry pages missing from the bundle (all of them with `rebuild`)."""
+    exported = 0
+    offset = 0
+    while True:
+        records = await asyncio.to_thread(registry.list_sites, offset, batch_size)
+        if not records:
+            return exported
+        offset += len(records)
+        records = [
+            record for record in reversed(records)  # oldest first within the batch
+            if rebuild or not os.path.exists(os.path.join(exporter.root, exporter.page_path(record)))
+        ]
+        blobs = await asyncio.gather(*(exporter.storage.get(site_key(record["site_id"])) for record in records))
+        batch = []
+        for record, blob in zip(records, blobs):
+            if blob is None:
+                logger.warning(f"Export: skipping {record['site_id']} (page not found in storage)")
+            else:
+                batch.append((record, blob.data.decode("utf-8")))
+        if batch:
+            exported += len(await exporter.add_many(batch))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export generated sites as a static bundle")
+    parser.add_argument("--output", default=EXPORT_DIR, help="Bundle directory")
+    parser.add_argument("--base-url", default=EXPORT_BASE_URL, help="Public URL the bundle is served from")
+    parser.add_argument("--rebuild", action="store_true", help="Re-export pages already in the bundle")
+    args = parser.parse_args(argv)
+
+    from app.generator import REGISTRY_URL
+    from app.registry import SiteRegistry
+
+    exporter = StaticExporter(args.output, base_url=args.base_url)
+
+    async def run():
+        try:
+            return await backfill(exporter, SiteRegistry(REGISTRY_URL), rebuild=args.rebuild)
+        finally:
+            await exporter.storage.aclose()
+
+    count = asyncio.run(run())
+    print(f"Exported {count} page(s) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,166 +1,581 @@
 # app/generator.py
 import os
 import json
+import hashlib
 import re
 import random
-from typing import Optional
+import asyncio
+from functools import lru_cache
+import numpy as np
+from typing import Callable, Optional
 from datetime import datetime
-from jinja2 import Environment, FileSystemLoader
-from sentence_transformers import SentenceTransformer, util
-from app.prompts import planning_prompt, writing_prompt
-from app.utils import make_uuid, timestamp_now, count_tokens, get_site_content_from_html
-from app.inference import inference, inference_image, SITES_DIR
+from app.prompts import planning_prompt, writing_prompt, section_context, section_prompt
+from app.utils import (
+    make_uuid, timestamp_now, count_tokens, count_tokens_batch, get_site_content_from_html, LazyResource
+)
+from app.backends import LoopBound
+from app.inference import async_inference, async_inference_stream, async_inference_image, SITES_DIR
+from app.registry import SiteRegistry
+from app.serving import compressed_variants
+from app.storage import Storage, make_storage, site_key
+from app.images import save_image, image_sources, IMAGE_SIZES
+from app.rendering import template_for
+from app.embeddings import EmbeddingStore
+from app.ann import IVFIndex
+from app.export import StaticExporter, STATIC_EXPORT
+from app import metrics
 from app.logger import logger
 
-similarity_model = SentenceTransformer('all-MiniLM-L6-v2')
-logger.info("SentenceTransformer model loaded for similarity calculation.")
+SIMILARITY_MODEL_NAME = "all-MiniLM-L6-v2"
+
+def _load_similarity_model():
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(SIMILARITY_MODEL_NAME)
+    logger.info("SentenceTransformer model loaded for similarity calculation.")
+    return model
+
+similarity_model = LazyResource("similarity_model", _load_similarity_model)
+
+def _embed_texts(texts: list) -> np.ndarray:
+    """Batch-encode texts into L2-normalised embeddings."""
+    return similarity_model.get().encode(
+        texts, batch_size=32, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+    )
+
+@lru_cache(maxsize=4096)
+def _embed_title(title: str) -> np.ndarray:
+    return _embed_texts([title])[0]
+
+MAX_CONCURRENT_PAGES = int(os.getenv("MAX_CONCURRENT_PAGES", "4"))
+REGISTRY_URL = os.getenv("REGISTRY_URL", f"sqlite:///{os.path.join(SITES_DIR, 'registry.db')}")
+EMBEDDINGS_DIR = os.getenv("EMBEDDINGS_DIR", os.path.join(SITES_DIR, "embeddings"))
+
+# What to do when a new page is a near-duplicate of any page ever generated:
+# off | flag (save and mark it) | reject (drop it) | regenerate (re-plan, then flag)
+DUPLICATE_POLICY = os.getenv("DUPLICATE_POLICY", "flag").lower()
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.92"))
+DUPLICATE_MAX_ATTEMPTS = int(os.getenv("DUPLICATE_MAX_ATTEMPTS", "3"))
+
+# Titles closer than this to one already taken (in the batch or ever) trigger a re-plan
+TITLE_SIMILARITY_THRESHOLD = float(os.getenv("TITLE_SIMILARITY_THRESHOLD", "0.9"))
+TITLE_MAX_REPLANS = int(os.getenv("TITLE_MAX_REPLANS", "2"))
+TITLE_PROMPT_LIMIT = int(os.getenv("TITLE_PROMPT_LIMIT", "5"))  # titles named in a re-plan prompt
+
+# How long a page waits for its illustration (counted from the plan) before shipping without one
+PAGE_IMAGE_TIMEOUT = float(os.getenv("PAGE_IMAGE_TIMEOUT", "180"))
+
+# Floor for the per-section budget in "parallel" writing mode (max_tokens is split across sections)
+SECTION_MIN_TOKENS = int(os.getenv("SECTION_MIN_TOKENS", "300"))
+
+# Progress hook: emit(event_name, payload). Events: plan_parsed, image_ready,
+# section_written, duplicate_detected, page_saved, page_rejected, similarity_computed.
+EventCallback = Callable[[str, dict], None]
+
+def _no_emit(event: str, data: dict) -> None:
+    pass
+
+def _reported_prompt_tokens(response) -> Optional[int]:
+    usage = response.get("usage") if isinstance(response, dict) else None
+    return usage.get("prompt_tokens") if usage else None
+
+def _sampling_rng(use_cache: bool, *request) -> random.Random:
+    """Where a page's temperature is drawn from.
+
+    Cacheable pages draw from a generator seeded with the request and the
+    page's position, so repeating a request reuses its cached responses;
+    otherwise (retries, use_cache off) every draw is fresh.
+    """
+    if not use_cache:
+        return random.Random()
+    digest = hashlib.sha256(json.dumps(request, default=str).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+async def _prompt_tokens(response, prompt: str) -> int:
+    """Prompt tokens as reported by the provider; counted locally only when it did not say.
+
+    Counting runs in a thread: the first count loads the tokenizer, which may
+    mean a download (or a timeout when offline).
+    """
+    reported = _reported_prompt_tokens(response)
+    return reported if reported is not None else await asyncio.to_thread(count_tokens, prompt)
+
+
+class DuplicatePageError(Exception):
+    """A generated page was too close to an existing one under the `reject` policy."""
+
+    def __init__(self, title: str, duplicate_of: str, score: float):
+        super().__init__(f"'{title}' duplicates site {duplicate_of} (similarity {score:.3f})")
+        self.title = title
+        self.duplicate_of = duplicate_of
+        self.score = score
+
+
+class SectionExtractor:
+    """Match `###`-separated sections to the planned headings as text arrives.
+
+    Only the text after the last `###` marker is buffered, so completed
+    sections can be handed out before the whole completion has been received.
+    """
+
+    def __init__(self, sections_data: list):
+        self.sections_data = sections_data
+        self._contents = [None] * len(sections_data)
+        self._buffer = ""
+        self._seen_marker = False
+
+    def feed(self, chunk: str) -> list:
+        """Consume more text; return positions of sections completed by it."""
+        self._buffer += chunk
+        completed = []
+        while (idx := self._buffer.find("###")) != -1:
+            part, self._buffer = self._buffer[:idx], self._buffer[idx + 3:]
+            if self._seen_marker:
+                completed.extend(self._match(part))
+            self._seen_marker = True
+        return completed
+
+    def close(self) -> list:
+        """Flush the final part; missing sections fall back to their brief."""
+        completed = self._match(self._buffer) if self._seen_marker else []
+        self._buffer = ""
+        for position, s in enumerate(self.sections_data):
+            if self._contents[position] is None:
+                self._contents[position] = ""
+            if not self._contents[position]:
+                heading = s.get("heading", "")
+                self._contents[position] = s.get("brief", f"Information about {heading}")
+                logger.warning(f"No content found for section '{heading}', using brief")
+                metrics.fallback_sections.inc()
+                if position not in completed:
+                    completed.append(position)
+        return completed
+
+    def section(self, position: int) -> dict:
+        heading = self.sections_data[position].get("heading", "")
+        return {"heading": heading, "content": ' '.join((self._contents[position] or "").split())}
+
+    def sections(self) -> list:
+        return [self.section(position) for position in range(len(self.sections_data))]
+
+    def _match(self, part: str) -> list:
+        """Assign a finished part to every unresolved section whose heading it starts with."""
+        part_stripped = part.strip()
+        matched = []
+        for position, s in enumerate(self.sections_data):
+            if self._contents[position] is not None:
+                continue
+            heading = s.get("heading", "")
+            if part_stripped.startswith(heading + "\n"):
+                self._contents[position] = part_stripped[len(heading) + 1:].strip()
+            elif part_stripped.startswith(heading):
+                self._contents[position] = part_stripped[len(heading):].lstrip()
+            else:
+                continue
+            if self._contents[position]:
+                matched.append(position)
+        return matched
 
-env = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "templates")))
 
 class SiteGenerator:
-    def __init__(self):
-        self.logs = []
-        logger.info("SiteGenerator initialized")
+    def __init__(self, max_concurrency: int = MAX_CONCURRENT_PAGES, registry: Optional[SiteRegistry] = None,
+                 embeddings: Optional[EmbeddingStore] = None, exporter: Optional[StaticExporter] = None,
+                 storage: Optional[Storage] = None):
+        self.registry = registry or SiteRegistry(REGISTRY_URL)
+        self.storage = storage or make_storage()
+        self.exporter = exporter or (StaticExporter(storage=self.storage) if STATIC_EXPORT else None)
+        self.embeddings = embeddings if embeddings is not None else EmbeddingStore(EMBEDDINGS_DIR)
+        self.index = IVFIndex(self.embeddings)
+        self.title_index = IVFIndex(EmbeddingStore(os.path.join(self.embeddings.directory, "titles"), dim=self.embeddings.dim))
+        self.max_concurrency = max(1, max_concurrency)
+        # A semaphore binds to the loop it first blocks on: one per loop, so the
+        # generator can be reused across asyncio.run calls
+        self._global_slots = LoopBound(lambda: asyncio.Semaphore(self.max_concurrency))
+        logger.info(f"SiteGenerator initialized (max concurrency: {self.max_concurrency})")
 
-    async def generate_sites(self, req):
+    async def generate_sites(self, req, emit: Optional[EventCallback] = None):
+        """Generate `req.pages_count` pages, reporting progress through `emit` if given."""
+        emit = emit or _no_emit
         logger.info(f"Starting generation: {req.pages_count} pages about '{req.topic}' in {req.style} style")
         logger.info(f"Randomize temperature: {req.randomize_temperature}")
         
-        results = []
+        concurrency = min(req.concurrency or self.max_concurrency, self.max_concurrency)
+        logger.info(f"Page concurrency: {concurrency}")
+        request_slots = asyncio.Semaphore(concurrency)
+
+        results = [None] * req.pages_count
         batch_titles = []
+        rejected = []
 
-        for i in range(req.pages_count):
-            logger.info(f"Generating page {i+1}/{req.pages_count}")
-            item = await self.generate_one_site(
-                req.topic, 
-                req.style, 
-                req.temperature, 
-                req.top_p, 
-                req.max_tokens,
-                req.generate_image,
-                req.randomize_temperature,
-                req.temperature_min,
-                req.temperature_max,
-                existing_titles=batch_titles
-            )
-            results.append(item)
-            if item.get("title"):
-                batch_titles.append(item["title"])
+        async def generate_page(index: int):
+            def page_emit(event: str, data: dict):
+                emit(event, {"index": index, **data})
+
+            async with request_slots, self._global_slots.get():
+                logger.info(f"Generating page {index+1}/{req.pages_count}")
+                try:
+                    with metrics.generations_in_flight.track_inprogress():
+                        item = await self.generate_one_site(
+                            req.topic,
+                            req.style,
+                            req.temperature,
+                            req.top_p,
+                            req.max_tokens,
+                            req.generate_image,
+                            req.randomize_temperature,
+                            req.temperature_min,
+                            req.temperature_max,
+                            existing_titles=batch_titles,
+                            writing_mode=req.writing_mode,
+                            use_cache=req.use_cache,
+                            emit=page_emit,
+                            page_index=index
+                        )
+                except DuplicatePageError as e:
+                    logger.warning(f"Page {index+1} rejected: {e}")
+                    metrics.pages.labels("rejected").inc()
+                    details = {"title": e.title, "duplicate_of": e.duplicate_of, "score": round(e.score, 4)}
+                    rejected.append({"index": index, **details})
+                    page_emit("page_rejected", details)
+                    return
+            results[index] = item
+
+        tasks = [asyncio.create_task(generate_page(i)) for i in range(req.pages_count)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # A failed page fails the batch: stop the others rather than pay for pages nobody gets
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        results = [item for item in results if item is not None]
                 
         similarity_matrix = None
         if len(results) > 1:
             logger.info("Calculating semantic similarity for generated sites...")
-            similarity_matrix = self._calculate_similarity(results)
-            logger.info("Similarity calculation complete.")
+            try:
+                with metrics.stage_timer("similarity"):
+                    # Pages without an embedding are encoded from their stored HTML
+                    missing = [record for record in results if record["site_id"] not in self.embeddings]
+                    blobs = await asyncio.gather(*(self.storage.get(site_key(record["site_id"])) for record in missing))
+                    pages = {record["site_id"]: blob.data.decode("utf-8") for record, blob in zip(missing, blobs) if blob}
+                    similarity_matrix = await asyncio.to_thread(
+                        self._calculate_similarity, results, req.similarity_mode,
+                        req.similarity_top_k, req.similarity_threshold, pages
+                    )
+            except Exception as e:
+                # Similarity is a report on the batch, not part of it; never fail the pages over it
+                logger.warning(f"Similarity calculation failed: {e}")
+            else:
+                logger.info("Similarity calculation complete.")
+                emit("similarity_computed", {"similarity_matrix": similarity_matrix})
         
-        self.logs.append({
-            "topic": req.topic, 
-            "count": req.pages_count, 
-            "style": req.style,
-            "time": timestamp_now()
-        })
+        await asyncio.to_thread(
+            self.registry.record_request, req.topic, req.style, req.pages_count, timestamp_now()
+        )
         logger.info(f"Generation completed: {len(results)} pages created")
-        return {"sites": results, "similarity_matrix": similarity_matrix}
+        return {"sites": results, "similarity_matrix": similarity_matrix, "rejected": sorted(rejected, key=lambda r: r["index"])}
     
-    def _calculate_similarity(self, site_records: list) -> dict:
-        """Calculate semantic similarity matrix for generated sites."""
-        contents = []
-        valid_records = []
-
-        for record in site_records:
-            file_path = record.get("file_path")
-            if file_path and os.path.exists(file_path):
-                with open(file_path, "r", encoding="utf-8") as f:
-                    html_content = f.read()
-                
-                text_content = get_site_content_from_html(html_content)
-                if text_content:
-                    contents.append(text_content)
-                    valid_records.append(record)
+    def _calculate_similarity(self, site_records: list, mode: str = "matrix",
+                              top_k: int = 3, threshold: float = 0.8, pages: Optional[dict] = None) -> Optional[dict]:
+        """Similarity between generated sites from their stored embeddings.
 
-        if len(contents) < 2:
+        mode "matrix" returns the full n×n score matrix, "top_k" the `top_k`
+        nearest neighbours of every site and "threshold" only the pairs scoring
+        at least `threshold`. Sites saved without an embedding are encoded
+        from their HTML (`pages`: site_id -> html) in one batch and added to the store.
+        """
+        records = [record for record in site_records if record and record.get("site_id")]
+        missing = [record for record in records if record["site_id"] not in self.embeddings]
+        if missing:
+            texts, found = [], []
+            for record in missing:
+                html = (pages or {}).get(record["site_id"])
+                if html:
+                    text_content = get_site_content_from_html(html)
+                    if text_content:
+                        texts.append(text_content)
+                        found.append(record["site_id"])
+            if texts:
+                self.index.add_many(found, _embed_texts(texts))
+            records = [record for record in records if record["site_id"] in self.embeddings]
+
+        if len(records) < 2:
             return None
 
-        embeddings = similarity_model.encode(contents, convert_to_tensor=True)
-        cosine_scores = util.cos_sim(embeddings, embeddings)
-        
-        return {
-            "titles": [rec.get("title", "Untitled") for rec in valid_records],
-            "scores": cosine_scores.cpu().numpy().tolist()
-        }
+        vectors = self.embeddings.get_many([record["site_id"] for record in records])
+        scores = vectors @ vectors.T
+        titles = [record.get("title", "Untitled") for record in records]
+
+        if mode == "top_k":
+            k = min(top_k, len(records) - 1)
+            np.fill_diagonal(scores, -np.inf)
+            nearest = np.argsort(-scores, axis=1)[:, :k]
+            return {
+                "mode": mode,
+                "titles": titles,
+                "neighbors": [
+                    [{"index": int(j), "score": round(float(scores[i, j]), 4)} for j in row]
+                    for i, row in enumerate(nearest)
+                ],
+            }
+        if mode == "threshold":
+            rows, cols = np.triu_indices(len(records), k=1)
+            pair_scores = scores[rows, cols]
+            keep = np.flatnonzero(pair_scores >= threshold)
+            keep = keep[np.argsort(-pair_scores[keep])]
+            return {
+                "mode": mode,
+                "titles": titles,
+                "pairs": [
+                    {"a": int(rows[p]), "b": int(cols[p]), "score": round(float(pair_scores[p]), 4)}
+                    for p in keep
+                ],
+            }
+        return {"mode": "matrix", "titles": titles, "scores": np.round(scores, 4).tolist()}
+
+    def _embed_page(self, plan_json: dict, sections: list) -> Optional[np.ndarray]:
+        """Embed a freshly written page from its in-memory text; None if the model is unavailable."""
+        parts = [plan_json.get("title", ""), plan_json.get("meta_description", "")]
+        for section in sections:
+            parts.extend([section.get("heading", ""), section.get("content", "")])
+        try:
+            return _embed_texts([" ".join(p for p in parts if p)])
+        except Exception as e:
+            logger.warning(f"Page embedding skipped: {e}")
+            return None
+
+    def _find_duplicate(self, vector: Optional[np.ndarray]) -> Optional[tuple]:
+        """(site_id, score) of the closest earlier page if it is above DUPLICATE_THRESHOLD."""
+        if vector is None or DUPLICATE_POLICY == "off":
+            return None
+        nearest = self.index.search(vector, k=1)
+        if nearest and nearest[0][1] >= DUPLICATE_THRESHOLD:
+            return nearest[0]
+        return None
+
+    def similar_sites(self, site_id: str, k: int = 5) -> Optional[list]:
+        """Nearest pages to `site_id` across every batch; None if it has no embedding."""
+        if site_id not in self.embeddings:
+            return None
+        vector = self.embeddings.get_many([site_id])
+        similar = []
+        for other_id, score in self.index.search(vector, k=k, exclude=site_id):
+            record = self.registry.get_site(other_id) or {}
+            similar.append({
+                "site_id": other_id,
+                "title": record.get("title"),
+                "topic": record.get("topic"),
+                "score": round(score, 4),
+            })
+        return similar
 
     async def generate_one_site(self, topic: str, style: str, temperature: float, 
                                 top_p: float, max_tokens: int, generate_image: bool = True,
                                 randomize_temperature: bool = False,
                                 temperature_min: float = 0.5,
                                 temperature_max: float = 1.2,
-                                existing_titles: list = None):
-        """Generate a single site with improved variability and diversity control."""
+                                existing_titles: Optional[list] = None,
+                                writing_mode: str = "single",
+                                use_cache: bool = True,
+                                emit: Optional[EventCallback] = None,
+                                page_index: int = 0):
+        """Generate a single site with improved variability and diversity control.
 
+        `existing_titles` are the titles already taken in the current batch; the
+        accepted title is appended to it so concurrently planned pages see it.
+        `page_index` (the page's position in its batch) seeds the temperature
+        jitter together with the sampling settings.
+        The finished page is checked against every earlier page before it is
+        saved; see DUPLICATE_POLICY for what happens to near-duplicates.
+        """
+        emit = emit or _no_emit
+        attempts = max(1, DUPLICATE_MAX_ATTEMPTS) if DUPLICATE_POLICY == "regenerate" else 1
+        batch_titles = existing_titles if existing_titles is not None else []
+        avoid_titles = []
+
+        for attempt in range(1, attempts + 1):
+            # A retry must not replay the cached responses that produced the duplicate
+            page = await self._compose_page(
+                topic, style, temperature, top_p, max_tokens, generate_image,
+                randomize_temperature, temperature_min, temperature_max,
+                batch_titles, avoid_titles, writing_mode, use_cache and attempt == 1, emit, page_index
+            )
+            duplicate = await asyncio.to_thread(self._find_duplicate, page["vector"])
+            if duplicate is None:
+                break
+
+            duplicate_of, score = duplicate
+            if DUPLICATE_POLICY == "reject":
+                action = "reject"
+            elif DUPLICATE_POLICY == "regenerate" and attempt < attempts:
+                action = "regenerate"
+            else:
+                action = "flag"
+            logger.warning(f"Page '{page['plan']['title']}' is a near-duplicate of {duplicate_of} ({score:.3f}): {action}")
+            emit("duplicate_detected", {"duplicate_of": duplicate_of, "score": round(score, 4), "action": action})
+            if action == "flag":
+                break
+            batch_titles.remove(page["plan"]["title"])
+            if action == "reject":
+                raise DuplicatePageError(page["plan"]["title"], duplicate_of, score)
+            original = await asyncio.to_thread(self.registry.get_site, duplicate_of)
+            if original and original.get("title"):
+                avoid_titles.append(original["title"])
+
+        site_id = page["site_id"]
+        plan_json = page["plan"]
+        generated_sections = page["sections"]
+
+        # Template selection and rendering
+        sources = await image_sources(page["image_path"], self.storage) if page["image_path"] else []
+        with metrics.stage_timer("rendering"):
+            html = self._render_html(plan_json, generated_sections, page["image_path"], style, topic, sources)
+        
+        # Save through the storage backend; compressed variants first, so the page is never served without them
+        key = site_key(site_id)
+        file_path = self.storage.location(key)
+        with metrics.stage_timer("file_write"):
+            data = html.encode("utf-8")
+            variants = await asyncio.to_thread(compressed_variants, data)
+            await asyncio.gather(*(self.storage.put(key + suffix, body) for suffix, body in variants.items()))
+            await self.storage.put(key, data, "text/html; charset=utf-8")
+        if page["vector"] is not None:
+            await asyncio.to_thread(self.index.add, site_id, page["vector"])
+        if page["title_vector"] is not None:
+            await asyncio.to_thread(self.title_index.add, site_id, page["title_vector"])
+        
+        logger.info(f"Site saved: {file_path}")
+
+        record = {
+            "site_id": site_id,
+            "topic": topic,
+            "title": plan_json.get("title"),
+            "meta_description": plan_json.get("meta_description"),
+            "image_path": page["image_path"],
+            "file_path": file_path,
+            "style": style,
+            "sections_count": len(generated_sections),
+            "temperature_used": round(page["temperature"], 2),
+            "planning_tokens": page["planning_tokens"],
+            "writing_tokens": page["writing_tokens"],
+            "created_at": timestamp_now()
+        }
+        if duplicate:
+            record["duplicate_of"], record["duplicate_score"] = duplicate[0], round(duplicate[1], 4)
+        await asyncio.to_thread(self.registry.record_site, record)
+        if self.exporter:
+            # The live copy is already saved; a failed export is caught up by `python -m app.export`
+            try:
+                with metrics.stage_timer("export"):
+                    await self.exporter.add(record, html)
+            except Exception as e:
+                logger.warning(f"Static export failed for {site_id}: {e}")
+        metrics.pages.labels("saved").inc()
+        metrics.prompt_tokens.labels("planning").inc(page["planning_tokens"])
+        metrics.prompt_tokens.labels("writing").inc(page["writing_tokens"])
+        emit("page_saved", {"site": record})
+        return record
+
+    async def _compose_page(self, topic: str, style: str, temperature: float, top_p: float,
+                            max_tokens: int, generate_image: bool, randomize_temperature: bool,
+                            temperature_min: float, temperature_max: float, batch_titles: list,
+                            avoid_titles: list, writing_mode: str, use_cache: bool,
+                            emit: EventCallback, page_index: int = 0) -> dict:
+        """Plan, illustrate, write and embed one page without saving it."""
         # Temperature determination
+        rng = _sampling_rng(use_cache, topic, style, temperature, top_p, randomize_temperature,
+                            temperature_min, temperature_max, page_index)
         if randomize_temperature:
-            actual_temp = random.uniform(temperature_min, temperature_max)
+            actual_temp = rng.uniform(temperature_min, temperature_max)
             logger.info(f"🎲 Random temperature generated: {actual_temp:.2f} (range: {temperature_min}-{temperature_max})")
         else:
             variation = temperature * 0.1
-            actual_temp = max(0.1, min(1.5, temperature + random.uniform(-variation, variation)))
+            actual_temp = max(0.1, min(1.5, temperature + rng.uniform(-variation, variation)))
             logger.info(f"📊 Temperature with slight variation: {actual_temp:.2f} (base: {temperature})")
         
-        # Structure planning
-        plan_prompt_text = planning_prompt(topic, style, existing_titles=existing_titles) 
-        planning_tokens = count_tokens(plan_prompt_text)
+        # Structure planning; re-plan only when the title collides with one already taken
+        prompt_titles = avoid_titles[:TITLE_PROMPT_LIMIT]
+        planning_tokens = 0
+        with metrics.stage_timer("planning"):
+            for replan in range(TITLE_MAX_REPLANS + 1):
+                plan_prompt_text = planning_prompt(topic, style, existing_titles=prompt_titles)
+                plan_resp = await async_inference(plan_prompt_text, params={
+                    "temperature": actual_temp, 
+                    "top_p": top_p, 
+                    "max_new_tokens": 1000
+                }, use_cache=use_cache and replan == 0)
+                planning_tokens += await _prompt_tokens(plan_resp, plan_prompt_text)
+            
+                plan_json = self._parse_plan_response(plan_resp, topic)
+                plan_json["title"] = plan_json.get("title") or f"{topic} Guide"
+                collisions, title_vector = await asyncio.to_thread(
+                    self._ensure_unique_title, plan_json["title"], batch_titles
+                )
+                if not collisions:
+                    break
+                logger.info(f"Title '{plan_json['title']}' collides with {collisions[:2]}; re-planning")
+                prompt_titles = list(dict.fromkeys(avoid_titles + collisions))[:TITLE_PROMPT_LIMIT]
+        batch_titles.append(plan_json["title"])
         logger.info(f"Planning prompt tokens: {planning_tokens}")
-        plan_resp = inference(plan_prompt_text, params={
-            "temperature": actual_temp, 
-            "top_p": top_p, 
-            "max_new_tokens": 1000
+        emit("plan_parsed", {
+            "title": plan_json["title"],
+            "sections": [s.get("heading", "") for s in plan_json.get("sections", [])]
         })
-        
-        plan_json = self._parse_plan_response(plan_resp, topic)
-        plan_json["title"] = self._ensure_unique_title(plan_json.get("title", f"{topic} Guide"))
 
-        # Optional image generation
+        # Illustration only needs the plan, so it runs while the sections are written
         site_id = make_uuid()
-        image_path = None
-        
+        image_task = None
         if generate_image:
-            image_path = self._generate_and_save_image(plan_json, topic, site_id)
+            image_task = asyncio.create_task(self._illustrate(plan_json, topic, site_id, use_cache, emit))
 
         # Content generation with temperature variation
         content_temp = actual_temp
         if randomize_temperature:
-            content_temp = max(0.1, min(1.5, actual_temp + random.uniform(-0.05, 0.05)))
+            content_temp = max(0.1, min(1.5, actual_temp + rng.uniform(-0.05, 0.05)))
             logger.info(f"📝 Content temperature: {content_temp:.2f}")
         
-        generated_sections, writing_tokens = self._generate_sections(
-            topic, style, plan_json, content_temp, top_p, max_tokens
-        )
-        
-        # Template selection and rendering
-        html = self._render_html(plan_json, generated_sections, image_path, style, topic)
-        
-        # Save to file
-        file_path = os.path.join(SITES_DIR, f"site_{site_id}.html")
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(html)
-        
-        logger.info(f"Site saved: {file_path}")
+        try:
+            with metrics.stage_timer("writing"):
+                generated_sections, writing_tokens = await self._generate_sections(
+                    topic, style, plan_json, content_temp, top_p, max_tokens,
+                    writing_mode=writing_mode, use_cache=use_cache, emit=emit
+                )
+            vector = await asyncio.to_thread(self._embed_page, plan_json, generated_sections)
+            image_path = await image_task if image_task else None
+        finally:
+            if image_task and not image_task.done():
+                image_task.cancel()
 
-        record = {
+        return {
             "site_id": site_id,
-            "title": plan_json.get("title"),
-            "meta_description": plan_json.get("meta_description"),
+            "plan": plan_json,
+            "sections": generated_sections,
             "image_path": image_path,
-            "file_path": file_path,
-            "style": style,
-            "sections_count": len(generated_sections),
-            "temperature_used": round(actual_temp, 2),
+            "temperature": actual_temp,
             "planning_tokens": planning_tokens,
             "writing_tokens": writing_tokens,
-            "created_at": timestamp_now()
+            "vector": vector,
+            "title_vector": title_vector,
         }
-        self.logs.append(record)
-        return record
+
+    async def _illustrate(self, plan_json: dict, topic: str, site_id: str,
+                          use_cache: bool, emit: EventCallback) -> Optional[str]:
+        """Image stage: never raises, gives up after PAGE_IMAGE_TIMEOUT and returns None."""
+        try:
+            with metrics.stage_timer("image"):
+                image_path = await asyncio.wait_for(
+                    self._generate_and_save_image(plan_json, topic, site_id, use_cache=use_cache),
+                    timeout=PAGE_IMAGE_TIMEOUT
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Image for site {site_id} timed out after {PAGE_IMAGE_TIMEOUT}s; continuing without it")
+            image_path = None
+        except Exception as e:
+            logger.warning(f"Image for site {site_id} failed: {e}; continuing without it")
+            image_path = None
+        emit("image_ready", {"image_path": image_path})
+        return image_path
 
     def _parse_plan_response(self, plan_resp: dict, topic: str) -> dict:
         """Parse JSON with fallback to default structure."""
@@ -179,6 +594,7 @@ class SiteGenerator:
             
         except Exception as e:
             logger.warning(f"JSON parsing failed: {e}. Using fallback structure.")
+            metrics.fallback_plans.inc()
             unique_suffix = make_uuid()[:8]
             return {
                 "title": f"{topic} — Comprehensive Guide {unique_suffix}",
@@ -191,108 +607,184 @@ class SiteGenerator:
                 ]
             }
 
-    def _ensure_unique_title(self, title: str) -> str:
-        """Ensure title uniqueness (placeholder for future implementation)."""
-        return title
+    def _ensure_unique_title(self, title: str, batch_titles: list) -> tuple:
+        """Check `title` against the batch and every saved title.
 
-    def _generate_and_save_image(self, plan_json: dict, topic: str, site_id: str) -> Optional[str]:
-        """Generate and save image."""
+        Returns (colliding titles, most similar first and at most
+        TITLE_PROMPT_LIMIT; title embedding or None). Without the embedding
+        model only exact repeats within the batch are caught.
+        """
+        try:
+            vector = _embed_title(title)
+        except Exception as e:
+            logger.warning(f"Title embedding unavailable, exact match only: {e}")
+            taken = {t.strip().lower() for t in batch_titles}
+            return ([title] if title.strip().lower() in taken else []), None
+
+        candidates = []
+        if batch_titles:
+            batch_scores = np.vstack([_embed_title(t) for t in batch_titles]) @ vector
+            candidates.extend(zip(batch_titles, batch_scores.tolist()))
+        for site_id, score in self.title_index.search(vector, k=TITLE_PROMPT_LIMIT):
+            if score >= TITLE_SIMILARITY_THRESHOLD:
+                record = self.registry.get_site(site_id)
+                if record and record.get("title"):
+                    candidates.append((record["title"], score))
+
+        if not any(score >= TITLE_SIMILARITY_THRESHOLD for _, score in candidates):
+            return [], vector
+        ranked = sorted(candidates, key=lambda c: c[1], reverse=True)
+        return list(dict.fromkeys(t for t, _ in ranked))[:TITLE_PROMPT_LIMIT], vector
+
+    async def _generate_and_save_image(self, plan_json: dict, topic: str, site_id: str,
+                                       use_cache: bool = True) -> Optional[str]:
+        """Generate the image and store it as content-addressed WebP/AVIF variants."""
         image_prompt = plan_json.get("image_prompt", f"Professional illustration of {topic}")
-        image = inference_image(image_prompt)
+        image = await async_inference_image(image_prompt, use_cache=use_cache)
         
         if image:
-            image_path = f"image_{site_id}.png"
-            abs_image_path = os.path.join(SITES_DIR, image_path)
-            image.save(abs_image_path)
-            logger.info(f"Image saved: {abs_image_path}")
+            image_path = await save_image(image, self.storage)
+            logger.info(f"Image saved for site {site_id}: {image_path}")
             return image_path
         else:
             logger.warning("Image generation failed")
             return None
 
-    def _generate_sections(self, topic: str, style: str, plan_json: dict,
-                          temperature: float, top_p: float, max_tokens: int) -> tuple:
+    async def _generate_sections(self, topic: str, style: str, plan_json: dict,
+                          temperature: float, top_p: float, max_tokens: int,
+                          writing_mode: str = "single",
+                          use_cache: bool = True,
+                          emit: Optional[EventCallback] = None) -> tuple:
         """Generate content for all sections with style considerations."""
-        from app.prompts import STYLE_INSTRUCTIONS
+        emit = emit or _no_emit
         
         sections_data = plan_json.get("sections", [])
+        if writing_mode == "parallel" and sections_data:
+            return await self._generate_sections_parallel(
+                topic, style, plan_json, temperature, top_p, max_tokens, use_cache, emit
+            )
         write_prompt = writing_prompt(topic, style, plan_json.get("title", ""), sections_data)
-        writing_tokens = count_tokens(write_prompt)
-        logger.info(f"Writing prompt tokens: {writing_tokens}")
-        logger.info(f"Generating content for {len(sections_data)} sections")
-        
-        write_resp = inference(write_prompt, params={
+        logger.info(f"Generating content for {len(sections_data)} sections ({writing_mode} mode)")
+        params = {
             "temperature": temperature, 
             "top_p": top_p, 
             "max_new_tokens": max_tokens
-        })
-        
-        full_text = write_resp if isinstance(write_resp, str) else write_resp.get("generated_text", "")
+        }
+
+        if writing_mode == "stream":
+            extractor = SectionExtractor(sections_data)
+
+            def emit_sections(positions: list):
+                for position in positions:
+                    emit("section_written", {"position": position, **extractor.section(position)})
+
+            async for chunk in async_inference_stream(write_prompt, params=params, use_cache=use_cache):
+                emit_sections(extractor.feed(chunk))
+            emit_sections(extractor.close())
+            generated_sections = extractor.sections()
+            logger.info(f"Extracted {len(generated_sections)} sections")
+            writing_tokens = await asyncio.to_thread(count_tokens, write_prompt)  # streamed completions report no usage
+        else:
+            write_resp = await async_inference(write_prompt, params=params, use_cache=use_cache)
+            writing_tokens = await _prompt_tokens(write_resp, write_prompt)
+            full_text = write_resp if isinstance(write_resp, str) else write_resp.get("generated_text", "")
+            generated_sections = self._extract_sections(full_text, sections_data)
+            for position, section in enumerate(generated_sections):
+                emit("section_written", {"position": position, **section})
         
-        return self._extract_sections(full_text, sections_data), writing_tokens
+        logger.info(f"Writing prompt tokens: {writing_tokens}")
+        return generated_sections, writing_tokens
+
+    async def _generate_sections_parallel(self, topic: str, style: str, plan_json: dict,
+                                          temperature: float, top_p: float, max_tokens: int,
+                                          use_cache: bool, emit: EventCallback) -> tuple:
+        """Write every section as its own concurrent call sharing one context prefix.
+
+        Each call gets max_tokens / len(sections) (at least SECTION_MIN_TOKENS),
+        so a long plan is not truncated and latency is that of the slowest section.
+        """
+        sections_data = plan_json["sections"]
+        context = section_context(topic, style, plan_json.get("title", ""), sections_data)
+        prompts = [section_prompt(context, style, topic, section) for section in sections_data]
+        params = {
+            "temperature": temperature,
+            "top_p": top_p,
+            "max_new_tokens": max(SECTION_MIN_TOKENS, max_tokens // len(sections_data))
+        }
+        logger.info(f"Writing {len(prompts)} sections in parallel ({params['max_new_tokens']} tokens each)")
+        reported = [None] * len(prompts)
+
+        async def write(position: int) -> dict:
+            section = sections_data[position]
+            heading = section.get("heading", f"Section {position + 1}")
+            resp = await async_inference(prompts[position], params=params, use_cache=use_cache)
+            reported[position] = _reported_prompt_tokens(resp)
+            text = resp if isinstance(resp, str) else (resp or {}).get("generated_text", "")
+            # Models sometimes echo the heading despite the instruction
+            text = re.sub(rf"^\s*#*\s*{re.escape(heading)}\s*:?\s*\n", "", text or "", flags=re.IGNORECASE)
+            content = " ".join(text.split())
+            if not content:
+                logger.warning(f"Section '{heading}' came back empty; using its brief")
+                metrics.fallback_sections.inc()
+                content = section.get("brief", "")
+            result = {"heading": heading, "content": content}
+            emit("section_written", {"position": position, **result})
+            return result
+
+        generated_sections = await asyncio.gather(*(write(i) for i in range(len(sections_data))))
+        # Sections without reported usage share the context prefix, so their counts are mostly memo hits
+        unreported = [prompts[i] for i, tokens in enumerate(reported) if tokens is None]
+        counted = await asyncio.to_thread(count_tokens_batch, unreported) if unreported else []
+        writing_tokens = sum(tokens for tokens in reported if tokens is not None) + sum(counted)
+        logger.info(f"Writing prompt tokens: {writing_tokens}")
+        return list(generated_sections), writing_tokens
 
     def _extract_sections(self, full_text: str, sections_data: list) -> list:
         """Extract sections from generated text."""
-        parts = full_text.split("###")
-        generated_sections = []
-        
-        for s in sections_data:
-            heading = s.get("heading", "")
-            content = ""
-            
-            for part in parts[1:]:
-                part_stripped = part.strip()
-                if part_stripped.startswith(heading + "\n"):
-                    content = part_stripped[len(heading) + 1:].strip()
-                    break
-                elif part_stripped.startswith(heading):
-                    rest = part_stripped[len(heading):].lstrip()
-                    content = rest
-                    break
-            
-            if not content:
-                content = s.get("brief", f"Information about {heading}")
-                logger.warning(f"No content found for section '{heading}', using brief")
-            
-            content = ' '.join(content.split())
-            generated_sections.append({"heading": heading, "content": content})
+        with metrics.stage_timer("extraction"):
+            extractor = SectionExtractor(sections_data)
+            extractor.feed(full_text)
+            extractor.close()
+            generated_sections = extractor.sections()
         
         logger.info(f"Extracted {len(generated_sections)} sections")
         return generated_sections
 
     def _render_html(self, plan_json: dict, sections: list, image_path: Optional[str],
-                    style: str, topic: str) -> str:
-        """Render HTML with appropriate template."""
-        template_map = {
-            "educational": "educational.html",
-            "marketing": "marketing.html",
-            "technical": "technical.html",
-            "minimalist": "minimalist.html",
-            "creative": "creative.html",
-            "casual": "base.html",
-        }
-        template_name = template_map.get(style.lower(), "educational.html")
+                    style: str, topic: str, sources: Optional[list] = None) -> str:
+        """Render HTML with appropriate template; `sources` are the image's srcset entries."""
         image_url = f"/image/{image_path}" if image_path else None
-        tpl = env.get_template(template_name)
+        tpl = template_for(style)
         html = tpl.render(
             title=plan_json.get("title", "Untitled"),
             meta_description=plan_json.get("meta_description", f"Learn about {topic}"),
             sections=sections,
             image_path=image_url,
+            image_sources=sources or [],
+            image_sizes=IMAGE_SIZES,
             generated_at=datetime.utcnow().isoformat() + "Z"
         )
         
-        logger.info(f"HTML rendered using template: {template_name}")
+        logger.info(f"HTML rendered using template: {tpl.name}")
         return html
 
     def get_site_path(self, site_id: str) -> Optional[str]:
-        """Get file path by site ID."""
-        for r in self.logs:
-            if r.get("site_id") == site_id:
-                return r.get("file_path")
+        """Get file path (storage location) by site ID."""
+        record = self.registry.get_site(site_id)
+        if record:
+            return record.get("file_path")
         logger.warning(f"Site not found: {site_id}")
         return None
 
-    def get_logs(self) -> list:
-        """Return all generation logs."""
-        return self.logs
\ No newline at end of file
+    def get_site_key(self, site_id: str) -> Optional[str]:
+        """Storage key of a registered site's page."""
+        return site_key(site_id) if self.registry.get_site(site_id) else None
+
+    def get_logs(self, offset: int = 0, limit: int = 50) -> dict:
+        """Return one page of generated site records, newest first."""
+        return {
+            "total": self.registry.count_sites(),
+            "offset": offset,
+            "limit": limit,
+            "items": self.registry.list_sites(offset, limit),
+        }
\ No newline at end of file
@@ -0,0 +1,143 @@
+# app/images.py
+import os
+import io
+import re
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from PIL import Image, features
+from app.logger import logger
+
+IMAGE_WIDTHS = sorted(int(w) for w in os.getenv("IMAGE_WIDTHS", "256,512").split(",") if w.strip())
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))  # 0 encodes in a thread instead of a process pool
+WEBP_QUALITY = int(os.getenv("WEBP_QUALITY", "80"))
+AVIF_QUALITY = int(os.getenv("AVIF_QUALITY", "60"))
+
+# Most compact first: the order of <source> elements in <picture>
+FORMATS = [fmt for fmt, feature in (("avif", "avif"), ("webp", "webp")) if features.check(feature)]
+IMAGE_SIZES = f"(max-width: {IMAGE_WIDTHS[-1]}px) 100vw, {IMAGE_WIDTHS[-1]}px"
+MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp", "png": "image/png"}
+
+# img_<sha256 prefix>_<width>.<ext>; legacy pages still reference image_<site_id>.png
+VARIANT_NAME = re.compile(r"^img_([0-9a-f]{16})_(\d+)\.(webp|avif)$")
+LEGACY_NAME = re.compile(r"^image_[\w-]+\.png$")
+
+_pool = None
+
+
+def variant_name(digest: str, width: int, fmt: str) -> str:
+    return f"img_{digest}_{width}.{fmt}"
+
+
+def _output_formats() -> list:
+    return FORMATS or ["webp"]
+
+
+def variant_names(digest: str, image_width: int) -> list:
+    """Every variant of an image `image_width` pixels wide, smallest first.
+
+    Widths above the image's own are clamped to it, so the largest variant is
+    always the full-size image.
+    """
+    widths = sorted({min(width, image_width) for width in IMAGE_WIDTHS})
+    return [variant_name(digest, width, fmt) for width in widths for fmt in _output_formats()]
+
+
+def fallback_name(names: list) -> str:
+    """The variant used as the plain `src`: the largest WebP, else the largest of any format."""
+    fmt = "webp" if "webp" in _output_formats() else _output_formats()[0]
+    return [name for name in names if name.endswith(f".{fmt}")][-1]
+
+
+def encode_variants(png: bytes, names: list) -> list:
+    """Encode the named variants (see variant_name) of one image; runs in a worker process.
+
+    Returns (name, bytes) pairs; storing them is left to the caller.
+    """
+    image = Image.open(io.BytesIO(png))
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGB")
+    encoded = []
+    resized = {}
+    for name in names:
+        _, width, fmt = VARIANT_NAME.match(name).groups()
+        width = int(width)
+        if width not in resized:
+            height = round(image.height * width / image.width)
+            resized[width] = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if fmt == "avif":
+            resized[width].save(buffer, format="AVIF", quality=AVIF_QUALITY)
+        else:
+            resized[width].save(buffer, format="WEBP", quality=WEBP_QUALITY, method=6)
+        encoded.append((name, buffer.getvalue()))
+    return encoded
+
+
+def _executor():
+    global _pool
+    if _pool is None and IMAGE_WORKERS > 0:
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _pool
+
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def save_image(image: Image.Image, storage) -> str:
+    """Store an image as content-addressed WebP/AVIF variants in `storage`.
+
+    Variants are named by content hash, so those already stored are not
+    encoded again. Returns the `fallback_name` variant, which serves as the
+    plain `src`; `image_sources` recovers the rest for `srcset`.
+    """
+    buffer = io.BytesIO()
+    await asyncio.to_thread(image.save, buffer, format="PNG")
+    png = buffer.getvalue()
+    digest = hashlib.sha256(png).hexdigest()[:16]
+    names = variant_names(digest, image.width)
+    stored = await asyncio.gather(*(storage.exists(name) for name in names))
+    missing = [name for name, present in zip(names, stored) if not present]
+    if missing:
+        loop = asyncio.get_running_loop()
+        encoded = await loop.run_in_executor(_executor(), encode_variants, png, missing)
+        await asyncio.gather(*(storage.put(name, data, media_type(name)) for name, data in encoded))
+    logger.info(f"Image {digest} stored as {len(names)} variants ({len(missing)} new)")
+    return fallback_name(names)
+
+
+async def image_sources(filename: str, storage) -> list:
+    """<source> entries ({type, srcset}) for every stored variant of `filename`'s image."""
+    match = VARIANT_NAME.match(filename or "")
+    if not match:
+        return []
+    # `filename` is the largest variant, so its width is the image's (clamped) width
+    digest, image_width = match.group(1), int(match.group(2))
+    candidates = [VARIANT_NAME.match(name).groups()[1:] + (name,) for name in variant_names(digest, image_width)]
+    stored = await asyncio.gather(*(storage.exists(name) for _, _, name in candidates))
+    sources = []
+    for fmt in _output_formats():
+        srcset = [
+            f"/image/{name} {width}w"
+            for (width, candidate_fmt, name), present in zip(candidates, stored)
+            if present and candidate_fmt == fmt
+        ]
+        if srcset:
+            sources.append({"type": MEDIA_TYPES[fmt], "srcset": ", ".join(srcset)})
+    return sources
+
+
+def media_type(filename: str) -> Optional[str]:
+    """Media type for a servable image filename, None if the name is not one we produce."""
+    match = VARIANT_NAME.match(filename)
+    if match:
+        return MEDIA_TYPES[match.group(3)]
+    if LEGACY_NAME.match(filename):
+        return MEDIA_TYPES["png"]
+    return None
@@ -1,51 +1,204 @@
 from dotenv import load_dotenv
 import os
-from typing import Optional
+import io
+import asyncio
+from typing import AsyncIterator, Optional
 from PIL import Image
-from huggingface_hub import InferenceClient
 from app.logger import logger
-from app.utils import ensure_sites_dir
+from app.utils import ensure_sites_dir, estimate_tokens
+from app.cache import response_cache
+from app import metrics
+from app.scheduler import (
+    Scheduler, InferenceError, call_with_retries, is_retryable, next_delay, MAX_RETRIES
+)
+from app.backends import make_backend
 
 load_dotenv()
-HF_TOKEN = os.getenv("HUGGINGFACEHUB_API_TOKEN")
-MODEL = "mistralai/Mixtral-8x7B-Instruct-v0.1"
-IMAGE_MODEL = "black-forest-labs/FLUX.1-dev"
 
 SITES_DIR = ensure_sites_dir(os.getenv("SITES_DIR", "./sites"))
 
-client = InferenceClient(model=MODEL, token=HF_TOKEN)
-image_client = InferenceClient(model=IMAGE_MODEL, token=HF_TOKEN)
+MAX_INFLIGHT_TEXT = int(os.getenv("MAX_INFLIGHT_TEXT_REQUESTS", "8"))
+MAX_INFLIGHT_IMAGE = int(os.getenv("MAX_INFLIGHT_IMAGE_REQUESTS", "2"))
 
-def inference(prompt: str, params: dict) -> dict:
-    """Call Hugging Face API via current client."""
+# Provider quota; 0 disables a limit. Image "tokens" are prompt tokens.
+TEXT_REQUESTS_PER_SEC = float(os.getenv("TEXT_REQUESTS_PER_SEC", "2"))
+TEXT_TOKENS_PER_MIN = float(os.getenv("TEXT_TOKENS_PER_MIN", "60000"))
+IMAGE_REQUESTS_PER_SEC = float(os.getenv("IMAGE_REQUESTS_PER_SEC", "0.5"))
+IMAGE_TOKENS_PER_MIN = float(os.getenv("IMAGE_TOKENS_PER_MIN", "0"))
+
+IMAGE_PARAMS = {
+    "negative_prompt": "low quality, blurry, distorted, text, watermark",
+    "guidance_scale": 7.5,
+    "num_inference_steps": 30,
+    "height": 512,
+    "width": 512,
+}
+
+# Selected by INFERENCE_BACKEND; every call still goes through the schedulers and the response cache
+backend = make_backend()
+
+
+class AsyncBackend:
+    """Rate-limiting scheduler for one kind of call (text or image) to `backend`.
+
+    Schedulers hold loop-bound futures and timers, so one is (re)created
+    lazily for the event loop that is currently running.
+    """
+
+    def __init__(self, kind: str, max_inflight: int,
+                 requests_per_sec: float = 0, tokens_per_min: float = 0):
+        self.kind = kind
+        self.max_inflight = max(1, max_inflight)
+        self.requests_per_sec = requests_per_sec
+        self.tokens_per_min = tokens_per_min
+        self._loop = None
+        self._scheduler = None
+
+    @property
+    def model(self) -> str:
+        return backend.text_model if self.kind == "text" else backend.image_model
+
+    def _bind(self) -> Scheduler:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._scheduler = Scheduler(self.model, self.requests_per_sec, self.tokens_per_min, self.max_inflight)
+            self._loop = loop
+        return self._scheduler
+
+    def stats(self) -> dict:
+        scheduler = self._scheduler
+        return {
+            "backend": backend.name,
+            "model": self.model,
+            "in_flight": scheduler.inflight if scheduler else 0,
+            "queued": scheduler.queued if scheduler else 0,
+            "requests_per_sec": self.requests_per_sec,
+            "tokens_per_min": self.tokens_per_min,
+        }
+
+
+text_backend = AsyncBackend("text", MAX_INFLIGHT_TEXT, TEXT_REQUESTS_PER_SEC, TEXT_TOKENS_PER_MIN)
+image_backend = AsyncBackend("image", MAX_INFLIGHT_IMAGE, IMAGE_REQUESTS_PER_SEC, IMAGE_TOKENS_PER_MIN)
+
+
+async def close_async_clients():
+    """Release pooled connections of the inference backend."""
+    await backend.aclose()
+
+def _sampling(params: dict) -> dict:
+    return {
+        "temperature": params.get("temperature", 0.7),
+        "top_p": params.get("top_p", 0.9),
+        "max_tokens": params.get("max_new_tokens", 512),
+    }
+
+def _estimated_cost(prompt: str, params: dict) -> int:
+    """Tokens a text call may consume: rough prompt size plus the completion budget."""
+    return estimate_tokens(prompt) + _sampling(params)["max_tokens"]
+
+def _text_cache_key(prompt: str, params: dict) -> str:
+    return response_cache.make_key("chat_completion", backend.text_model, prompt, _sampling(params))
+
+def _image_cache_key(prompt: str) -> str:
+    return response_cache.make_key("text_to_image", backend.image_model, prompt, IMAGE_PARAMS)
+
+def _image_to_png(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _png_to_image(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image
+
+async def async_inference(prompt: str, params: dict, use_cache: bool = True) -> dict:
+    """Chat completion for `prompt` from the configured backend.
+
+    Calls are admitted by the text scheduler and retried on 429/5xx; a call
+    that still fails raises InferenceError. The response carries the
+    provider's `usage` when it reported one, so callers need not re-tokenize
+    the prompt. With `use_cache` off the cache is neither read nor written.
+    """
+    cache_key = _text_cache_key(prompt, params)
+    if use_cache and (cached := await asyncio.to_thread(response_cache.get_json, cache_key)) is not None:
+        logger.info("Inference served from response cache")
+        return cached
     try:
-        messages = [{"role": "user", "content": prompt}]
-        output = client.chat_completion(
-            messages=messages,
-            temperature=params.get("temperature", 0.7),
-            top_p=params.get("top_p", 0.9),
-            max_tokens=params.get("max_new_tokens", 512)
+        result, usage = await call_with_retries(
+            text_backend._bind(), _estimated_cost(prompt, params),
+            lambda: backend.complete(prompt, _sampling(params)),
+            "Text inference"
         )
-        result = output.choices[0].message.content
-        logger.info(f"Inference successful, generated {len(result)} characters")
-        return {"generated_text": result}
-    except Exception as e:
-        logger.error(f"Inference error: {str(e)}")
-        return {"generated_text": ""}
+    except InferenceError:
+        metrics.inference_errors.labels("text").inc()
+        raise
+    logger.info(f"Inference successful, generated {len(result)} characters")
+    response = {"generated_text": result}
+    if usage:
+        response["usage"] = usage
+        metrics.inference_tokens.labels("prompt").inc(usage["prompt_tokens"])
+        metrics.inference_tokens.labels("completion").inc(usage["completion_tokens"])
+    if result and use_cache:
+        await asyncio.to_thread(response_cache.set_json, cache_key, response)
+    return response
+
+async def async_inference_stream(prompt: str, params: dict, use_cache: bool = True) -> AsyncIterator[str]:
+    """Stream a chat completion as text deltas.
+
+    Failures before the first delta are retried like `async_inference`; a
+    failure after output has been yielded cannot be replayed and raises
+    InferenceError.
+    """
+    cache_key = _text_cache_key(prompt, params)
+    if use_cache and (cached := await asyncio.to_thread(response_cache.get_json, cache_key)) is not None:
+        logger.info("Streaming inference served from response cache")
+        yield cached["generated_text"]
+        return
+
+    # Keep the text only when it will be cached, so streaming stays O(section) in memory otherwise
+    chunks = [] if use_cache and response_cache.enabled else None
+    generated = 0
+    scheduler = text_backend._bind()
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with scheduler.slot(_estimated_cost(prompt, params)):
+                async for delta in backend.stream(prompt, _sampling(params)):
+                    generated += len(delta)
+                    if chunks is not None:
+                        chunks.append(delta)
+                    yield delta
+            break
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if generated or not is_retryable(e) or attempt == MAX_RETRIES:
+                metrics.inference_errors.labels("stream").inc()
+                raise InferenceError(f"Streaming inference failed after {generated} characters: {e}") from e
+            delay = next_delay(scheduler, e, attempt)
+            logger.warning(f"Streaming inference failed ({e}); retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    logger.info(f"Streaming inference successful, generated {generated} characters")
+    if chunks:
+        await asyncio.to_thread(response_cache.set_json, cache_key, {"generated_text": "".join(chunks)})
 
-def inference_image(prompt: str) -> Optional[Image.Image]:
-    """Generate image via Hugging Face API."""
+async def async_inference_image(prompt: str, use_cache: bool = True) -> Optional[Image.Image]:
+    """Image for `prompt` from the configured backend, or None when generation fails."""
+    cache_key = _image_cache_key(prompt)
+    if use_cache and (cached := await asyncio.to_thread(response_cache.get, cache_key)) is not None:
+        logger.info(f"Image served from response cache for prompt: {prompt[:50]}...")
+        return await asyncio.to_thread(_png_to_image, cached)
     try:
-        response = image_client.text_to_image(
-            prompt=prompt,
-            negative_prompt="low quality, blurry, distorted, text, watermark",
-            guidance_scale=7.5,
-            num_inference_steps=30,
-            height=512,
-            width=512
+        response = await call_with_retries(
+            image_backend._bind(), len(prompt) // 4,
+            lambda: backend.image(prompt, IMAGE_PARAMS),
+            "Image inference"
         )
         logger.info(f"Image generated successfully for prompt: {prompt[:50]}...")
+        if use_cache:
+            await asyncio.to_thread(lambda: response_cache.set(cache_key, _image_to_png(response)))
         return response
     except Exception as e:
         logger.error(f"Image generation error for prompt '{prompt[:50]}...': {str(e)}")
-        return None
\ No newline at end of file
+        metrics.inference_errors.labels("image").inc()
+        return None
@@ -0,0 +1,239 @@
+# app/jobs.py
+import os
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Optional
+from sqlalchemy import MetaData, Table, Column, String, Integer, Text, JSON, select, insert, update
+from app.db import make_engine
+from app.models import GenerateRequest
+from app.utils import make_uuid, timestamp_now
+from app.scheduler import inference_priority, BULK
+from app.logger import logger
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_BACKEND = os.getenv("JOB_BACKEND", "memory")
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+
+def _new_job(request: dict) -> dict:
+    now = timestamp_now()
+    return {
+        "job_id": make_uuid(),
+        "status": QUEUED,
+        "request": request,
+        "pages_total": request.get("pages_count", 1),
+        "pages_completed": 0,
+        "pages": [None] * request.get("pages_count", 1),
+        "similarity_matrix": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+class JobBackend(ABC):
+    """Storage interface for generation jobs."""
+
+    @abstractmethod
+    def create(self, request: dict) -> dict:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, **fields) -> None:
+        ...
+
+    @abstractmethod
+    def unfinished(self) -> list:
+        """Return ids of queued or running jobs, oldest first."""
+
+
+class InMemoryJobBackend(JobBackend):
+    """Process-local job storage; jobs are lost on restart."""
+
+    def __init__(self):
+        self._jobs = {}
+
+    def create(self, request: dict) -> dict:
+        job = _new_job(request)
+        self._jobs[job["job_id"]] = job
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def update(self, job_id: str, **fields) -> None:
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields, updated_at=timestamp_now())
+
+    def unfinished(self) -> list:
+        return [job_id for job_id, job in self._jobs.items() if job["status"] in (QUEUED, RUNNING)]
+
+
+class SQLiteJobBackend(JobBackend):
+    """Job storage in a SQLite database so queued jobs survive restarts."""
+
+    def __init__(self, url: str):
+        self.engine = make_engine(url)
+        metadata = MetaData()
+        self.jobs = Table(
+            "jobs", metadata,
+            Column("job_id", String(32), primary_key=True),
+            Column("status", String(16), nullable=False, index=True),
+            Column("request", JSON, nullable=False),
+            Column("pages_total", Integer, nullable=False),
+            Column("pages_completed", Integer, nullable=False, default=0),
+            Column("pages", JSON, nullable=False),
+            Column("similarity_matrix", JSON),
+            Column("error", Text),
+            Column("created_at", String(32), nullable=False, index=True),
+            Column("updated_at", String(32), nullable=False),
+        )
+        metadata.create_all(self.engine)
+
+    def create(self, request: dict) -> dict:
+        job = _new_job(request)
+        with self.engine.begin() as conn:
+            conn.execute(insert(self.jobs).values(**job))
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(select(self.jobs).where(self.jobs.c.job_id == job_id)).mappings().first()
+        return dict(row) if row else None
+
+    def update(self, job_id: str, **fields) -> None:
+        with self.engine.begin() as conn:
+            conn.execute(
+                update(self.jobs)
+                .where(self.jobs.c.job_id == job_id)
+                .values(**fields, updated_at=timestamp_now())
+            )
+
+    def unfinished(self) -> list:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(self.jobs.c.job_id)
+                .where(self.jobs.c.status.in_([QUEUED, RUNNING]))
+                .order_by(self.jobs.c.created_at)
+            )
+            return [row.job_id for row in rows]
+
+
+def make_job_backend(kind: str = JOB_BACKEND, sites_dir: str = "./sites") -> JobBackend:
+    """Build the job backend selected by JOB_BACKEND ("memory" or "sqlite")."""
+    if kind == "sqlite":
+        url = os.getenv("JOB_DB_URL", f"sqlite:///{os.path.join(sites_dir, 'jobs.db')}")
+        logger.info(f"Using SQLite job backend: {url}")
+        return SQLiteJobBackend(url)
+    return InMemoryJobBackend()
+
+
+class JobManager:
+    """Runs submitted generation jobs on a pool of background workers."""
+
+    def __init__(self, generator, backend: JobBackend, workers: int = JOB_WORKERS):
+        self.generator = generator
+        self.backend = backend
+        self.workers = max(1, workers)
+        self._queue = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        for job_id in await asyncio.to_thread(self.backend.unfinished):
+            logger.info(f"Re-queuing unfinished job {job_id}")
+            await asyncio.to_thread(self.backend.update, job_id, status=QUEUED)
+            self._queue.put_nowait(job_id)
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"Job manager started with {self.workers} workers")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, req: GenerateRequest) -> dict:
+        job = await asyncio.to_thread(self.backend.create, req.model_dump())
+        self._queue.put_nowait(job["job_id"])
+        logger.info(f"Job {job['job_id']} queued ({req.pages_count} pages about '{req.topic}')")
+        return job
+
+    async def retry(self, job_id: str) -> dict:
+        """Re-queue a failed job from scratch."""
+        job = await asyncio.to_thread(self.backend.get, job_id)
+        await asyncio.to_thread(
+            self.backend.update, job_id, status=QUEUED, error=None, pages_completed=0,
+            pages=[None] * job["pages_total"], similarity_matrix=None
+        )
+        self._queue.put_nowait(job_id)
+        return await asyncio.to_thread(self.backend.get, job_id)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.backend.get, job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def _worker(self, n: int):
+        # Background jobs queue behind interactive requests for inference capacity
+        inference_priority.set(BULK)
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        # Backend calls are blocking (SQLite I/O), so none of them run on the event loop
+        job = await asyncio.to_thread(self.backend.get, job_id)
+        if not job or job["status"] not in (QUEUED, RUNNING):
+            return
+
+        logger.info(f"Job {job_id} started")
+        await asyncio.to_thread(self.backend.update, job_id, status=RUNNING)
+        pages = [None] * job["pages_total"]
+        completed = 0
+        writer = None
+
+        async def write_progress():
+            # One writer per job: a burst of page events collapses into one update
+            # carrying the latest state, and updates never overtake each other
+            written = -1
+            while written != completed:
+                written = completed
+                await asyncio.to_thread(self.backend.update, job_id, pages=list(pages), pages_completed=written)
+
+        def on_event(event: str, data: dict):
+            nonlocal completed, writer
+            if event != "page_saved":
+                return
+            pages[data["index"]] = data["site"]
+            completed += 1
+            if writer is None or writer.done():
+                writer = asyncio.create_task(write_progress())
+
+        try:
+            req = GenerateRequest(**job["request"])
+            result = await self.generator.generate_sites(req, emit=on_event)
+            if writer:
+                await writer
+            # pages stays indexed by page position; rejected pages are left as None
+            await asyncio.to_thread(
+                self.backend.update, job_id, status=COMPLETED, pages=list(pages),
+                pages_completed=completed, similarity_matrix=result["similarity_matrix"]
+            )
+            logger.info(f"Job {job_id} completed")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            if writer:
+                await asyncio.gather(writer, return_exceptions=True)
+            await asyncio.to_thread(self.backend.update, job_id, status=FAILED, error=str(e))
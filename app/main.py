@@ -1,19 +1,46 @@
 # app/main.py
 import os
-from fastapi import FastAPI, HTTPException, Response
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
 from dotenv import load_dotenv
 from app.models import GenerateRequest
 from app.generator import SiteGenerator
+from app.inference import close_async_clients, text_backend, image_backend
+from app.scheduler import InferenceError
+from app.jobs import JobManager, make_job_backend
+from app.utils import warm_up_resources, resources_status, token_counter
+from app.cache import response_cache
+from app.serving import file_response, stored_response, file_cache, REVALIDATE
+from app.images import media_type, shutdown_image_pool
+from app import metrics
+from app.rendering import precompile_templates
 
 load_dotenv()
 SITES_DIR = os.getenv("SITES_DIR", "./sites")
+WARMUP_MODELS = os.getenv("WARMUP_MODELS", "false").lower() in ("1", "true", "yes")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(precompile_templates)
+    await job_manager.start()
+    if WARMUP_MODELS:
+        # Load in the background so the server accepts traffic immediately; /ready tracks progress
+        app.state.warmup = asyncio.create_task(asyncio.to_thread(warm_up_resources))
+    yield
+    await job_manager.stop()
+    await close_async_clients()
+    await generator.storage.aclose()
+    shutdown_image_pool()
 
 app = FastAPI(
     title="LLM Site Generator",
     description="Generate AI-powered websites with various styles",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -23,16 +50,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(InferenceError)
+async def inference_error_handler(request: Request, exc: InferenceError):
+    # Upstream model unavailable or over quota after retries: tell the client to come back later
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "30"})
+
 generator = SiteGenerator()
+job_manager = JobManager(generator, make_job_backend(sites_dir=SITES_DIR))
+
+metrics.queue_depth.labels("jobs").set_function(lambda: job_manager.queue_depth)
+metrics.queue_depth.labels("inference_text").set_function(lambda: text_backend.stats()["queued"])
+metrics.queue_depth.labels("inference_image").set_function(lambda: image_backend.stats()["queued"])
 
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Служить фронтенд інтерфейс"""
     frontend_path = os.path.join(os.path.dirname(__file__), "frontend.html")
     
-    if os.path.exists(frontend_path):
-        with open(frontend_path, "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
+    # Held in the in-memory page cache; revalidated by ETag since the file may change between deploys
+    response = await file_response(request, frontend_path, "text/html", cache_control=REVALIDATE, compressible=False)
+    if response:
+        return response
     
     return HTMLResponse(content="""
     <!DOCTYPE html>
@@ -93,53 +131,128 @@ curl -X POST "http://127.0.0.1:8000/generate" \\
 async def ping():
     return {"status": "ok", "message": "API is running"}
 
+@app.get("/ready")
+async def ready(response: Response):
+    models = resources_status()
+    if WARMUP_MODELS and not all(models.values()):
+        response.status_code = 503
+        return {"status": "warming_up", "models": models}
+    return {"status": "ready", "models": models}
+
 @app.post("/generate")
 async def generate(req: GenerateRequest):
     response_data = await generator.generate_sites(req)
     return response_data
 
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/generate/stream")
+async def generate_stream(req: GenerateRequest):
+    """Stream generation progress as server-sent events."""
+    queue = asyncio.Queue()
+
+    def emit(event: str, data: dict):
+        queue.put_nowait((event, data))
+
+    async def run():
+        try:
+            result = await generator.generate_sites(req, emit=emit)
+            emit("done", {"sites_count": len(result["sites"])})
+        except Exception as e:
+            emit("error", {"detail": str(e)})
+        finally:
+            queue.put_nowait(None)
+
+    async def events():
+        task = asyncio.create_task(run())
+        try:
+            while (item := await queue.get()) is not None:
+                yield format_sse(*item)
+        finally:
+            # Client went away: stop paying for pages nobody will read
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs", status_code=202)
+async def submit_job(req: GenerateRequest):
+    job = await job_manager.submit(req)
+    return {"job_id": job["job_id"], "status": job["status"], "pages_total": job["pages_total"]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/jobs/{job_id}/retry", status_code=202)
+async def retry_job(job_id: str):
+    job = await job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "failed":
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be retried (status: {job['status']})")
+    job = await job_manager.retry(job_id)
+    return {"job_id": job["job_id"], "status": job["status"], "pages_total": job["pages_total"]}
+
 @app.get("/site/{site_id}")
-async def get_site(site_id: str):
-    path = generator.get_site_path(site_id)
-    if not path:
+async def get_site(site_id: str, request: Request):
+    key = await asyncio.to_thread(generator.get_site_key, site_id)
+    response = await stored_response(request, generator.storage, key, "text/html; charset=utf-8") if key else None
+    if not response:
         raise HTTPException(status_code=404, detail="Site not found")
-    with open(path, "r", encoding="utf-8") as f:
-        return Response(content=f.read(), media_type="text/html")
+    return response
+
+@app.get("/sites/{site_id}/similar")
+async def similar_sites(site_id: str, k: int = Query(5, ge=1, le=50)):
+    similar = await asyncio.to_thread(generator.similar_sites, site_id, k)
+    if similar is None:
+        raise HTTPException(status_code=404, detail="Site not found or has no embedding")
+    return {"site_id": site_id, "similar": similar}
 
 @app.get("/image/{filename}")
-async def get_image(filename: str):
-    if not filename.startswith("image_") or not filename.endswith(".png"):
+async def get_image(filename: str, request: Request):
+    image_type = media_type(filename)
+    if not image_type:
         raise HTTPException(status_code=400, detail="Invalid image filename")
     
-    image_path = os.path.join(SITES_DIR, filename)
-    if not os.path.exists(image_path):
+    # Image formats are already compressed, so no encoding negotiation
+    response = await stored_response(request, generator.storage, filename, image_type, compressible=False)
+    if not response:
         raise HTTPException(status_code=404, detail=f"Image not found: {filename}")
-    return FileResponse(image_path, media_type="image/png")
+    return response
+
+@app.get("/inference/stats")
+async def inference_stats():
+    return {"text": text_backend.stats(), "image": image_backend.stats(), "token_counter": token_counter.stats()}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    payload, content_type = metrics.render_metrics()
+    return Response(content=payload, media_type=content_type)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {**response_cache.stats(), "pages": file_cache.stats()}
 
 @app.get("/logs")
-async def logs():
-    return generator.get_logs()
+async def logs(offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)):
+    return await asyncio.to_thread(generator.get_logs, offset, limit)
 
 @app.get("/stats")
-async def stats():
-    logs = generator.get_logs()
-    
-    total_sites = len([log for log in logs if log.get("site_id")])
-    styles_count = {}
-    topics_count = {}
-    
-    for log in logs:
-        style = log.get("style")
-        topic = log.get("topic")
-        
-        if style:
-            styles_count[style] = styles_count.get(style, 0) + 1
-        if topic:
-            topics_count[topic] = topics_count.get(topic, 0) + 1
-    
-    return {
-        "total_sites": total_sites,
-        "total_requests": len(logs),
-        "styles_distribution": styles_count,
-        "popular_topics": dict(sorted(topics_count.items(), key=lambda x: x[1], reverse=True)[:10])
-    }
\ No newline at end of file
+async def stats(buckets: bool = Query(False, description="Include hourly/daily throughput buckets")):
+    registry = generator.registry
+    data = await asyncio.to_thread(registry.stats)
+    if buckets:
+        data["throughput"] = {
+            "hourly": await asyncio.to_thread(registry.throughput, "hour", 24),
+            "daily": await asyncio.to_thread(registry.throughput, "day", 30),
+        }
+    return data
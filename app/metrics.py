@@ -0,0 +1,33 @@
+# app/metrics.py
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+STAGES = ("planning", "image", "writing", "extraction", "rendering", "file_write", "export", "similarity")
+
+# From sub-millisecond CPU stages up to slow image calls
+STAGE_BUCKETS = (0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+stage_seconds = Histogram(
+    "site_stage_duration_seconds", "Wall time of one page generation stage", ["stage"], buckets=STAGE_BUCKETS
+)
+fallback_plans = Counter("site_fallback_plans_total", "Plans replaced by the default structure after a parse failure")
+fallback_sections = Counter("site_fallback_sections_total", "Sections filled from their brief because no text came back")
+inference_errors = Counter("inference_errors_total", "Inference calls that failed after retries", ["kind"])
+prompt_tokens = Counter("site_prompt_tokens_total", "Prompt tokens of saved pages", ["phase"])
+inference_tokens = Counter("inference_tokens_total", "Token usage reported by the provider", ["type"])
+pages = Counter("site_pages_total", "Pages finished, by outcome", ["outcome"])
+generations_in_flight = Gauge("site_generations_in_flight", "Pages currently being generated")
+# Sampled on scrape through set_function (see app.main)
+queue_depth = Gauge("site_queue_depth", "Work waiting for capacity", ["queue"])
+
+# Children are bound once; labels() on the hot path costs a lock and a dict lookup
+_stage_children = {stage: stage_seconds.labels(stage) for stage in STAGES}
+
+
+def stage_timer(stage: str):
+    """Context manager observing the duration of `stage` (sync or async code)."""
+    return _stage_children[stage].time()
+
+
+def render_metrics() -> tuple:
+    """Exposition payload and its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
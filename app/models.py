@@ -1,6 +1,6 @@
 # app/models.py
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Literal, Optional
 
 class GenerateRequest(BaseModel):
     """Request model for site generation."""
@@ -18,7 +18,14 @@ class GenerateRequest(BaseModel):
         le=30,
         description="Number of pages to generate (1-50)"
     )
-    
+
+    concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        le=10,
+        description="Max pages generated in parallel (capped by the server-wide MAX_CONCURRENT_PAGES)"
+    )
+
     style: str = Field(
         default="educational",
         description="Content style: educational, marketing, technical, minimalist, creative, casual"
@@ -45,6 +52,36 @@ class GenerateRequest(BaseModel):
         description="Top-p sampling parameter"
     )
     
+    writing_mode: Literal["single", "stream", "parallel"] = Field(
+        default="single",
+        description="single: one blocking writing call; stream: consume tokens and emit sections as they complete; "
+                    "parallel: one concurrent call per section with its own token budget"
+    )
+
+    similarity_mode: Literal["matrix", "top_k", "threshold"] = Field(
+        default="matrix",
+        description="matrix: full n×n scores; top_k: nearest neighbours per page; threshold: only pairs above similarity_threshold"
+    )
+
+    similarity_top_k: int = Field(
+        default=3,
+        ge=1,
+        le=29,
+        description="Neighbours per page when similarity_mode is top_k"
+    )
+
+    similarity_threshold: float = Field(
+        default=0.8,
+        ge=0.0,
+        le=1.0,
+        description="Minimum cosine similarity reported when similarity_mode is threshold"
+    )
+
+    use_cache: bool = Field(
+        default=True,
+        description="Reuse cached LLM/image responses for identical prompts; set False for fresh randomness"
+    )
+
     generate_image: bool = Field(
         default=True,
         description="Whether to generate an image for the site"
@@ -114,6 +151,7 @@ class GenerateRequest(BaseModel):
             "example": {
                 "topic": "Machine Learning",
                 "pages_count": 3,
+                "concurrency": 3,
                 "style": "educational",
                 "max_tokens": 1200,
                 "temperature": 0.8,
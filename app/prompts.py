@@ -83,30 +83,30 @@ Return the JSON now:"""
     return prompt
 
 
+STYLE_GUIDES = {
+    "educational": "Use clear explanations, define terms, provide examples. Write in an informative, structured way.",
+    "marketing": "Use persuasive language, emphasize benefits, include strong calls-to-action. Be energetic and engaging.",
+    "technical": "Include technical details, code examples if relevant, precise terminology. Be thorough and accurate.",
+    "minimalist": "Be concise and direct. Every word must count. Focus on essential information only.",
+    "creative": "Use vivid language, metaphors, storytelling. Make it memorable and engaging.",
+    "casual": "Write conversationally, use simple language. Be friendly and approachable."
+}
+
+WORD_COUNTS = {
+    "educational": "80-120",
+    "marketing": "60-90",
+    "technical": "100-150",
+    "minimalist": "40-70",
+    "creative": "90-130",
+    "casual": "70-100"
+}
+
+
 def writing_prompt(topic: str, style: str, title: str, sections: list) -> str:
     """Generate content prompt with style consideration."""
     style_instr = STYLE_INSTRUCTIONS.get(style, STYLE_INSTRUCTIONS["educational"])
-    
-    style_specific = {
-        "educational": "Use clear explanations, define terms, provide examples. Write in an informative, structured way.",
-        "marketing": "Use persuasive language, emphasize benefits, include strong calls-to-action. Be energetic and engaging.",
-        "technical": "Include technical details, code examples if relevant, precise terminology. Be thorough and accurate.",
-        "minimalist": "Be concise and direct. Every word must count. Focus on essential information only.",
-        "creative": "Use vivid language, metaphors, storytelling. Make it memorable and engaging.",
-        "casual": "Write conversationally, use simple language. Be friendly and approachable."
-    }
-    
-    style_guide = style_specific.get(style, style_specific["educational"])
-    
-    word_counts = {
-        "educational": "80-120",
-        "marketing": "60-90",
-        "technical": "100-150",
-        "minimalist": "40-70",
-        "creative": "90-130",
-        "casual": "70-100"
-    }
-    word_count = word_counts.get(style, "80-120")
+    style_guide = STYLE_GUIDES.get(style, STYLE_GUIDES["educational"])
+    word_count = WORD_COUNTS.get(style, "80-120")
     
     prompt = f"""You are writing content for a website titled "{title}" about {topic}.
 
@@ -144,4 +144,39 @@ Remember:
 
 Begin writing now:"""
     
-    return prompt
\ No newline at end of file
+    return prompt
+
+
+def section_context(topic: str, style: str, title: str, sections: list) -> str:
+    """Shared prefix for per-section writing calls.
+
+    Identical for every section of a page, so all calls see the same tone and
+    outline (and providers with prefix caching can reuse it).
+    """
+    style_instr = STYLE_INSTRUCTIONS.get(style, STYLE_INSTRUCTIONS["educational"])
+    style_guide = STYLE_GUIDES.get(style, STYLE_GUIDES["educational"])
+    outline = "\n".join(
+        f"{i}. {s.get('heading', 'Section')} — {s.get('brief', '')}" for i, s in enumerate(sections, 1)
+    )
+    return f"""You are writing content for a website titled "{title}" about {topic}.
+
+STYLE: {style} - {style_instr}
+APPROACH: {style_guide}
+
+The page has these sections:
+{outline}
+
+Other writers handle the other sections; do not repeat their material.
+"""
+
+
+def section_prompt(context: str, style: str, topic: str, section: dict) -> str:
+    """Per-section suffix appended to `section_context`."""
+    word_count = WORD_COUNTS.get(style, "80-120")
+    return f"""{context}
+Write ONLY the section "{section.get('heading', 'Section')}".
+Purpose: {section.get('brief', '')}
+Write {word_count} words that fit the {style} style. Be specific to {topic}.
+Return the paragraph text only: no heading, no ### markers, no preamble.
+
+Begin writing now:"""
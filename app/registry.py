@@ -0,0 +1,275 @@
+# app/registry.py
+import os
+import time
+import threading
+from typing import Optional
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, Float, Text,
+    select, insert, update, func, desc, and_, literal
+)
+from app.db import make_engine
+from app.logger import logger
+
+metadata = MetaData()
+
+sites = Table(
+    "sites", metadata,
+    Column("site_id", String(32), primary_key=True),
+    Column("topic", String(200), nullable=False, index=True),
+    Column("style", String(32), nullable=False, index=True),
+    Column("title", Text),
+    Column("meta_description", Text),
+    Column("image_path", String(255)),
+    Column("file_path", String(512), nullable=False),
+    Column("sections_count", Integer),
+    Column("temperature_used", Float),
+    Column("planning_tokens", Integer),
+    Column("writing_tokens", Integer),
+    Column("created_at", String(32), nullable=False, index=True),
+)
+
+requests = Table(
+    "requests", metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("topic", String(200), nullable=False, index=True),
+    Column("style", String(32), nullable=False),
+    Column("count", Integer, nullable=False),
+    Column("created_at", String(32), nullable=False, index=True),
+)
+
+# Pages saved under the "flag" duplicate policy and the earlier page they resemble
+duplicates = Table(
+    "duplicates", metadata,
+    Column("site_id", String(32), primary_key=True),
+    Column("duplicate_of", String(32), nullable=False, index=True),
+    Column("score", Float, nullable=False),
+)
+
+# Aggregates maintained incrementally in the same transaction as each insert
+totals = Table(
+    "totals", metadata,
+    Column("name", String(32), primary_key=True),
+    Column("value", Integer, nullable=False),
+)
+
+style_counts = Table(
+    "style_counts", metadata,
+    Column("style", String(32), primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+
+topic_counts = Table(
+    "topic_counts", metadata,
+    Column("topic", String(200), primary_key=True),
+    Column("count", Integer, nullable=False, index=True),
+)
+
+throughput_buckets = Table(
+    "throughput", metadata,
+    Column("granularity", String(8), primary_key=True),  # "hour" | "day"
+    Column("bucket", String(16), primary_key=True),      # "2025-10-15T10" | "2025-10-15"
+    Column("pages", Integer, nullable=False),
+    Column("planning_tokens", Integer, nullable=False),
+    Column("writing_tokens", Integer, nullable=False),
+    Column("temperature_sum", Float, nullable=False),
+)
+
+SITE_FIELDS = [c.name for c in sites.columns]
+BUCKETS = {"hour": 13, "day": 10}  # prefix length of the ISO timestamp
+TOP_TOPICS = 10
+# How stale /stats may be with respect to other processes writing the same database
+STATS_REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", "5"))
+
+
+def _bump(conn, table: Table, keys: dict, increments: dict):
+    """Add `increments` to the row identified by `keys`, creating it if needed."""
+    condition = and_(*(table.c[name] == value for name, value in keys.items()))
+    result = conn.execute(
+        update(table).where(condition).values({table.c[name]: table.c[name] + inc for name, inc in increments.items()})
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(table).values(**keys, **increments))
+
+
+class StatsSnapshot:
+    """In-memory copy of the aggregates so /stats rarely touches the database.
+
+    The top-k topics are kept as a small dict: an incremented topic either is
+    already in it or replaces the current minimum, so each update is O(k).
+    Only this process's writes are applied incrementally; see
+    SiteRegistry.stats for how other workers' writes are picked up.
+    """
+
+    def __init__(self, k: int = TOP_TOPICS):
+        self.k = k
+        self.total_sites = 0
+        self.total_requests = 0
+        self.styles = {}
+        self.top_topics = {}
+
+    def add_site(self, style: str, topic: str, topic_count: int):
+        self.total_sites += 1
+        self.styles[style] = self.styles.get(style, 0) + 1
+        if topic in self.top_topics or len(self.top_topics) < self.k:
+            self.top_topics[topic] = topic_count
+            return
+        weakest = min(self.top_topics, key=self.top_topics.get)
+        if topic_count > self.top_topics[weakest]:
+            del self.top_topics[weakest]
+            self.top_topics[topic] = topic_count
+
+    def popular_topics(self) -> dict:
+        return dict(sorted(self.top_topics.items(), key=lambda x: x[1], reverse=True))
+
+    def as_dict(self) -> dict:
+        return {
+            "total_sites": self.total_sites,
+            "total_requests": self.total_requests,
+            "styles_distribution": dict(self.styles),
+            "popular_topics": self.popular_topics(),
+        }
+
+
+class SiteRegistry:
+    """Persistent, indexed record of every generated site and generation request."""
+
+    def __init__(self, url: str, top_k: int = TOP_TOPICS, refresh_seconds: float = STATS_REFRESH_SECONDS):
+        self.engine = make_engine(url)
+        metadata.create_all(self.engine)
+        self._lock = threading.Lock()
+        self.snapshot = StatsSnapshot(top_k)
+        self.refresh_seconds = refresh_seconds
+        self._load_snapshot()
+        logger.info(f"Site registry ready: {url} ({self.snapshot.total_sites} sites)")
+
+    def _load_snapshot(self):
+        """Replace the snapshot with the aggregate tables, which every process writes."""
+        # Under the lock so that a write of this process cannot land between the read and the swap
+        with self._lock, self.engine.begin() as conn:
+            stored = dict(conn.execute(select(totals.c.name, totals.c.value)).all())
+            if not stored:
+                self._rebuild_aggregates(conn)
+                stored = dict(conn.execute(select(totals.c.name, totals.c.value)).all())
+            self.snapshot.total_sites = stored.get("sites", 0)
+            self.snapshot.total_requests = stored.get("requests", 0)
+            self.snapshot.styles = dict(conn.execute(select(style_counts.c.style, style_counts.c.count)).all())
+            self.snapshot.top_topics = dict(conn.execute(
+                select(topic_counts.c.topic, topic_counts.c.count)
+                .order_by(desc(topic_counts.c.count)).limit(self.snapshot.k)
+            ).all())
+            self._publish()
+            self._loaded_at = time.monotonic()
+
+    def _publish(self):
+        # Readers take this reference without the lock; it is replaced, never mutated
+        self._published = self.snapshot.as_dict()
+
+    def _rebuild_aggregates(self, conn):
+        """One-off backfill for registries created before aggregates existed."""
+        conn.execute(insert(totals).values(name="sites", value=select(func.count()).select_from(sites).scalar_subquery()))
+        conn.execute(insert(totals).values(name="requests", value=select(func.count()).select_from(requests).scalar_subquery()))
+        conn.execute(insert(style_counts).from_select(
+            ["style", "count"], select(sites.c.style, func.count()).group_by(sites.c.style)
+        ))
+        conn.execute(insert(topic_counts).from_select(
+            ["topic", "count"], select(sites.c.topic, func.count()).group_by(sites.c.topic)
+        ))
+        for granularity, length in BUCKETS.items():
+            bucket = func.substr(sites.c.created_at, 1, length)
+            conn.execute(insert(throughput_buckets).from_select(
+                ["granularity", "bucket", "pages", "planning_tokens", "writing_tokens", "temperature_sum"],
+                select(
+                    literal(granularity), bucket, func.count(),
+                    func.coalesce(func.sum(sites.c.planning_tokens), 0),
+                    func.coalesce(func.sum(sites.c.writing_tokens), 0),
+                    func.coalesce(func.sum(sites.c.temperature_used), 0.0),
+                ).group_by(bucket)
+            ))
+
+    def record_site(self, record: dict):
+        values = {field: record.get(field) for field in SITE_FIELDS}
+        created_at = values["created_at"]
+        with self._lock:
+            with self.engine.begin() as conn:
+                conn.execute(insert(sites).values(**values))
+                if record.get("duplicate_of"):
+                    conn.execute(insert(duplicates).values(
+                        site_id=values["site_id"], duplicate_of=record["duplicate_of"], score=record["duplicate_score"]
+                    ))
+                _bump(conn, totals, {"name": "sites"}, {"value": 1})
+                _bump(conn, style_counts, {"style": values["style"]}, {"count": 1})
+                _bump(conn, topic_counts, {"topic": values["topic"]}, {"count": 1})
+                for granularity, length in BUCKETS.items():
+                    _bump(conn, throughput_buckets, {"granularity": granularity, "bucket": created_at[:length]}, {
+                        "pages": 1,
+                        "planning_tokens": values["planning_tokens"] or 0,
+                        "writing_tokens": values["writing_tokens"] or 0,
+                        "temperature_sum": values["temperature_used"] or 0.0,
+                    })
+                topic_count = conn.execute(
+                    select(topic_counts.c.count).where(topic_counts.c.topic == values["topic"])
+                ).scalar_one()
+            self.snapshot.add_site(values["style"], values["topic"], topic_count)
+            self._publish()
+
+    def record_request(self, topic: str, style: str, count: int, created_at: str):
+        with self._lock:
+            with self.engine.begin() as conn:
+                conn.execute(insert(requests).values(topic=topic, style=style, count=count, created_at=created_at))
+                _bump(conn, totals, {"name": "requests"}, {"value": 1})
+            self.snapshot.total_requests += 1
+            self._publish()
+
+    def get_site(self, site_id: str) -> Optional[dict]:
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(sites, duplicates.c.duplicate_of, duplicates.c.score.label("duplicate_score"))
+                .outerjoin(duplicates, duplicates.c.site_id == sites.c.site_id)
+                .where(sites.c.site_id == site_id)
+            ).mappings().first()
+        return dict(row) if row else None
+
+    def list_sites(self, offset: int = 0, limit: int = 50) -> list:
+        """Newest sites first."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(sites).order_by(desc(sites.c.created_at)).offset(offset).limit(limit)
+            ).mappings()
+            return [dict(row) for row in rows]
+
+    def count_sites(self) -> int:
+        return self.snapshot.total_sites
+
+    def count_requests(self) -> int:
+        return self.snapshot.total_requests
+
+    def throughput(self, granularity: str = "hour", limit: int = 24) -> list:
+        """Most recent `limit` buckets, oldest first."""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(throughput_buckets)
+                .where(throughput_buckets.c.granularity == granularity)
+                .order_by(desc(throughput_buckets.c.bucket)).limit(limit)
+            ).mappings().all()
+        return [
+            {
+                "bucket": row["bucket"],
+                "pages": row["pages"],
+                "planning_tokens": row["planning_tokens"],
+                "writing_tokens": row["writing_tokens"],
+                "avg_temperature": round(row["temperature_sum"] / row["pages"], 3) if row["pages"] else None,
+            }
+            for row in reversed(rows)
+        ]
+
+    def stats(self) -> dict:
+        """Aggregates from the in-memory snapshot; independent of history size.
+
+        The snapshot is reloaded from the aggregate tables once it is older
+        than `refresh_seconds`, so with several workers on one database the
+        figures trail the other workers' writes by at most that long. Blocking
+        while it reloads: call from a worker thread.
+        """
+        if time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self._load_snapshot()
+        return dict(self._published)
@@ -0,0 +1,100 @@
+# app/rendering.py
+import os
+import re
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, Template
+from app.logger import logger
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
+# Compiled templates on disk, shared by every worker process
+TEMPLATE_CACHE_DIR = os.getenv("TEMPLATE_CACHE_DIR", "./cache/templates")
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "false").lower() in ("1", "true", "yes")
+MINIFY_HTML = os.getenv("MINIFY_HTML", "true").lower() in ("1", "true", "yes")
+
+TEMPLATE_MAP = {
+    "educational": "educational.html",
+    "marketing": "marketing.html",
+    "technical": "technical.html",
+    "minimalist": "minimalist.html",
+    "creative": "creative.html",
+    "casual": "base.html",
+}
+DEFAULT_TEMPLATE = "educational.html"
+
+_VERBATIM = re.compile(r"(<(pre|textarea|script)\b.*?</\2>)", re.DOTALL | re.IGNORECASE)
+_STYLE = re.compile(r"(<style\b[^>]*>)(.*?)(</style>)", re.DOTALL | re.IGNORECASE)
+_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+_CSS_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_CSS_STRING = re.compile(r"(\"[^\"]*\"|'[^']*')")
+_CSS_PUNCTUATION = re.compile(r"\s*([{};,])\s*|:\s+")
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = re.compile(r"<\0(\d+)\0>")
+
+
+def _minify_css(css: str) -> str:
+    # Odd-indexed parts are string literals (content: ', '), kept as written
+    parts = _CSS_STRING.split(_CSS_COMMENT.sub("", css))
+    for i in range(0, len(parts), 2):
+        parts[i] = _CSS_PUNCTUATION.sub(lambda m: m.group(1) or ":", _WHITESPACE.sub(" ", parts[i]))
+    return "".join(parts).strip()
+
+
+def minify_html(html: str) -> str:
+    """Drop comments and collapse whitespace; <pre>, <textarea> and <script> are left as written.
+
+    Runs of whitespace become one space rather than nothing, since between
+    inline elements it separates words. Also valid on template source.
+    """
+    verbatim = []
+
+    def hold(match):
+        verbatim.append(match.group(1))
+        return f"<\0{len(verbatim) - 1}\0>"
+
+    text = _COMMENT.sub("", _VERBATIM.sub(hold, html))
+    text = _STYLE.sub(lambda m: m.group(1) + _minify_css(m.group(2)) + m.group(3), text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    return _PLACEHOLDER.sub(lambda m: verbatim[int(m.group(1))], text)
+
+
+class MinifyingLoader(FileSystemLoader):
+    """Minifies template source once, before compilation, instead of every rendered page."""
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = super().get_source(environment, template)
+        return minify_html(source), filename, uptodate
+
+
+def _bytecode_cache():
+    try:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        return FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache disabled ({e})")
+        return None
+
+
+# The bytecode cache is attached by precompile_templates, so importing this module writes nothing
+env = Environment(
+    loader=(MinifyingLoader if MINIFY_HTML else FileSystemLoader)(TEMPLATES_DIR),
+    auto_reload=TEMPLATE_AUTO_RELOAD,
+)
+
+_templates = {}
+
+
+def precompile_templates() -> dict:
+    """Compile (or load from the bytecode cache) every style's template; style -> Template."""
+    if not _templates:
+        env.bytecode_cache = env.bytecode_cache or _bytecode_cache()
+        by_name = {name: env.get_template(name) for name in set(TEMPLATE_MAP.values()) | {DEFAULT_TEMPLATE}}
+        _templates.update({style: by_name[name] for style, name in TEMPLATE_MAP.items()})
+        _templates[None] = by_name[DEFAULT_TEMPLATE]
+        logger.info(f"Templates ready: {', '.join(sorted(by_name))}")
+    return _templates
+
+
+def template_for(style: str) -> Template:
+    templates = _templates or precompile_templates()
+    if TEMPLATE_AUTO_RELOAD:
+        return env.get_template(TEMPLATE_MAP.get(style.lower(), DEFAULT_TEMPLATE))
+    return templates.get(style.lower(), templates[None])
@@ -0,0 +1,191 @@
+# app/scheduler.py
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+from app.logger import logger
+
+INTERACTIVE = 0
+BULK = 1
+
+# Lane of the current task; background jobs set BULK and everything they spawn inherits it
+inference_priority: ContextVar[int] = ContextVar("inference_priority", default=INTERACTIVE)
+
+MAX_RETRIES = int(os.getenv("INFERENCE_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("INFERENCE_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.getenv("INFERENCE_BACKOFF_MAX", "30"))
+
+
+class InferenceError(RuntimeError):
+    """An inference call failed for good (non-retryable error or retries exhausted)."""
+
+
+class TokenBucket:
+    """Continuously refilled bucket; `rate` units per second, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def consume(self, amount: float):
+        if self.rate > 0:
+            self.level -= min(amount, self.capacity)
+
+    def drain(self):
+        if self.rate > 0:
+            self._refill()
+            self.level = min(self.level, 0.0)
+
+
+class Scheduler:
+    """Admission control in front of one model endpoint.
+
+    A call is admitted when an in-flight slot is free and both buckets
+    (requests/sec and tokens/min; a rate of 0 disables a bucket) can pay for
+    it. Waiters are served strictly by lane, then FIFO, so interactive
+    requests overtake queued bulk work without preempting calls in flight.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, name: str, requests_per_sec: float, tokens_per_min: float, max_inflight: int):
+        self.name = name
+        self.requests = TokenBucket(requests_per_sec, max(1.0, requests_per_sec))
+        self.tokens = TokenBucket(tokens_per_min / 60.0, tokens_per_min)
+        self.max_inflight = max(1, max_inflight)
+        self.inflight = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._timer = None
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _dispatch(self):
+        self._timer = None
+        while self._waiters:
+            _, _, cost, future = self._waiters[0]
+            if future.done():  # cancelled while waiting
+                heapq.heappop(self._waiters)
+                continue
+            if self.inflight >= self.max_inflight:
+                return  # release() dispatches again
+            wait = max(self._paused_until - time.monotonic(), self.requests.wait_time(1), self.tokens.wait_time(cost))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.requests.consume(1)
+            self.tokens.consume(cost)
+            self.inflight += 1
+            future.set_result(None)
+
+    def _kick(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 0, priority: Optional[int] = None):
+        """Hold an admitted call for the duration of the block."""
+        priority = inference_priority.get() if priority is None else priority
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), cost, future))
+        self._kick()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # admitted just as we were cancelled
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.inflight -= 1
+        self._kick()
+
+    def throttle(self, seconds: float):
+        """Upstream said slow down: hold all admissions and empty the request bucket."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.requests.drain()
+        logger.warning(f"{self.name}: rate limited upstream, pausing admissions for {seconds:.1f}s")
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """429, 5xx and transport-level failures (timeouts, dropped connections)."""
+    status = _status_code(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)) or \
+        type(exc).__module__.startswith("httpx")
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    value = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(max, base * 2^attempt))."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def next_delay(scheduler: Scheduler, exc: BaseException, attempt: int) -> float:
+    """Backoff before retry `attempt + 1`; a 429 also pauses every caller of the scheduler."""
+    delay = backoff_delay(attempt)
+    if _status_code(exc) == 429:
+        delay = max(delay, retry_after(exc) or 0.0)
+        scheduler.throttle(delay)
+    return delay
+
+
+async def call_with_retries(scheduler: Scheduler, cost: float, call, description: str):
+    """Run `await call()` inside a scheduler slot, retrying retryable failures.
+
+    Raises InferenceError once the error is permanent or MAX_RETRIES is used up.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            async with scheduler.slot(cost):
+                return await call()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not is_retryable(e) or attempt == MAX_RETRIES:
+                raise InferenceError(f"{description} failed after {attempt + 1} attempt(s): {e}") from e
+            delay = next_delay(scheduler, e, attempt)
+            logger.warning(f"{description} failed ({e}); retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,194 @@
+# app/serving.py
+import os
+import gzip
+import asyncio
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+from app.logger import logger
+
+try:
+    import brotli
+except ImportError:  # gzip-only without the optional brotli package
+    brotli = None
+
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PAGE_CACHE_MAX_ITEM_BYTES = int(os.getenv("PAGE_CACHE_MAX_ITEM_BYTES", str(1024 * 1024)))
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred first; each variant is stored next to the original as <file><suffix>
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def compressed_variants(data: bytes) -> dict:
+    """suffix -> body of the .gz (and .br when brotli is installed) variants of `data`."""
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+    return variants
+
+
+class FileCache:
+    """Bounded LRU of small file bodies, keyed by path and validated by mtime."""
+
+    def __init__(self, max_bytes: int = PAGE_CACHE_MAX_BYTES, max_item_bytes: int = PAGE_CACHE_MAX_ITEM_BYTES):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # path -> (mtime_ns, bytes)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def read(self, path: str, mtime_ns: int) -> bytes:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == mtime_ns:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+        self.misses += 1
+        with open(path, "rb") as f:
+            data = f.read()
+        with self._lock:
+            if path in self._entries:
+                self._total_bytes -= len(self._entries.pop(path)[1])
+            self._entries[path] = (mtime_ns, data)
+            self._total_bytes += len(data)
+            while self._total_bytes > self.max_bytes and self._entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._total_bytes -= len(evicted)
+        return data
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self._total_bytes}
+
+
+file_cache = FileCache()
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for item in header.split(","):
+        token, _, params = item.strip().partition(";")
+        quality = params.replace(" ", "").removeprefix("q=")
+        try:
+            if token and (not quality or float(quality) > 0):
+                accepted.add(token.strip().lower())
+        except ValueError:
+            continue
+    return accepted
+
+
+def _not_modified(request: Request, etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return etag in candidates or "*" in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def file_response(request: Request, path: str, media_type: str,
+                        cache_control: str = IMMUTABLE, compressible: bool = True) -> Optional[Response]:
+    """Serve a file with ETag/Last-Modified validation and precompressed variants.
+
+    Returns None when the file does not exist. Small bodies come from the
+    in-memory LRU; anything larger is streamed from disk by FileResponse.
+    The stat calls and reads run in a worker thread.
+    """
+    return await asyncio.to_thread(_file_response, request, path, media_type, cache_control, compressible)
+
+
+def _file_response(request: Request, path: str, media_type: str,
+                   cache_control: str, compressible: bool) -> Optional[Response]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+
+    serve_path, serve_stat, encoding = path, stat, None
+    if compressible:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for name, suffix in ENCODINGS:
+            if name in accepted:
+                try:
+                    serve_stat = os.stat(path + suffix)
+                except FileNotFoundError:
+                    continue
+                serve_path, encoding = path + suffix, name
+                break
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    if serve_stat.st_size <= file_cache.max_item_bytes:
+        body = file_cache.read(serve_path, serve_stat.st_mtime_ns)
+        return Response(content=body, media_type=media_type, headers=headers)
+    logger.info(f"Streaming large file from disk: {serve_path}")
+    return FileResponse(serve_path, media_type=media_type, headers=headers, stat_result=serve_stat)
+
+
+def _local_response(request: Request, storage, key: str, media_type: str,
+                    cache_control: str, compressible: bool) -> Optional[Response]:
+    path = storage.local_path(key)
+    return _file_response(request, path, media_type, cache_control, compressible) if path else None
+
+
+async def stored_response(request: Request, storage, key: str, media_type: str,
+                          cache_control: str = IMMUTABLE, compressible: bool = True) -> Optional[Response]:
+    """file_response for an object in a storage backend (see app.storage).
+
+    Objects on the local filesystem go through file_response; remote objects
+    are fetched, preferring a stored compressed variant, and validated by the
+    backend's ETag. Returns None when the object does not exist.
+    """
+    if storage.local:
+        return await asyncio.to_thread(_local_response, request, storage, key, media_type, cache_control, compressible)
+
+    blob, encoding = None, None
+    if compressible:
+        accepted = _accepted_encodings(request.headers.get("accept-encoding", ""))
+        for name, suffix in ENCODINGS:
+            if name in accepted and (blob := await storage.get(key + suffix)) is not None:
+                encoding = name
+                break
+    if blob is None:
+        blob = await storage.get(key)
+        if blob is None:
+            return None
+
+    headers = {
+        "ETag": blob.etag,
+        "Last-Modified": formatdate(blob.modified, usegmt=True),
+        "Cache-Control": cache_control,
+    }
+    if compressible:
+        headers["Vary"] = "Accept-Encoding"
+    if _not_modified(request, blob.etag, blob.modified):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=blob.data, media_type=media_type, headers=headers)
@@ -0,0 +1,269 @@
+# app/storage.py
+"""Where generated pages and images are kept.
+
+Objects are addressed by key (`site_<id>.html`, `img_<hash>_<w>.webp`, and
+their `.gz`/`.br` variants), never by path, so the layout and the backend can
+change without touching callers:
+
+    local  files under SITES_DIR in hash-prefix directories (ab/cd/<key>)
+    s3     an S3-compatible bucket (AWS S3, MinIO, R2, ...), SigV4-signed over httpx
+"""
+import os
+import hmac
+import contextlib
+import uuid
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import NamedTuple, Optional
+from urllib.parse import quote
+import aiofiles
+import aiofiles.os
+import httpx
+from dotenv import load_dotenv
+from app.backends import LoopBound
+from app.inference import SITES_DIR
+from app.serving import ENCODINGS
+from app.logger import logger
+
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()  # local | s3
+# Levels of two-hex-character directories; 2 gives 65536 leaf directories, 0 the old flat layout
+STORAGE_SHARD_DEPTH = int(os.getenv("STORAGE_SHARD_DEPTH", "2"))
+
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "http://localhost:9000")
+S3_BUCKET = os.getenv("S3_BUCKET", "sites")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID") or os.getenv("AWS_ACCESS_KEY_ID", "")
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY") or os.getenv("AWS_SECRET_ACCESS_KEY", "")
+S3_TIMEOUT = float(os.getenv("S3_TIMEOUT", "30"))
+
+# A compressed variant is stored next to the object it encodes
+_VARIANT_SUFFIXES = tuple(suffix for _, suffix in ENCODINGS)
+_EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+class Blob(NamedTuple):
+    data: bytes
+    etag: str
+    modified: float  # unix time
+
+
+def site_key(site_id: str) -> str:
+    return f"site_{site_id}.html"
+
+
+def shard_dirs(key: str, depth: int = STORAGE_SHARD_DEPTH) -> list:
+    """Hash-prefix directories for `key`; compressed variants land with their original."""
+    base = key
+    for suffix in _VARIANT_SUFFIXES:
+        base = base.removesuffix(suffix)
+    digest = hashlib.sha256(base.encode("utf-8")).hexdigest()
+    return [digest[2 * level:2 * level + 2] for level in range(depth)]
+
+
+def _check_key(key: str) -> str:
+    if not key or "/" in key or "\\" in key or key.startswith("."):
+        raise ValueError(f"Invalid storage key: {key!r}")
+    return key
+
+
+class Storage(ABC):
+    """Interface of a storage backend."""
+
+    name = "base"
+    local = False  # objects are plain files reachable through local_path
+
+    @abstractmethod
+    def location(self, key: str) -> str:
+        """Where the object lives, for humans and the registry's file_path."""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of an existing object on the local filesystem, if the backend has one."""
+        return None
+
+    @abstractmethod
+    async def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        ...
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Blob]:
+        ...
+
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        ...
+
+    async def aclose(self):
+        pass
+
+
+class LocalStorage(Storage):
+    """Files under `root`, spread over hash-prefix directories.
+
+    Writes go to a temporary file that is renamed into place, so readers never
+    see a partial object. Files from the flat layout (directly under `root`)
+    are still found.
+    """
+
+    name = "local"
+    local = True
+
+    def __init__(self, root: str = SITES_DIR, shard_depth: int = STORAGE_SHARD_DEPTH):
+        self.root = root
+        self.shard_depth = max(0, shard_depth)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *shard_dirs(_check_key(key), self.shard_depth), key)
+
+    def _candidates(self, key: str) -> list:
+        path = self.path(key)
+        return [path, os.path.join(self.root, key)] if self.shard_depth else [path]
+
+    def location(self, key: str) -> str:
+        return self.path(key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        return next((path for path in self._candidates(key) if os.path.exists(path)), None)
+
+    async def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        path = self.path(key)
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(data)
+            await aiofiles.os.replace(tmp_path, path)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp_path)  # no await: this also runs on cancellation
+            raise
+
+    async def get(self, key: str) -> Optional[Blob]:
+        for path in self._candidates(key):
+            try:
+                async with aiofiles.open(path, "rb") as f:
+                    stat = await aiofiles.os.stat(path)
+                    data = await f.read()
+            except FileNotFoundError:
+                continue
+            return Blob(data, f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"', stat.st_mtime)
+        return None
+
+    async def exists(self, key: str) -> bool:
+        for path in self._candidates(key):
+            if await aiofiles.os.path.exists(path):
+                return True
+        return False
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_v4(method: str, url: str, headers: dict, payload_hash: str, region: str,
+            access_key: str, secret_key: str, now: Optional[datetime] = None, service: str = "s3") -> dict:
+    """`headers` plus the host, x-amz-* and Authorization headers of an AWS Signature V4 request."""
+    parsed = httpx.URL(url)
+    amz_date = (now or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    signed = {name.lower(): " ".join(str(value).split()) for name, value in headers.items()}
+    signed.update({"host": parsed.netloc.decode("ascii"), "x-amz-date": amz_date, "x-amz-content-sha256": payload_hash})
+    names = sorted(signed)
+    query = "&".join(sorted(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}" for k, v in parsed.params.multi_items()))
+    canonical_request = "\n".join([
+        method,
+        parsed.raw_path.decode("ascii").split("?")[0] or "/",
+        query,
+        "".join(f"{name}:{signed[name]}\n" for name in names),
+        ";".join(names),
+        payload_hash,
+    ])
+    scope = f"{amz_date[:8]}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+    ])
+    key = _hmac(f"AWS4{secret_key}".encode("utf-8"), amz_date[:8])
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+    signed["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, SignedHeaders={';'.join(names)}, Signature={signature}"
+    )
+    return signed
+
+
+class S3Storage(Storage):
+    """Objects in an S3-compatible bucket, addressed path-style (<endpoint>/<bucket>/<key>).
+
+    Keys keep the hash-prefix layout, which also spreads load across S3's
+    per-prefix request limits. Without credentials requests go unsigned.
+    """
+
+    name = "s3"
+
+    def __init__(self, endpoint_url: str = S3_ENDPOINT_URL, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX,
+                 region: str = S3_REGION, access_key: str = S3_ACCESS_KEY_ID, secret_key: str = S3_SECRET_ACCESS_KEY,
+                 shard_depth: int = STORAGE_SHARD_DEPTH):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.shard_depth = max(0, shard_depth)
+        self._http = LoopBound(lambda: httpx.AsyncClient(timeout=S3_TIMEOUT))
+
+    def object_key(self, key: str) -> str:
+        return "/".join(filter(None, [self.prefix, *shard_dirs(_check_key(key), self.shard_depth), key]))
+
+    def location(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self.object_key(key)}"
+
+    async def _request(self, method: str, key: str, data: bytes = b"", headers: Optional[dict] = None) -> httpx.Response:
+        url = f"{self.endpoint_url}/{quote(self.bucket)}/{quote(self.object_key(key))}"
+        headers = headers or {}
+        if self.access_key:
+            payload_hash = hashlib.sha256(data).hexdigest() if data else _EMPTY_SHA256
+            headers = sign_v4(method, url, headers, payload_hash, self.region, self.access_key, self.secret_key)
+        return await self._http.get().request(method, url, content=data or None, headers=headers)
+
+    async def put(self, key: str, data: bytes, content_type: Optional[str] = None):
+        headers = {"content-type": content_type} if content_type else {}
+        response = await self._request("PUT", key, data, headers)
+        response.raise_for_status()
+
+    async def get(self, key: str) -> Optional[Blob]:
+        response = await self._request("GET", key)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        modified = response.headers.get("last-modified")
+        return Blob(
+            response.content,
+            response.headers.get("etag", ""),
+            parsedate_to_datetime(modified).timestamp() if modified else 0.0,
+        )
+
+    async def exists(self, key: str) -> bool:
+        response = await self._request("HEAD", key)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    async def aclose(self):
+        await self._http.aclose(lambda client: client.aclose())
+
+
+def make_storage(kind: str = STORAGE_BACKEND) -> Storage:
+    if kind == "s3":
+        storage = S3Storage()
+    elif kind == "local":
+        storage = LocalStorage()
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {kind!r} (expected local or s3)")
+    logger.info(f"Storage backend: {storage.name}")
+    return storage
@@ -0,0 +1,80 @@
+# app/stub_server.py
+"""OpenAI-compatible HTTP front for StubBackend, for load tests over a real network hop.
+
+    uvicorn app.stub_server:app --port 8080
+    INFERENCE_BACKEND=openai OPENAI_BASE_URL=http://localhost:8080/v1 uvicorn app.main:app
+
+Latency and error rates come from the STUB_* environment variables.
+"""
+import io
+import json
+import time
+import base64
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.backends import StubBackend, StubHTTPError
+
+app = FastAPI(title="LLM Site Generator inference stub")
+stub = StubBackend()
+
+SAMPLING_KEYS = ("temperature", "top_p", "max_tokens")
+
+
+def _error(exc: StubHTTPError) -> JSONResponse:
+    return JSONResponse(status_code=exc.response.status_code, content={"error": {"message": str(exc)}})
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+    sampling = {key: body[key] for key in SAMPLING_KEYS if key in body}
+    model = body.get("model", stub.text_model)
+
+    if not body.get("stream"):
+        try:
+            text, usage = await stub.complete(prompt, sampling)
+        except StubHTTPError as e:
+            return _error(e)
+        return {
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {**usage, "total_tokens": usage["prompt_tokens"] + usage["completion_tokens"]},
+        }
+
+    deltas = stub.stream(prompt, sampling)
+    try:
+        first = await deltas.__anext__()
+    except StubHTTPError as e:
+        return _error(e)
+    except StopAsyncIteration:
+        first = ""
+
+    async def events():
+        delta = first
+        while True:
+            chunk = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": delta}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            try:
+                delta = await deltas.__anext__()
+            except StopAsyncIteration:
+                break
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/images/generations")
+async def images_generations(request: Request):
+    body = await request.json()
+    width, _, height = body.get("size", "512x512").partition("x")
+    try:
+        image = await stub.image(body.get("prompt", ""), {"width": int(width), "height": int(height or width)})
+    except StubHTTPError as e:
+        return _error(e)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return {"created": int(time.time()), "data": [{"b64_json": base64.b64encode(buffer.getvalue()).decode("ascii")}]}
@@ -1,11 +1,78 @@
 # app/utils.py
 import os
+import re
 import uuid
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from transformers import AutoTokenizer
+from typing import Callable
 from bs4 import BeautifulSoup
+from app.logger import logger
 
-tokenizer = AutoTokenizer.from_pretrained("mistralai/Mixtral-8x7B-Instruct-v0.1")
+TOKENIZER_NAME = os.getenv("TOKENIZER_NAME", "mistralai/Mixtral-8x7B-Instruct-v0.1")
+TOKEN_COUNT_MODE = os.getenv("TOKEN_COUNT_MODE", "exact").lower()  # exact | estimate
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "8192"))  # memoized prompt fragments
+
+
+class LazyResource:
+    """Expensive object (model, tokenizer) loaded on first use, at most once.
+
+    A failed load is not retried for `retry_after` seconds so that callers
+    with a fallback do not pay for the failing download on every call.
+    """
+
+    registry = {}
+
+    def __init__(self, name: str, loader: Callable, retry_after: float = 60.0):
+        self.name = name
+        self._loader = loader
+        self._value = None
+        self._lock = threading.Lock()
+        self._retry_after = retry_after
+        self._failed_at = None
+        LazyResource.registry[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def get(self):
+        if self._value is None:
+            with self._lock:
+                if self._value is None:
+                    if self._failed_at and time.monotonic() - self._failed_at < self._retry_after:
+                        raise RuntimeError(f"{self.name} is unavailable (last load failed)")
+                    try:
+                        self._value = self._loader()
+                    except Exception:
+                        self._failed_at = time.monotonic()
+                        raise
+                    logger.info(f"Lazy resource loaded: {self.name}")
+        return self._value
+
+
+def warm_up_resources() -> dict:
+    """Load every registered lazy resource; return name -> loaded flag."""
+    for name, resource in LazyResource.registry.items():
+        try:
+            resource.get()
+        except Exception as e:
+            # Stays lazy: the next real use retries the load
+            logger.error(f"Warm-up failed for {name}: {e}")
+    return resources_status()
+
+
+def resources_status() -> dict:
+    return {name: resource.loaded for name, resource in LazyResource.registry.items()}
+
+
+def _load_tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+
+
+tokenizer = LazyResource("tokenizer", _load_tokenizer)
 
 
 def make_uuid():
@@ -18,10 +85,88 @@ def ensure_sites_dir(path="./sites"):
     os.makedirs(path, exist_ok=True)
     return path
 
-def count_tokens(text: str) -> int:
-    if not text:
-        return 0
-    return len(tokenizer.encode(text))
+# Split after blank lines: prompts are static instruction blocks interleaved with per-page values
+_FRAGMENT_BOUNDARY = re.compile(r"(?<=\n\n)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap count (~4 characters per token) for hot paths and when the tokenizer is unavailable."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class TokenCounter:
+    """Prompt token counts with per-fragment memoization.
+
+    Texts are split into blank-line separated fragments; each distinct
+    fragment is encoded once, and all new fragments of a call are encoded in
+    one batch by the fast tokenizer. Totals are the sum over fragments, which
+    may differ from a full encode by a token per fragment boundary.
+    """
+
+    def __init__(self, max_fragments: int = TOKEN_CACHE_SIZE, mode: str = TOKEN_COUNT_MODE):
+        self.max_fragments = max_fragments
+        self.mode = mode
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, text: str, estimate: bool = None) -> int:
+        return self.count_many([text], estimate)[0]
+
+    def count_many(self, texts: list, estimate: bool = None) -> list:
+        if estimate if estimate is not None else self.mode == "estimate":
+            return [estimate_tokens(text) for text in texts]
+        split = [_FRAGMENT_BOUNDARY.split(text) if text else [] for text in texts]
+        try:
+            counts = self._fragment_counts({fragment for fragments in split for fragment in fragments if fragment})
+        except Exception as e:
+            # Token counts are informational; never fail a generation over them
+            logger.warning(f"Tokenizer unavailable ({e}), estimating token count")
+            return [estimate_tokens(text) for text in texts]
+        return [sum(counts[fragment] for fragment in fragments if fragment) for fragments in split]
+
+    def _fragment_counts(self, fragments: set) -> dict:
+        counts, missing = {}, []
+        with self._lock:
+            for fragment in fragments:
+                if fragment in self._counts:
+                    self._counts.move_to_end(fragment)
+                    counts[fragment] = self._counts[fragment]
+                else:
+                    missing.append(fragment)
+            self.hits += len(counts)
+            self.misses += len(missing)
+        if missing:
+            encoded = tokenizer.get()(missing, add_special_tokens=False)["input_ids"]
+            with self._lock:
+                for fragment, ids in zip(missing, encoded):
+                    counts[fragment] = self._counts[fragment] = len(ids)
+                while len(self._counts) > self.max_fragments:
+                    self._counts.popitem(last=False)
+        return counts
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "fragments": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+token_counter = TokenCounter()
+
+
+def count_tokens(text: str, estimate: bool = None) -> int:
+    """Prompt tokens of `text`; `estimate` overrides TOKEN_COUNT_MODE for one call."""
+    return token_counter.count(text, estimate)
+
+def count_tokens_batch(texts: list, estimate: bool = None) -> list:
+    """`count_tokens` for several texts, encoding their new fragments in one batch."""
+    return token_counter.count_many(texts, estimate)
 
 def get_site_content_from_html(html_content: str) -> str:
     soup = BeautifulSoup(html_content, "html.parser")
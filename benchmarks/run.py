@@ -0,0 +1,275 @@
+# benchmarks/run.py
+"""Benchmarks for the generation pipeline, run against the stub inference backend.
+
+    python -m benchmarks.run --output benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --tolerance 0.25
+
+`pipeline` measures pages/sec and per-page latency percentiles of
+`generate_sites` for every pages_count × concurrency × style × writing mode
+combination; `micro` times the CPU-bound helpers on stub-generated inputs.
+With --baseline the run exits 1 if any metric regressed beyond --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import logging
+import argparse
+import platform
+import tempfile
+import itertools
+from datetime import datetime
+
+import numpy as np
+
+TOPIC = "Vector databases"
+
+# Metrics compared against a baseline: name -> True if higher is better
+PIPELINE_METRICS = {"pages_per_sec": True, "page_p50_ms": False, "page_p95_ms": False, "page_p99_ms": False}
+MICRO_METRICS = {"mean_us": False, "p95_us": False}
+
+
+def isolate_environment() -> str:
+    """Point app configuration at a scratch directory and the stub backend; returns the directory.
+
+    Must run before any app module is imported, since they read the environment at import time.
+    """
+    workdir = tempfile.mkdtemp(prefix="llm-site-bench-")
+    os.environ.setdefault("SITES_DIR", os.path.join(workdir, "sites"))
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+    for quota in ("TEXT_REQUESTS_PER_SEC", "TEXT_TOKENS_PER_MIN", "IMAGE_REQUESTS_PER_SEC", "IMAGE_TOKENS_PER_MIN"):
+        os.environ.setdefault(quota, "0")  # measure the pipeline, not the provider quota
+    os.environ["INFERENCE_BACKEND"] = "stub"
+    return workdir
+
+
+def percentiles(samples: list, unit: float, suffix: str) -> dict:
+    values = np.asarray(samples, dtype=np.float64) * unit
+    return {f"p{p}_{suffix}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+
+def _fresh_generator(workdir: str, name: str, concurrency: int):
+    """Generator with its own registry and embeddings, so title history never carries across runs."""
+    from app.embeddings import EmbeddingStore
+    from app.generator import SiteGenerator
+    from app.registry import SiteRegistry
+    from app.storage import LocalStorage
+
+    directory = os.path.join(workdir, name)
+    os.makedirs(directory, exist_ok=True)
+    return SiteGenerator(
+        max_concurrency=concurrency,
+        registry=SiteRegistry(f"sqlite:///{os.path.join(directory, 'registry.db')}"),
+        embeddings=EmbeddingStore(os.path.join(directory, "embeddings")),
+        storage=LocalStorage(os.path.join(directory, "sites")),
+    )
+
+
+async def bench_config(workdir: str, pages: int, concurrency: int, style: str, mode: str, repeat: int,
+                       images: bool) -> dict:
+    from app.models import GenerateRequest
+
+    generator = _fresh_generator(workdir, f"{pages}x{concurrency}-{style}-{mode}", concurrency)
+    page_latencies, request_latencies, produced = [], [], 0
+
+    generate_one_site = generator.generate_one_site
+
+    async def timed_one_site(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await generate_one_site(*args, **kwargs)
+        finally:
+            page_latencies.append(time.perf_counter() - start)
+
+    generator.generate_one_site = timed_one_site
+    req = GenerateRequest(topic=TOPIC, pages_count=pages, concurrency=concurrency, style=style,
+                          writing_mode=mode, generate_image=images, use_cache=False)
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await generator.generate_sites(req)
+        request_latencies.append(time.perf_counter() - start)
+        produced += len(result["sites"])
+
+    return {
+        "pages_count": pages,
+        "concurrency": concurrency,
+        "style": style,
+        "writing_mode": mode,
+        "runs": repeat,
+        "pages_per_sec": round(produced / sum(request_latencies), 3),
+        **{f"page_{k}": v for k, v in percentiles(page_latencies, 1000, "ms").items()},
+        **{f"request_{k}": v for k, v in percentiles(request_latencies, 1000, "ms").items()},
+    }
+
+
+def run_pipeline(args) -> list:
+    # Untimed pass per writing mode: loads the embedding model/tokenizer, starts the image
+    # workers and runs each mode's code path once, so no mode pays for first use in its timing
+    for mode in args.modes:
+        asyncio.run(bench_config(args.workdir, 1, 1, args.styles[0], mode, 1, not args.no_image))
+    results = []
+    for pages, concurrency, style, mode in itertools.product(args.pages, args.concurrency, args.styles, args.modes):
+        result = asyncio.run(bench_config(args.workdir, pages, concurrency, style, mode, args.repeat, not args.no_image))
+        print(f"pipeline {pages:>3} pages × {concurrency} {style:<12} {mode:<8} "
+              f"{result['pages_per_sec']:>8.2f} pages/s  p95 {result['page_p95_ms']:.0f} ms", file=sys.stderr)
+        results.append(result)
+    return results
+
+
+def time_calls(func, iterations: int) -> dict:
+    func()  # warm-up: lazy imports, template compilation
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+    mean = sum(samples) / len(samples) / 1000
+    return {"iterations": iterations, "mean_us": round(mean, 3), "ops_per_sec": round(1e6 / mean, 1),
+            **percentiles(samples, 1 / 1000, "us")}
+
+
+def run_micro(args) -> dict:
+    from app.backends import StubBackend
+    from app.prompts import planning_prompt, writing_prompt
+    from app.utils import count_tokens, get_site_content_from_html
+
+    stub = StubBackend(latency_ms=0, image_latency_ms=0)
+    generator = _fresh_generator(args.workdir, "micro", 1)
+    plan_resp = {"generated_text": stub.render(planning_prompt(TOPIC, "technical"), {"max_tokens": 400})}
+    plan = generator._parse_plan_response(plan_resp, TOPIC)
+    full_text = stub.render(writing_prompt(TOPIC, "technical", plan["title"], plan["sections"]), {"max_tokens": 1200})
+    sections = generator._extract_sections(full_text, plan["sections"])
+    html = generator._render_html(plan, sections, None, "technical", TOPIC)
+
+    rng = np.random.default_rng(args.seed)
+    records = [{"site_id": f"bench-{i}", "title": f"Page {i}"} for i in range(args.similarity_pages)]
+    generator.index.add_many([r["site_id"] for r in records],
+                             rng.standard_normal((len(records), generator.embeddings.dim)).astype(np.float32))
+
+    cases = {
+        "_parse_plan_response": lambda: generator._parse_plan_response(plan_resp, TOPIC),
+        "_extract_sections": lambda: generator._extract_sections(full_text, plan["sections"]),
+        "_render_html": lambda: generator._render_html(plan, sections, None, "technical", TOPIC),
+        "count_tokens": lambda: count_tokens(full_text),
+        "get_site_content_from_html": lambda: get_site_content_from_html(html),
+        "_calculate_similarity": lambda: generator._calculate_similarity(records),
+    }
+    results = {}
+    for name, func in cases.items():
+        results[name] = time_calls(func, args.micro_iterations)
+        print(f"micro    {name:<28} {results[name]['mean_us']:>10.1f} µs mean  "
+              f"p95 {results[name]['p95_us']:.1f} µs", file=sys.stderr)
+    return results
+
+
+def _pipeline_key(result: dict) -> str:
+    return f"{result['pages_count']}x{result['concurrency']}/{result['style']}/{result['writing_mode']}"
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """Metrics worse than the baseline by more than `tolerance` (a fraction), as readable lines."""
+    regressions = []
+
+    def check(label: str, metric: str, new, old, higher_is_better: bool):
+        if new is None or not old:
+            return
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append(f"{label} {metric}: {old} -> {new} ({change:+.0%})")
+
+    old_pipeline = {_pipeline_key(r): r for r in baseline.get("pipeline", [])}
+    for result in current.get("pipeline", []):
+        old = old_pipeline.get(_pipeline_key(result))
+        for metric, higher_is_better in PIPELINE_METRICS.items():
+            if old:
+                check(_pipeline_key(result), metric, result.get(metric), old.get(metric), higher_is_better)
+    for name, result in current.get("micro", {}).items():
+        old = baseline.get("micro", {}).get(name)
+        for metric, higher_is_better in MICRO_METRICS.items():
+            if old:
+                check(name, metric, result.get(metric), old.get(metric), higher_is_better)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the site generation pipeline against the stub backend")
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 4], help="pages_count values")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4], help="Per-request concurrency values")
+    parser.add_argument("--styles", nargs="+", default=["educational", "technical"])
+    parser.add_argument("--modes", nargs="+", default=["single", "parallel"], help="Writing modes")
+    parser.add_argument("--repeat", type=int, default=3, help="generate_sites runs per configuration")
+    parser.add_argument("--no-image", action="store_true", help="Skip the image stage")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Median stub text latency")
+    parser.add_argument("--image-latency-ms", type=float, default=200, help="Median stub image latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of stub latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub calls failing with 503")
+    parser.add_argument("--micro-iterations", type=int, default=200)
+    parser.add_argument("--similarity-pages", type=int, default=30)
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    args.workdir = isolate_environment()
+    from app import inference
+    from app.backends import StubBackend
+    from app.images import shutdown_image_pool
+    from app.logger import logger
+    from app.utils import resources_status
+
+    logger.setLevel(logging.ERROR)
+    random.seed(args.seed)
+    inference.backend = StubBackend(
+        latency_ms=args.latency_ms, image_latency_ms=args.image_latency_ms,
+        latency_sigma=args.latency_sigma, error_rate=args.error_rate, seed=args.seed,
+    )
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub": {"latency_ms": args.latency_ms, "image_latency_ms": args.image_latency_ms,
+                     "latency_sigma": args.latency_sigma, "error_rate": args.error_rate, "seed": args.seed},
+        },
+    }
+    try:
+        if not args.skip_pipeline:
+            results["pipeline"] = run_pipeline(args)
+        if not args.skip_micro:
+            results["micro"] = run_micro(args)
+    finally:
+        shutdown_image_pool()
+        shutil.rmtree(args.workdir, ignore_errors=True)
+    # Fallbacks (e.g. estimated token counts) make numbers incomparable across machines
+    results["meta"]["resources"] = resources_status()
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
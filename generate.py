@@ -1,68 +1,202 @@
 # generate.py
+import os
+import csv
+import json
+import time
 import argparse
 import asyncio
+from pydantic import ValidationError
 from app.models import GenerateRequest
 from app.generator import SiteGenerator
 
-parser = argparse.ArgumentParser(
-    description="Generate AI-powered websites from command line"
-)
-parser.add_argument("--topic", required=True, help="Topic for website generation")
-parser.add_argument("--count", type=int, default=1, help="Number of pages to generate")
-parser.add_argument("--style", default="educational", 
-                   choices=["educational", "marketing", "technical", "minimalist", "creative", "casual"],
-                   help="Content style")
-parser.add_argument("--temperature", type=float, default=0.8,
-                   help="Temperature for LLM (0.1-1.5)")
-parser.add_argument("--randomize-temp", action="store_true",
-                   help="Randomize temperature for each generation")
-parser.add_argument("--temp-min", type=float, default=0.5,
-                   help="Minimum temperature when randomizing")
-parser.add_argument("--temp-max", type=float, default=1.2,
-                   help="Maximum temperature when randomizing")
-parser.add_argument("--no-image", action="store_true",
-                   help="Skip image generation")
-parser.add_argument("--max-tokens", type=int, default=1200,
-                   help="Maximum tokens for generation")
-
-args = parser.parse_args()
-
-async def main():
+STYLES = ["educational", "marketing", "technical", "minimalist", "creative", "casual"]
+
+# Manifest columns that are not GenerateRequest fields
+MANIFEST_ALIASES = {"count": "pages_count"}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate AI-powered websites from command line"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--topic", help="Topic for website generation")
+    source.add_argument("--manifest", help="JSONL or CSV file with one topic per row (batch mode)")
+    parser.add_argument("--count", type=int, default=1, help="Number of pages to generate")
+    parser.add_argument("--style", default="educational", choices=STYLES,
+                       help="Content style")
+    parser.add_argument("--temperature", type=float, default=0.8,
+                       help="Temperature for LLM (0.1-1.5)")
+    parser.add_argument("--randomize-temp", action="store_true",
+                       help="Randomize temperature for each generation")
+    parser.add_argument("--temp-min", type=float, default=0.5,
+                       help="Minimum temperature when randomizing")
+    parser.add_argument("--temp-max", type=float, default=1.2,
+                       help="Maximum temperature when randomizing")
+    parser.add_argument("--no-image", action="store_true",
+                       help="Skip image generation")
+    parser.add_argument("--max-tokens", type=int, default=1200,
+                       help="Maximum tokens for generation")
+    parser.add_argument("--parallel", type=int, default=2,
+                       help="Batch mode: manifest rows generated at the same time")
+    parser.add_argument("--checkpoint",
+                       help="Batch mode: completed rows are appended here and skipped on the next run "
+                            "(default: <manifest>.checkpoint.jsonl)")
+    parser.add_argument("--results",
+                       help="Batch mode: results manifest (default: <manifest>.results.jsonl)")
+    return parser.parse_args(argv)
+
+
+def request_defaults(args) -> dict:
+    """GenerateRequest fields taken from the command line; manifest columns override them."""
+    return {
+        "pages_count": args.count,
+        "style": args.style,
+        "temperature": args.temperature,
+        "randomize_temperature": args.randomize_temp,
+        "temperature_min": args.temp_min,
+        "temperature_max": args.temp_max,
+        "generate_image": not args.no_image,
+        "max_tokens": args.max_tokens,
+    }
+
+
+def load_manifest(path: str) -> list:
+    """Rows of a .jsonl or .csv manifest as dicts, each with a stable `key`.
+
+    The key is the row's `id` column if present, otherwise its position and
+    topic, so a resumed run matches rows of the same manifest.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = [
+                # Cells stay strings; GenerateRequest parses numbers and booleans
+                {name: value.strip() for name, value in row.items() if name and value and value.strip()}
+                for row in csv.DictReader(f)
+            ]
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    items = []
+    for position, row in enumerate(rows, 1):
+        row = {MANIFEST_ALIASES.get(name, name): value for name, value in row.items()}
+        key = str(row.pop("id", None) or f"{position}:{row.get('topic', '')}")
+        items.append({"key": key, **row})
+    return items
+
+
+def load_checkpoint(path: str) -> dict:
+    """key -> result of every row completed by earlier runs."""
+    done = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line of an interrupted run
+                if result.get("status") == "completed":
+                    done[result["key"]] = result
+    return done
+
+
+async def run_batch(generator, items: list, defaults: dict, parallel: int,
+                    checkpoint_path: str, results_path: str) -> list:
+    """Generate every manifest row not already in the checkpoint; return results in manifest order."""
+    done = load_checkpoint(checkpoint_path)
+    pending = [item for item in items if item["key"] not in done]
+    print(f"📋 {len(items)} row(s) in manifest, {len(items) - len(pending)} already done, {len(pending)} to run")
+
+    slots = asyncio.Semaphore(max(1, parallel))
+    results = dict(done)
+
+    with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+        async def run(item: dict):
+            fields = {name: value for name, value in item.items() if name != "key"}
+            result = {"key": item["key"], "topic": fields.get("topic")}
+            async with slots:
+                start = time.monotonic()
+                try:
+                    req = GenerateRequest(**{**defaults, **fields})
+                    res = await generator.generate_sites(req)
+                except ValidationError as e:
+                    result.update(status="invalid", error=str(e))
+                except Exception as e:
+                    result.update(status="failed", error=str(e))
+                else:
+                    result.update(
+                        status="completed",
+                        style=req.style,
+                        pages_requested=req.pages_count,
+                        sites=[{key: site.get(key) for key in ("site_id", "title", "file_path")} for site in res["sites"]],
+                        rejected=len(res["rejected"]),
+                    )
+                result["seconds"] = round(time.monotonic() - start, 2)
+            # One line per row, flushed at once, so an interrupted run loses at most rows in flight
+            checkpoint.write(json.dumps(result, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            results[item["key"]] = result
+            mark = "✅" if result["status"] == "completed" else "❌"
+            print(f"{mark} [{item['key']}] {result['topic']}: {result['status']} ({result['seconds']}s)")
+
+        await asyncio.gather(*(run(item) for item in pending))
+
+    ordered = [results[item["key"]] for item in items if item["key"] in results]
+    tmp_path = f"{results_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for result in ordered:
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, results_path)
+    return ordered
+
+
+async def main_batch(args):
+    base = os.path.splitext(args.manifest)[0]
+    checkpoint_path = args.checkpoint or f"{base}.checkpoint.jsonl"
+    results_path = args.results or f"{base}.results.jsonl"
+    print(f"🚀 Starting batch generation from {args.manifest} (parallel: {args.parallel})")
+
+    results = await run_batch(
+        SiteGenerator(), load_manifest(args.manifest), request_defaults(args),
+        args.parallel, checkpoint_path, results_path
+    )
+    completed = [r for r in results if r["status"] == "completed"]
+    pages = sum(len(r["sites"]) for r in completed)
+    print(f"\n✅ Batch finished: {len(completed)}/{len(results)} row(s) completed, {pages} page(s)")
+    print(f"📄 Results: {results_path}")
+    if len(completed) < len(results):
+        print(f"🔁 Re-run the same command to retry the rest (checkpoint: {checkpoint_path})")
+
+
+async def main(args):
     print(f"🚀 Starting generation...")
     print(f"📋 Topic: {args.topic}")
     print(f"📊 Count: {args.count}")
     print(f"🎨 Style: {args.style}")
-    
+
     if args.randomize_temp:
         print(f"🎲 Random temperature: {args.temp_min} - {args.temp_max}")
     else:
         print(f"🌡️  Fixed temperature: {args.temperature}")
-    
+
     gen = SiteGenerator()
-    req = GenerateRequest(
-        topic=args.topic,
-        pages_count=args.count,
-        style=args.style,
-        temperature=args.temperature,
-        randomize_temperature=args.randomize_temp,
-        temperature_min=args.temp_min,
-        temperature_max=args.temp_max,
-        generate_image=not args.no_image,
-        max_tokens=args.max_tokens
-    )
-    
+    req = GenerateRequest(topic=args.topic, **request_defaults(args))
+
     res = await gen.generate_sites(req)
-    
+    sites = res["sites"]
+
     print("\n✅ Generation completed!")
-    print(f"📁 Generated {len(res)} site(s):\n")
-    
-    for i, site in enumerate(res, 1):
+    print(f"📁 Generated {len(sites)} site(s):\n")
+
+    for i, site in enumerate(sites, 1):
         print(f"{i}. {site['title']}")
         print(f"   ID: {site['site_id']}")
         if 'temperature_used' in site:
             print(f"   🌡️  Temperature: {site['temperature_used']}")
         print(f"   📄 File: {site['file_path']}")
         print()
+    for rejected in res["rejected"]:
+        print(f"⚠️  Rejected near-duplicate: {rejected['title']} (of {rejected['duplicate_of']})")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    args = parse_args()
+    asyncio.run(main_batch(args) if args.manifest else main(args))
@@ -0,0 +1,23 @@
+# tests/helpers.py
+import os
+import tempfile
+import unittest
+
+from app.generator import SiteGenerator
+from app.registry import SiteRegistry
+from app.embeddings import EmbeddingStore
+from app.storage import LocalStorage
+
+
+def make_generator(test: unittest.TestCase, **kwargs) -> SiteGenerator:
+    """Generator whose registry, embeddings and pages live in a temporary directory.
+
+    Nothing reaches ./sites, so title history never carries over between runs.
+    """
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    registry = kwargs.pop("registry", None) or SiteRegistry("sqlite://")
+    test.addCleanup(registry.engine.dispose)
+    kwargs.setdefault("embeddings", EmbeddingStore(os.path.join(tmp.name, "embeddings")))
+    kwargs.setdefault("storage", LocalStorage(os.path.join(tmp.name, "sites")))
+    return SiteGenerator(registry=registry, **kwargs)
@@ -0,0 +1,72 @@
+# tests/test_backends.py
+import unittest
+from unittest.mock import patch
+import asyncio
+import json
+import httpx
+
+from app.backends import InferenceBackend, StubBackend, OpenAICompatibleBackend, LoopBound
+from app.prompts import planning_prompt, writing_prompt
+from app.scheduler import Scheduler, InferenceError, call_with_retries
+from app import stub_server
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_stub_is_deterministic_and_injects_errors(self):
+        """Стаб повертає однаковий вміст для однакового промпту та імітує 503/429."""
+        stub = StubBackend(latency_ms=0)
+        prompt = planning_prompt("Rust ownership", "technical")
+        plan = json.loads(asyncio.run(stub.complete(prompt, {"max_tokens": 400}))[0])
+        self.assertEqual(plan, json.loads(asyncio.run(stub.complete(prompt, {"max_tokens": 400}))[0]))
+        self.assertIn("Rust ownership", plan["title"])
+
+        text, usage = asyncio.run(stub.complete(writing_prompt("Rust", "technical", plan["title"], plan["sections"]), {}))
+        self.assertGreater(usage["prompt_tokens"], 0)
+        self.assertEqual(text.count("### "), len(plan["sections"]))
+
+        failing = StubBackend(latency_ms=0, error_rate=1.0)
+
+        async def run():
+            return await call_with_retries(Scheduler("stub", 0, 0, 1), 0, lambda: failing.complete("hi", {}), "Stub")
+
+        with patch("app.scheduler.BACKOFF_BASE", 0.001), self.assertRaises(InferenceError):
+            asyncio.run(run())
+
+    def test_incomplete_backend_fails_on_construction(self):
+        """Бекенд без image не створюється, а не падає під час першого виклику."""
+        class TextOnly(InferenceBackend):
+            async def complete(self, prompt, sampling):
+                return "", None
+
+            async def stream(self, prompt, sampling):
+                yield ""
+
+        with self.assertRaises(TypeError):
+            TextOnly()
+
+    def test_openai_backend_against_stub_server(self):
+        """OpenAI-сумісний бекенд працює зі стаб-сервером: completion, stream, image."""
+        backend = OpenAICompatibleBackend(base_url="http://stub/v1", text_model="stub/text")
+        backend._http = LoopBound(lambda: httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=stub_server.app), base_url="http://stub/v1"
+        ))
+        prompt = "Write ONLY the section \"Intro\"."
+
+        async def run():
+            text, usage = await backend.complete(prompt, {"max_tokens": 64})
+            self.assertEqual(usage, StubBackend.usage(prompt, text))
+            streamed = "".join([delta async for delta in backend.stream(prompt, {"max_tokens": 64})])
+            image = await backend.image("a cat", {"width": 64, "height": 32})
+            await backend.aclose()
+            return text, streamed, image
+
+        with patch.object(stub_server, "stub", StubBackend(latency_ms=0, image_latency_ms=0)):
+            text, streamed, image = asyncio.run(run())
+        self.assertTrue(text)
+        self.assertEqual(streamed, text)
+        self.assertEqual(image.size, (64, 32))
+
+
+if __name__ == '__main__':
+    unittest.main()
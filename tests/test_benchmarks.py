@@ -0,0 +1,40 @@
+# tests/test_benchmarks.py
+import unittest
+
+from benchmarks import run as bench
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_percentiles_scale_samples(self):
+        """Перцентилі рахуються в заданих одиницях з потрібним суфіксом."""
+        result = bench.percentiles([i / 1000 for i in range(1, 101)], 1000, "ms")
+        self.assertEqual(list(result), ["p50_ms", "p95_ms", "p99_ms"])
+        self.assertAlmostEqual(result["p50_ms"], 50.5)
+        self.assertAlmostEqual(result["p99_ms"], 99.01)
+
+    def test_compare_flags_only_regressions_beyond_tolerance(self):
+        """Регресією вважається погіршення понад допуск з урахуванням напрямку метрики."""
+        config = {"pages_count": 4, "concurrency": 4, "style": "technical", "writing_mode": "single"}
+        baseline = {
+            "pipeline": [{**config, "pages_per_sec": 10.0, "page_p50_ms": 100.0, "page_p95_ms": 200.0,
+                          "page_p99_ms": 300.0}],
+            "micro": {"count_tokens": {"mean_us": 10.0, "p95_us": 20.0}},
+        }
+        current = {
+            "pipeline": [{**config, "pages_per_sec": 7.0, "page_p50_ms": 110.0, "page_p95_ms": 150.0,
+                          "page_p99_ms": 400.0},
+                         {**config, "concurrency": 1, "pages_per_sec": 1.0}],  # not in the baseline
+            "micro": {"count_tokens": {"mean_us": 10.5, "p95_us": 30.0}, "new_case": {"mean_us": 1.0}},
+        }
+        regressions = bench.compare(current, baseline, tolerance=0.2)
+        self.assertEqual(regressions, [
+            "4x4/technical/single pages_per_sec: 10.0 -> 7.0 (-30%)",
+            "4x4/technical/single page_p99_ms: 300.0 -> 400.0 (+33%)",
+            "count_tokens p95_us: 20.0 -> 30.0 (+50%)",
+        ])
+        self.assertEqual(bench.compare(current, baseline, tolerance=0.6), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+# tests/test_cache.py
+import unittest
+from unittest.mock import patch
+import tempfile
+import asyncio
+
+from app.cache import ResponseCache
+from app.backends import StubBackend
+from app import inference as inference_module
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_lru_eviction_and_ttl(self):
+        """Найдавніше використані записи витісняються, прострочені — ігноруються."""
+        cache = ResponseCache(self.tmp.name, ttl=3600, max_bytes=10)
+        cache.set("a" * 64, b"12345")
+        cache.set("b" * 64, b"12345")
+        self.assertEqual(cache.get("a" * 64), b"12345")  # "a" стає найсвіжішим
+        cache.set("c" * 64, b"12345")
+
+        self.assertIsNone(cache.get("b" * 64))
+        self.assertEqual(cache.get("a" * 64), b"12345")
+        self.assertEqual(cache.stats()["entries"], 2)
+
+        expired = ResponseCache(self.tmp.name, ttl=-1, max_bytes=10)
+        self.assertIsNone(expired.get("a" * 64))
+
+    def test_inference_uses_cache_unless_bypassed(self):
+        """Однаковий промпт і параметри не йдуть в API вдруге, якщо кеш не вимкнено."""
+        cache = ResponseCache(self.tmp.name, ttl=3600, max_bytes=1024 * 1024)
+        stub = StubBackend(latency_ms=0, image_latency_ms=0, error_rate=0, rate_limit_rate=0)
+        params = {"temperature": 0.5, "top_p": 0.9, "max_new_tokens": 100}
+
+        async def run():
+            first = await inference_module.async_inference("prompt", params)
+            second = await inference_module.async_inference("prompt", params)
+            await inference_module.async_inference("prompt", params, use_cache=False)
+            return first, second
+
+        with patch.object(inference_module, "response_cache", cache), \
+                patch.object(inference_module, "backend", stub), \
+                patch.object(stub, "complete", wraps=stub.complete) as api:
+            first, second = asyncio.run(run())
+
+        self.assertEqual(first, second)
+        self.assertEqual(api.call_count, 2)
+        self.assertEqual(cache.hits, 1)
+
+    def test_async_inference_bypass_skips_reads_and_writes(self):
+        """Без кешу async_inference не читає й не пише кеш, як і потокова генерація та зображення."""
+        cache = ResponseCache(self.tmp.name, ttl=3600, max_bytes=1024 * 1024)
+        stub = StubBackend(latency_ms=0, image_latency_ms=0, error_rate=0, rate_limit_rate=0)
+        params = {"temperature": 0.5, "top_p": 0.9, "max_new_tokens": 100}
+
+        async def run():
+            await inference_module.async_inference("prompt", params, use_cache=False)
+            async for _ in inference_module.async_inference_stream("prompt", params, use_cache=False):
+                pass
+            await inference_module.async_inference_image("image", use_cache=False)
+            key = inference_module._text_cache_key("prompt", params)
+            image_key = inference_module._image_cache_key("image")
+            uncached = cache.get_json(key), cache.get(image_key)
+            await inference_module.async_inference("prompt", params)
+            await inference_module.async_inference_image("image")
+            return uncached, (cache.get_json(key), cache.get(image_key))
+
+        with patch.object(inference_module, "response_cache", cache), \
+                patch.object(inference_module, "backend", stub):
+            uncached, cached = asyncio.run(run())
+        self.assertEqual(uncached, (None, None))
+        self.assertNotIn(None, cached)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# tests/test_cli.py
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+
+from generate import load_manifest, run_batch
+
+
+class FakeGenerator:
+    def __init__(self, fail_topics=()):
+        self.fail_topics = set(fail_topics)
+        self.requests = []
+
+    async def generate_sites(self, req):
+        self.requests.append(req)
+        if req.topic in self.fail_topics:
+            raise RuntimeError("upstream down")
+        sites = [{"site_id": f"{req.topic}-{i}", "title": req.topic, "file_path": "x.html"} for i in range(req.pages_count)]
+        return {"sites": sites, "similarity_matrix": None, "rejected": []}
+
+
+class TestBatchCLI(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.checkpoint = os.path.join(self.tmp.name, "run.checkpoint.jsonl")
+        self.results = os.path.join(self.tmp.name, "run.results.jsonl")
+
+    def test_csv_manifest_and_resume(self):
+        """CSV-маніфест виконується, а повторний запуск продовжує лише з невдалих рядків."""
+        manifest = os.path.join(self.tmp.name, "topics.csv")
+        with open(manifest, "w", encoding="utf-8") as f:
+            f.write("topic,style,count,generate_image\nRust basics,technical,2,false\nGo channels,,1,\nBad,nope,1,\n")
+        items = load_manifest(manifest)
+        self.assertEqual([i["key"] for i in items], ["1:Rust basics", "2:Go channels", "3:Bad"])
+        defaults = {"style": "casual", "pages_count": 1}
+
+        first = FakeGenerator(fail_topics={"Go channels"})
+        results = asyncio.run(run_batch(first, items, defaults, 2, self.checkpoint, self.results))
+        self.assertEqual([r["status"] for r in results], ["completed", "failed", "invalid"])
+        self.assertEqual(len(results[0]["sites"]), 2)
+        self.assertEqual(first.requests[0].style, "technical")
+        self.assertFalse(first.requests[0].generate_image)
+
+        second = FakeGenerator()
+        results = asyncio.run(run_batch(second, items, defaults, 2, self.checkpoint, self.results))
+        self.assertEqual([req.topic for req in second.requests], ["Go channels"])
+        self.assertEqual(second.requests[0].style, "casual")
+        self.assertEqual([r["status"] for r in results], ["completed", "completed", "invalid"])
+        with open(self.results, encoding="utf-8") as f:
+            self.assertEqual([json.loads(line)["key"] for line in f], [i["key"] for i in items])
+
+
+if __name__ == '__main__':
+    unittest.main()
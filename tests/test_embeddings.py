@@ -0,0 +1,141 @@
+# tests/test_embeddings.py
+import unittest
+from unittest.mock import patch, AsyncMock
+import asyncio
+import os
+import tempfile
+import numpy as np
+
+from app.embeddings import EmbeddingStore
+from app.ann import IVFIndex
+from app.generator import DuplicatePageError, _embed_title
+from app.models import GenerateRequest
+from tests.helpers import make_generator
+
+
+class TestEmbeddingStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(_embed_title.cache_clear)
+        _embed_title.cache_clear()
+
+    def test_vectors_persist_and_partial_append_is_dropped(self):
+        """Вектори переживають перезапуск; недописаний рядок відкидається."""
+        store = EmbeddingStore(self.tmp.name, dim=4)
+        store.add_many(["a", "b"], np.array([[3, 4, 0, 0], [0, 0, 1, 0]]))
+        store.add("a", np.ones(4))  # повторний id ігнорується
+        with open(os.path.join(self.tmp.name, "vectors.f16"), "ab") as f:
+            f.write(b"\x00\x01")
+
+        reopened = EmbeddingStore(self.tmp.name, dim=4)
+        self.assertEqual(reopened.ids, ["a", "b"])
+        np.testing.assert_allclose(reopened.get_many(["a"])[0], [0.6, 0.8, 0, 0], atol=1e-3)
+        self.assertEqual(reopened.matrix().dtype, np.float16)
+
+    def test_similarity_modes_use_stored_vectors(self):
+        """Схожість рахується з кешованих векторів без перечитування HTML."""
+        store = EmbeddingStore(self.tmp.name, dim=2)
+        store.add_many(["x", "y", "z"], np.array([[1, 0], [0.9, 0.1], [0, 1]]))
+        generator = make_generator(self, embeddings=store)
+        records = [{"site_id": sid, "title": sid.upper(), "file_path": "/missing"} for sid in ("x", "y", "z")]
+
+        with patch("app.generator._embed_texts", side_effect=AssertionError("must not re-encode")):
+            matrix = generator._calculate_similarity(records)
+            top = generator._calculate_similarity(records, mode="top_k", top_k=1)
+            pairs = generator._calculate_similarity(records, mode="threshold", threshold=0.9)
+
+        self.assertEqual(len(matrix["scores"]), 3)
+        self.assertAlmostEqual(matrix["scores"][0][0], 1.0, places=2)
+        self.assertEqual([row[0]["index"] for row in top["neighbors"]], [1, 0, 1])
+        self.assertEqual([(p["a"], p["b"]) for p in pairs["pairs"]], [(0, 1)])
+
+    def test_ivf_index_probes_a_fraction_of_the_corpus(self):
+        """Після тренування пошук знаходить сусіда, переглядаючи лише кілька списків."""
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(20, 16))
+        vectors = np.repeat(centers, 30, axis=0) + rng.normal(scale=0.05, size=(600, 16))
+        store = EmbeddingStore(self.tmp.name, dim=16)
+        index = IVFIndex(store, nprobe=2, min_train=500)
+        index.add_many([f"s{i}" for i in range(600)], vectors)
+        self.assertTrue(index.trained)
+
+        probed = sorted(index._lists, key=len, reverse=True)[:2]
+        self.assertLess(sum(len(rows) for rows in probed), 600 // 4)
+        self.assertEqual(index.search(vectors[45], k=1)[0][0], "s45")
+
+        reopened = IVFIndex(EmbeddingStore(self.tmp.name, dim=16), nprobe=2, min_train=500)
+        neighbour = reopened.search(vectors[45], k=1, exclude="s45")[0][0]
+        self.assertEqual(int(neighbour[1:]) // 30, 1)  # той самий кластер
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_duplicate_policies(self, mock_inference):
+        """reject відкидає дублікат, regenerate перепланує без кешу, flag позначає запис."""
+        mock_inference.side_effect = lambda prompt, params, use_cache=True: {"generated_text": (
+            '{"title": "Same", "sections": [{"heading": "Intro", "brief": "b"}]}'
+            if "JSON structure" in prompt else "### Intro\nContent."
+        )}
+        store = EmbeddingStore(self.tmp.name, dim=2)
+        generator = make_generator(self, embeddings=store)
+        generator.index.add("original", np.array([1.0, 0.0]))
+        req = GenerateRequest(topic="LLMs", pages_count=1, generate_image=False)
+
+        with patch("app.generator._embed_texts", return_value=np.array([[1.0, 0.01]])):
+            with patch("app.generator.DUPLICATE_POLICY", "reject"):
+                result = asyncio.run(generator.generate_sites(req))
+                self.assertEqual(result["sites"], [])
+                self.assertEqual(result["rejected"][0]["duplicate_of"], "original")
+                with self.assertRaises(DuplicatePageError):
+                    asyncio.run(generator.generate_one_site("LLMs", "technical", 0.7, 0.9, 1000, generate_image=False))
+
+            mock_inference.reset_mock()
+            with patch("app.generator.DUPLICATE_POLICY", "regenerate"), \
+                    patch("app.generator.DUPLICATE_MAX_ATTEMPTS", 2):
+                record = asyncio.run(generator.generate_one_site("LLMs", "technical", 0.7, 0.9, 1000, generate_image=False))
+            self.assertEqual(mock_inference.call_count, 4)
+            self.assertFalse(mock_inference.call_args_list[2].kwargs["use_cache"])
+            self.assertEqual(record["duplicate_of"], "original")
+            self.assertEqual(generator.registry.get_site(record["site_id"])["duplicate_of"], "original")
+
+        similar = generator.similar_sites("original", k=1)
+        self.assertEqual(similar[0]["site_id"], record["site_id"])
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_title_collision_replans_with_bounded_prompt(self, mock_inference):
+        """Колізія заголовка з історією дає один re-plan, у промпті — лише схожі заголовки."""
+        plans = iter(["Alpha Handbook", "Beta Field Notes"])
+        mock_inference.side_effect = lambda prompt, params, use_cache=True: {"generated_text": (
+            '{"title": "%s", "sections": [{"heading": "Intro", "brief": "b"}]}' % next(plans)
+            if "JSON structure" in prompt else "### Intro\nContent."
+        )}
+        directions = {"Alpha": [1.0, 0.0], "Beta": [0.6, 0.8], "Gamma": [0.0, 1.0]}
+        fake_embed = lambda texts: np.array([directions[t.split()[0]] for t in texts])
+
+        generator = make_generator(self, embeddings=EmbeddingStore(self.tmp.name, dim=2))
+        generator.registry.record_site({
+            "site_id": "old", "topic": "LLMs", "style": "technical", "title": "Alpha Guide",
+            "file_path": "/old.html", "created_at": "2025-10-15T10:00:00Z",
+        })
+        generator.title_index.add("old", np.array([1.0, 0.0]))
+        batch_titles = ["Gamma " + str(n) for n in range(20)]
+
+        with patch("app.generator._embed_texts", side_effect=fake_embed), \
+                patch("app.generator.DUPLICATE_POLICY", "off"):
+            record = asyncio.run(generator.generate_one_site(
+                "LLMs", "technical", 0.7, 0.9, 1000, generate_image=False, existing_titles=batch_titles
+            ))
+
+        self.assertEqual(record["title"], "Beta Field Notes")
+        self.assertEqual(mock_inference.call_count, 3)
+        first_prompt = mock_inference.call_args_list[0].args[0]
+        replan = mock_inference.call_args_list[1]
+        self.assertNotIn("Gamma", first_prompt)
+        self.assertIn("Alpha Guide", replan.args[0])
+        self.assertLessEqual(replan.args[0].count("Gamma"), 4)
+        self.assertFalse(replan.kwargs["use_cache"])
+        self.assertEqual(batch_titles[-1], "Beta Field Notes")
+
+
+if __name__ == '__main__':
+    unittest.main()
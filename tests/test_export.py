@@ -0,0 +1,115 @@
+# tests/test_export.py
+import unittest
+import asyncio
+import os
+import tempfile
+
+from app.export import StaticExporter, backfill, slugify, group_key
+from app.registry import SiteRegistry
+from app.storage import LocalStorage, site_key
+
+
+class TestStaticExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = LocalStorage(os.path.join(self.tmp.name, "sites"))
+        self.root = os.path.join(self.tmp.name, "export")
+        asyncio.run(self.storage.put("img_0123456789abcdef_512.webp", b"webp"))
+        self.exporter = StaticExporter(self.root, self.storage, base_url="https://cdn.example/")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def page(self, site_id, topic, style, created_at):
+        record = {"site_id": site_id, "topic": topic, "style": style, "title": f"Page {site_id}",
+                  "meta_description": "About", "created_at": created_at,
+                  "file_path": self.storage.location(site_key(site_id))}
+        html = ("<html><head><style>body{color:red}</style></head><body>"
+                '<img src="/image/img_0123456789abcdef_512.webp"><img src="/image/missing.png"></body></html>')
+        return record, html
+
+    def add(self, record, html):
+        return asyncio.run(self.exporter.add(record, html))
+
+    def read(self, *parts):
+        with open(os.path.join(self.root, *parts), "r", encoding="utf-8") as f:
+            return f.read()
+
+    def group(self, topic, style):
+        return os.path.join(self.root, group_key(topic), group_key(style))
+
+    def test_pages_use_shared_css_and_relative_assets(self):
+        """Експорт виносить CSS у спільний файл і переписує шляхи до зображень на відносні."""
+        path = self.add(*self.page("a1", "Rust Ownership!", "technical", "2026-01-01T00:00:00Z"))
+        self.assertEqual(path, f"{group_key('Rust Ownership!')}/{group_key('technical')}/site_a1.html")
+        self.assertTrue(path.startswith("rust-ownership-"))
+        html = self.read(path)
+        self.assertNotIn("<style", html)
+        self.assertIn('src="../../static/img/img_0123456789abcdef_512.webp"', html)
+        self.assertIn('src="/image/missing.png"', html)
+        css = [name for name in os.listdir(os.path.join(self.root, "static", "css"))]
+        self.assertIn(f'href="../../static/css/{css[0]}"', html)
+        self.assertTrue(os.path.exists(os.path.join(self.root, "static", "img", "img_0123456789abcdef_512.webp")))
+        self.assertEqual(slugify("Машинне навчання"), "машинне-навчання")
+
+    def test_index_and_sitemap_grow_incrementally(self):
+        """Індекс і sitemap групи оновлюються з кожною новою сторінкою, інші групи не зачіпаються."""
+        self.add(*self.page("a1", "Rust", "technical", "2026-01-01T00:00:00Z"))
+        self.add(*self.page("b1", "Go", "casual", "2026-01-02T00:00:00Z"))
+        go_index = os.stat(os.path.join(self.group("Go", "casual"), "index.html")).st_mtime_ns
+        self.add(*self.page("a2", "Rust", "technical", "2026-01-03T00:00:00Z"))
+
+        rust = self.group("Rust", "technical")
+        index = self.read(rust, "index.html")
+        self.assertLess(index.index("site_a2.html"), index.index("site_a1.html"))
+        sitemap = self.read(rust, "sitemap-1.xml")
+        self.assertIn(f"<loc>https://cdn.example/{os.path.relpath(rust, self.root)}/site_a2.html</loc>", sitemap)
+        self.assertEqual(sitemap.count("<url>"), 3)
+        self.assertEqual(os.stat(os.path.join(self.group("Go", "casual"), "index.html")).st_mtime_ns, go_index)
+
+        root_sitemap = self.read("sitemap.xml")
+        self.assertIn("<sitemapindex", root_sitemap)
+        self.assertIn(f"https://cdn.example/{os.path.relpath(self.group('Go', 'casual'), self.root)}/sitemap-1.xml",
+                      root_sitemap)
+        self.assertIn("2 page(s)", self.read("index.html"))
+
+    def test_backfill_exports_registry_pages_once(self):
+        """Бекфіл експортує сторінки з реєстру й пропускає вже експортовані."""
+        registry = SiteRegistry("sqlite://")
+        for i in range(3):
+            record, html = self.page(f"s{i}", "Rust", "technical", f"2026-01-0{i + 1}T00:00:00Z")
+            asyncio.run(self.storage.put(site_key(record["site_id"]), html.encode("utf-8")))
+            registry.record_site({**record, "sections_count": 1})
+        self.assertEqual(asyncio.run(backfill(self.exporter, registry, batch_size=2)), 3)
+        self.assertEqual(asyncio.run(backfill(self.exporter, registry)), 0)
+        self.assertEqual(self.read(self.group("Rust", "technical"), "sitemap-1.xml").count("<url>"), 4)
+
+    def test_full_shards_are_archived_and_similar_topics_stay_apart(self):
+        """Заповнений шард архівується й більше не переписується; «C» і «C++» — різні групи."""
+        self.exporter.shard_size = 2
+        for i in range(5):
+            self.add(*self.page(f"c{i}", "C", "technical", f"2026-01-0{i + 1}T00:00:00Z"))
+        group = self.group("C", "technical")
+        archived_at = os.stat(os.path.join(group, "page-1.html")).st_mtime_ns
+        self.add(*self.page("c5", "C", "technical", "2026-01-06T00:00:00Z"))
+        self.add(*self.page("p0", "C++", "technical", "2026-01-09T00:00:00Z"))
+
+        self.assertEqual(os.stat(os.path.join(group, "page-1.html")).st_mtime_ns, archived_at)
+        self.assertNotEqual(group, self.group("C++", "technical"))
+        self.assertEqual(sorted(name for name in os.listdir(group) if name.startswith("sitemap")),
+                         ["sitemap-1.xml", "sitemap-2.xml", "sitemap-3.xml"])
+        archived = self.read(group, "page-1.html")
+        self.assertIn("site_c1.html", archived)
+        self.assertNotIn("site_c2.html", archived)
+        self.assertIn("/page-1.html</loc>", self.read(group, "sitemap-1.xml"))
+        index = self.read(group, "index.html")
+        self.assertIn("site_c4.html", index)
+        self.assertNotIn("site_c0.html", index)
+        self.assertIn('href="page-2.html"', index)
+        self.assertEqual(self.read("sitemap.xml").count("<sitemap>"), 4)
+        self.assertIn("6 page(s)", self.read("index.html"))
+
+
+if __name__ == '__main__':
+    unittest.main()
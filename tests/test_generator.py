@@ -1,11 +1,19 @@
 # tests/test_generator.py
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import asyncio
+import os
+import tempfile
 from pydantic import ValidationError
+from PIL import Image
 
 from app.models import GenerateRequest
-from app.generator import SiteGenerator
+from app.generator import SectionExtractor
+from app.scheduler import InferenceError
+from app.utils import LazyResource
+from app.registry import SiteRegistry
+from tests.helpers import make_generator
+
 
 class TestApp(unittest.TestCase):
 
@@ -29,8 +37,8 @@ class TestApp(unittest.TestCase):
         with self.assertRaises(ValidationError):
             GenerateRequest(topic="t", style="educational") # Topic too short
 
-    @patch('app.generator.inference')
-    @patch('app.generator.inference_image')
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    @patch('app.generator.async_inference_image', new_callable=AsyncMock)
     def test_generate_one_site_mocked(self, mock_inference_image, mock_inference):
         """Тестування генерації одного сайту з імітацією API."""
         
@@ -55,7 +63,7 @@ class TestApp(unittest.TestCase):
         mock_inference_image.return_value = MagicMock() # Імітуємо успішну генерацію зображення
 
         # Запуск тесту
-        generator = SiteGenerator()
+        generator = make_generator(self)
         
         # Використовуємо asyncio.run для асинхронної функції
         result = asyncio.run(generator.generate_one_site(
@@ -73,5 +81,246 @@ class TestApp(unittest.TestCase):
         self.assertEqual(result["sections_count"], 1)
         self.assertEqual(mock_inference.call_count, 2) # Один виклик для плану, один для тексту
 
+    @patch('app.generator._embed_texts', side_effect=RuntimeError("no embedder"))
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_generate_sites_concurrent_keeps_order(self, mock_inference, _):
+        """Паралельна генерація повертає сторінки в порядку індексів, хоча завершуються вони в іншому порядку."""
+        titles = ["Rust Ownership", "Tomato Gardening", "Medieval Castles", "Jazz Improvisation",
+                  "Sourdough Baking", "Deep Sea Fish", "Chess Openings", "Solar Panels"]
+
+        async def fake_inference(prompt, params, use_cache=True):
+            if "JSON structure" in prompt:
+                # Plans are requested in page order; earlier pages answer slower
+                number = fake_inference.plans
+                fake_inference.plans += 1
+                await asyncio.sleep(0.02 * (4 - number % 4))
+                return {"generated_text": (
+                    '{"title": "%s", "meta_description": "m", "image_prompt": "i", '
+                    '"sections": [{"heading": "Intro", "brief": "b"}]}' % titles[number]
+                )}
+            return {"generated_text": "### Intro\nContent."}
+        fake_inference.plans = 0
+        mock_inference.side_effect = fake_inference
+
+        generator = make_generator(self, max_concurrency=2)
+        req = GenerateRequest(topic="LLMs", pages_count=4, concurrency=3, generate_image=False)
+
+        # The same generator across two event loops: its semaphore must not stay bound to the first
+        for batch in range(2):
+            saved = []
+            result = asyncio.run(generator.generate_sites(
+                req, emit=lambda event, data: saved.append(data["index"]) if event == "page_saved" else None
+            ))
+            self.assertEqual([site["title"] for site in result["sites"]], titles[4 * batch:4 * batch + 4])
+            self.assertNotEqual(saved, sorted(saved))
+        self.assertEqual(mock_inference.call_count, 16)
+
+    @patch('app.generator._embed_texts', side_effect=RuntimeError("no embedder"))
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_repeated_request_reuses_sampling_parameters(self, mock_inference, _):
+        """Повторний запит дає ті самі параметри семплінгу, тож відповіді беруться з кешу."""
+        mock_inference.side_effect = lambda prompt, params, use_cache=True: {"generated_text": (
+            '{"title": "Same %s", "sections": [{"heading": "Intro", "brief": "b"}]}' % params["temperature"]
+            if "JSON structure" in prompt else "### Intro\nContent."
+        )}
+        req = GenerateRequest(topic="Cache", pages_count=2, generate_image=False, randomize_temperature=True)
+
+        def sampled():
+            asyncio.run(make_generator(self).generate_sites(req))
+            params = [call.kwargs["params"]["temperature"] for call in mock_inference.call_args_list]
+            mock_inference.reset_mock()
+            return params
+
+        first = sampled()
+        self.assertEqual(sampled(), first)
+        self.assertEqual(len(set(first)), 4)  # pages still differ from each other
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_failed_page_cancels_the_rest_of_the_batch(self, mock_inference):
+        """Помилка інференсу на одній сторінці скасовує решту сторінок пакета."""
+        cancelled = []
+
+        async def fake_inference(prompt, params, use_cache=True):
+            if not fake_inference.calls:
+                fake_inference.calls.append(prompt)
+                await asyncio.sleep(0.01)
+                raise InferenceError("Text inference failed: 503")
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.append(prompt)
+                raise
+        fake_inference.calls = []
+        mock_inference.side_effect = fake_inference
+
+        req = GenerateRequest(topic="Failing", pages_count=3, concurrency=3, generate_image=False)
+
+        async def run():
+            with self.assertRaises(InferenceError):
+                await asyncio.wait_for(make_generator(self).generate_sites(req), 5)
+            return len(cancelled)  # before asyncio.run cancels whatever is left
+
+        self.assertEqual(asyncio.run(run()), 2)
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_generate_sites_emits_progress_events(self, mock_inference):
+        """Події прогресу надходять для кожної сторінки до завершення батчу."""
+        mock_inference.side_effect = [
+            {"generated_text": '{"title": "Evented", "sections": [{"heading": "Intro", "brief": "b"}]}'},
+            {"generated_text": "### Intro\nContent."},
+        ]
+        events = []
+
+        generator = make_generator(self)
+        req = GenerateRequest(topic="LLMs", pages_count=1, generate_image=False)
+        asyncio.run(generator.generate_sites(req, emit=lambda event, data: events.append((event, data))))
+
+        self.assertEqual([e for e, _ in events], ["plan_parsed", "section_written", "page_saved"])
+        self.assertTrue(all(data["index"] == 0 for _, data in events))
+        self.assertEqual(events[-1][1]["site"]["title"], "Evented")
+
+    def test_section_extractor_streaming_chunks(self):
+        """Секції віддаються, щойно з'являється наступний заголовок, навіть якщо ### розірвано."""
+        sections_data = [
+            {"heading": "Intro", "brief": "Intro brief."},
+            {"heading": "Usage", "brief": "Usage brief."},
+            {"heading": "Summary", "brief": "Summary brief."},
+        ]
+        text = "Preamble\n### Intro\nFirst   part.\n### Usage\nSecond part.\n"
+        extractor = SectionExtractor(sections_data)
+
+        completed = []
+        for i in range(0, len(text), 5):
+            completed += extractor.feed(text[i:i + 5])
+        self.assertEqual(completed, [0])
+
+        self.assertEqual(extractor.close(), [1, 2])
+        self.assertEqual(extractor.sections(), [
+            {"heading": "Intro", "content": "First part."},
+            {"heading": "Usage", "content": "Second part."},
+            {"heading": "Summary", "content": "Summary brief."},
+        ])
+        self.assertEqual(make_generator(self)._extract_sections(text, sections_data), extractor.sections())
+
+    @patch('app.generator.async_inference_stream')
+    def test_generate_sections_stream_mode(self, mock_stream):
+        """Потоковий режим емітить секції по мірі надходження токенів."""
+        async def fake_stream(prompt, params, use_cache=True):
+            for chunk in ["### Int", "ro\nHello", " world\n##", "# Outro\nBye"]:
+                yield chunk
+        mock_stream.side_effect = fake_stream
+        events = []
+
+        plan = {"title": "T", "sections": [{"heading": "Intro", "brief": "b"}, {"heading": "Outro", "brief": "b"}]}
+        sections, _ = asyncio.run(make_generator(self)._generate_sections(
+            "Topic", "casual", plan, 0.7, 0.9, 500,
+            writing_mode="stream", emit=lambda event, data: events.append(data)
+        ))
+
+        self.assertEqual([e["heading"] for e in events], ["Intro", "Outro"])
+        self.assertEqual(sections[0]["content"], "Hello world")
+        self.assertEqual(sections[1]["content"], "Bye")
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_parallel_writing_mode(self, mock_inference):
+        """Паралельний режим пише кожну секцію окремим викликом зі спільним префіксом."""
+        in_flight = {"now": 0, "max": 0}
+
+        async def fake_inference(prompt, params, use_cache=True):
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+            await asyncio.sleep(0.01)
+            in_flight["now"] -= 1
+            if 'section "Intro"' in prompt:
+                return {"generated_text": "### Intro\nHello   world."}
+            return {"generated_text": ""}
+        mock_inference.side_effect = fake_inference
+
+        plan = {"title": "T", "sections": [{"heading": "Intro", "brief": "b1"}, {"heading": "Outro", "brief": "b2"}]}
+        with patch("app.generator.SECTION_MIN_TOKENS", 100):
+            sections, _ = asyncio.run(make_generator(self)._generate_sections(
+                "Topic", "casual", plan, 0.7, 0.9, 1000, writing_mode="parallel"
+            ))
+
+        self.assertEqual(sections, [{"heading": "Intro", "content": "Hello world."},
+                                    {"heading": "Outro", "content": "b2"}])
+        self.assertEqual(in_flight["max"], 2)
+        prompts = [c.args[0] for c in mock_inference.call_args_list]
+        prefix = prompts[0].split('Write ONLY')[0]
+        self.assertTrue(prompts[1].startswith(prefix))
+        self.assertEqual(mock_inference.call_args.kwargs["params"]["max_new_tokens"], 500)
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    @patch('app.generator.async_inference_image', new_callable=AsyncMock)
+    @patch('app.generator._embed_texts', side_effect=RuntimeError("model unavailable"))  # без завантаження моделі в таймінгу
+    @patch('app.utils.token_counter.mode', "estimate")  # і без завантаження токенізатора
+    def test_image_overlaps_writing_and_times_out(self, _embed, mock_image, mock_inference):
+        """Зображення генерується паралельно з текстом; повільне — відкидається по таймауту."""
+        async def fake_inference(prompt, params, use_cache=True):
+            if "JSON structure" in prompt:
+                return {"generated_text": '{"title": "Pic", "sections": [{"heading": "Intro", "brief": "b"}]}'}
+            await asyncio.sleep(0.5)
+            return {"generated_text": "### Intro\nContent."}
+
+        def image_after(delay):
+            async def fake_image(prompt, use_cache=True):
+                await asyncio.sleep(delay)
+                return Image.new("RGB", (64, 64), "teal")
+            return fake_image
+
+        mock_inference.side_effect = fake_inference
+        generator = make_generator(self)
+
+        async def timed():
+            start = asyncio.get_running_loop().time()
+            record = await generator.generate_one_site("Images", "casual", 0.7, 0.9, 1000, use_cache=False)
+            return record, asyncio.get_running_loop().time() - start
+
+        mock_image.side_effect = image_after(0.5)
+        record, elapsed = asyncio.run(timed())
+        self.assertIsNotNone(record["image_path"])
+        self.assertLess(elapsed, 0.8)  # послідовно було б ≥ 1.0
+
+        mock_image.side_effect = image_after(5)
+        with patch("app.generator.PAGE_IMAGE_TIMEOUT", 0.1):
+            record, elapsed = asyncio.run(timed())
+        self.assertIsNone(record["image_path"])
+        self.assertLess(elapsed, 1.5)
+
+    def test_lazy_resource_loads_once(self):
+        """Важкі ресурси завантажуються лише при першому використанні."""
+        loader = MagicMock(return_value="model")
+        resource = LazyResource("test_resource", loader)
+        try:
+            self.assertFalse(resource.loaded)
+            self.assertEqual(resource.get(), "model")
+            self.assertEqual(resource.get(), "model")
+            self.assertTrue(resource.loaded)
+            loader.assert_called_once()
+        finally:
+            LazyResource.registry.pop("test_resource", None)
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_registry_survives_restart(self, mock_inference):
+        """Записи про сайти зберігаються в реєстрі й доступні після перезапуску."""
+        mock_inference.side_effect = [
+            {"generated_text": '{"title": "Persisted", "sections": [{"heading": "Intro", "brief": "b"}]}'},
+            {"generated_text": "### Intro\nContent."},
+        ]
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'registry.db')}"
+            generator = make_generator(self, registry=SiteRegistry(url))
+            req = GenerateRequest(topic="Registry Topic", pages_count=1, generate_image=False)
+            site = asyncio.run(generator.generate_sites(req))["sites"][0]
+
+            restarted = make_generator(self, registry=SiteRegistry(url))
+            self.assertEqual(restarted.get_site_path(site["site_id"]), site["file_path"])
+            logs = restarted.get_logs(offset=0, limit=10)
+            self.assertEqual(logs["total"], 1)
+            self.assertEqual(logs["items"][0]["topic"], "Registry Topic")
+            self.assertIsNone(restarted.get_site_path("missing"))
+            restarted.registry.engine.dispose()
+            generator.registry.engine.dispose()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,62 @@
+# tests/test_images.py
+import unittest
+from unittest.mock import patch
+import asyncio
+import os
+import tempfile
+from PIL import Image
+
+from app import images
+from app.storage import LocalStorage
+
+
+class TestImages(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(images.shutdown_image_pool)
+
+    def test_variants_are_content_addressed_and_listed_for_srcset(self):
+        """Однакові зображення зберігаються один раз; srcset містить усі ширини."""
+        storage = LocalStorage(self.tmp.name)
+
+        def stored_files():
+            return sorted(name for _, _, names in os.walk(self.tmp.name) for name in names)
+
+        with patch.object(images, "IMAGE_WIDTHS", [128, 256, 1024]):
+            first = asyncio.run(images.save_image(Image.new("RGB", (512, 512), "navy"), storage))
+            files = stored_files()
+            with patch.object(images, "encode_variants", side_effect=AssertionError("must not re-encode")):
+                second = asyncio.run(images.save_image(Image.new("RGB", (512, 512), "navy"), storage))
+            sources = asyncio.run(images.image_sources(first, storage))
+
+        self.assertEqual(first, second)
+        self.assertEqual(stored_files(), files)
+        self.assertTrue(first.endswith("_512.webp"))
+        with Image.open(storage.path(first.replace("_512", "_128"))) as small:
+            self.assertEqual(small.size, (128, 128))
+
+        webp = next(s for s in sources if s["type"] == "image/webp")
+        widths = [entry.rsplit(" ", 1)[1] for entry in webp["srcset"].split(", ")]
+        self.assertEqual(widths, ["128w", "256w", "512w"])  # 1024 обрізано до 512
+        self.assertEqual(images.media_type(first), "image/webp")
+        self.assertEqual(images.media_type("image_abc.png"), "image/png")
+        self.assertIsNone(images.media_type("../registry.db"))
+
+    def test_avif_only_falls_back_to_largest_avif(self):
+        """Без підтримки WebP основним src стає найбільший AVIF."""
+        storage = LocalStorage(self.tmp.name)
+        with patch.object(images, "FORMATS", ["avif"]), patch.object(images, "IMAGE_WIDTHS", [128, 256]), \
+                patch.object(images, "IMAGE_WORKERS", 0):
+            src = asyncio.run(images.save_image(Image.new("RGB", (200, 100), "teal"), storage))
+            sources = asyncio.run(images.image_sources(src, storage))
+
+        self.assertTrue(src.endswith("_200.avif"))
+        self.assertEqual(sources, [{"type": "image/avif", "srcset": ", ".join(
+            f"/image/{src.replace('_200', f'_{width}')} {width}w" for width in (128, 200)
+        )}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+# tests/test_jobs.py
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import os
+import tempfile
+from fastapi.testclient import TestClient
+
+from app.models import GenerateRequest
+from app.jobs import JobManager, InMemoryJobBackend, SQLiteJobBackend
+
+
+class TestJobs(unittest.TestCase):
+
+    def _fake_generator(self):
+        async def generate_sites(req, emit=None):
+            sites = []
+            for i in range(req.pages_count):
+                record = {"site_id": f"site-{i}", "title": f"Title {i}"}
+                sites.append(record)
+                emit("page_saved", {"index": i, "site": record})
+            return {"sites": sites, "similarity_matrix": None}
+
+        generator = MagicMock()
+        generator.generate_sites = AsyncMock(side_effect=generate_sites)
+        return generator
+
+    def test_job_runs_in_background(self):
+        """Задача одразу повертає id, а воркер заповнює прогрес по сторінках."""
+        manager = JobManager(self._fake_generator(), InMemoryJobBackend(), workers=1)
+
+        async def scenario():
+            await manager.start()
+            job = await manager.submit(GenerateRequest(topic="Job Topic", pages_count=2))
+            self.assertEqual(job["status"], "queued")
+            await manager._queue.join()
+            await manager.stop()
+            return await manager.get(job["job_id"])
+
+        job = asyncio.run(scenario())
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["pages_completed"], 2)
+        self.assertEqual([p["site_id"] for p in job["pages"]], ["site-0", "site-1"])
+
+    def test_job_pages_stay_indexed_by_position(self):
+        """Сторінки задачі лишаються на своїх позиціях, навіть коли завершуються не по порядку чи відхилені."""
+        async def generate_sites(req, emit=None):
+            sites = []
+            for i in (2, 0):  # page 1 rejected as a duplicate
+                record = {"site_id": f"site-{i}", "title": f"Title {i}"}
+                sites.append(record)
+                emit("page_saved", {"index": i, "site": record})
+                await asyncio.sleep(0)
+            return {"sites": sites, "similarity_matrix": None}
+
+        generator = MagicMock()
+        generator.generate_sites = AsyncMock(side_effect=generate_sites)
+        backend = SQLiteJobBackend("sqlite://")
+        manager = JobManager(generator, backend, workers=1)
+
+        async def scenario():
+            await manager.start()
+            job = await manager.submit(GenerateRequest(topic="Job Topic", pages_count=3))
+            await manager._queue.join()
+            await manager.stop()
+            return await manager.get(job["job_id"])
+
+        job = asyncio.run(scenario())
+        self.assertEqual(job["status"], "completed")
+        self.assertEqual(job["pages_completed"], 2)
+        self.assertEqual([p and p["site_id"] for p in job["pages"]], ["site-0", None, "site-2"])
+
+    def test_sqlite_backend_requeues_unfinished_jobs(self):
+        """Незавершені задачі з SQLite знову потрапляють у чергу після рестарту."""
+        backend = SQLiteJobBackend("sqlite://")
+        job = backend.create(GenerateRequest(topic="Persisted", pages_count=1).model_dump())
+        backend.update(job["job_id"], status="running")
+
+        manager = JobManager(self._fake_generator(), backend, workers=1)
+
+        async def scenario():
+            await manager.start()
+            await manager._queue.join()
+            await manager.stop()
+
+        asyncio.run(scenario())
+        self.assertEqual(backend.get(job["job_id"])["status"], "completed")
+
+    def test_handlers_keep_backend_off_the_event_loop(self):
+        """Обробники /jobs не звертаються до сховища задач у потоці циклу подій."""
+        on_loop = []
+
+        class RecordingBackend(InMemoryJobBackend):
+            def create(self, request):
+                on_loop.append(self._on_loop())
+                return super().create(request)
+
+            def get(self, job_id):
+                on_loop.append(self._on_loop())
+                return super().get(job_id)
+
+            def update(self, job_id, **fields):
+                on_loop.append(self._on_loop())
+                super().update(job_id, **fields)
+
+            @staticmethod
+            def _on_loop():
+                try:
+                    asyncio.get_running_loop()
+                    return True
+                except RuntimeError:
+                    return False
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with patch("app.generator.REGISTRY_URL", "sqlite://"), \
+                patch("app.generator.EMBEDDINGS_DIR", os.path.join(tmp.name, "embeddings")):
+            from app import main
+
+        generator = self._fake_generator()
+        generator.generate_sites.side_effect = RuntimeError("boom")
+        manager = JobManager(generator, RecordingBackend(), workers=1)
+        with patch.object(main, "job_manager", manager), TestClient(main.app) as client:
+            job_id = client.post("/jobs", json={"topic": "Loop", "pages_count": 1}).json()["job_id"]
+            client.portal.call(manager._queue.join)
+            self.assertEqual(client.get(f"/jobs/{job_id}").json()["status"], "failed")
+            self.assertEqual(client.post(f"/jobs/{job_id}/retry").status_code, 202)
+
+        self.assertTrue(on_loop)
+        self.assertFalse(any(on_loop))
+
+
+if __name__ == '__main__':
+    unittest.main()
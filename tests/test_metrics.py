@@ -0,0 +1,59 @@
+# tests/test_metrics.py
+import unittest
+from unittest.mock import patch, AsyncMock
+import asyncio
+import os
+import tempfile
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.embeddings import EmbeddingStore
+from tests.helpers import make_generator
+
+
+def sample(name: str, labels: dict = None) -> float:
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+class TestMetrics(unittest.TestCase):
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_stages_and_fallbacks_are_recorded(self, mock_inference):
+        """Кожен етап потрапляє в гістограму, запасний план і секції — у лічильники."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        generator = make_generator(self, embeddings=EmbeddingStore(f"{tmp.name}/embeddings", dim=2))
+        mock_inference.side_effect = [
+            {"generated_text": "not json"},
+            {"generated_text": "### Introduction\nSome text."},
+        ]
+        before = {stage: sample("site_stage_duration_seconds_count", {"stage": stage})
+                  for stage in ("planning", "writing", "extraction", "rendering", "file_write")}
+        plans, sections = sample("site_fallback_plans_total"), sample("site_fallback_sections_total")
+        tokens = sample("site_prompt_tokens_total", {"phase": "writing"})
+
+        asyncio.run(generator.generate_one_site("Metrics", "technical", 0.7, 0.9, 1000, generate_image=False))
+
+        for stage, count in before.items():
+            self.assertEqual(sample("site_stage_duration_seconds_count", {"stage": stage}), count + 1, stage)
+        self.assertEqual(sample("site_fallback_plans_total"), plans + 1)
+        self.assertEqual(sample("site_fallback_sections_total"), sections + 2)  # Key Features, Summary
+        self.assertGreater(sample("site_prompt_tokens_total", {"phase": "writing"}), tokens)
+
+    def test_metrics_endpoint(self):
+        """/metrics віддає формат Prometheus разом із глибиною черг."""
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        # The app's module-level generator must not open ./sites
+        with patch("app.generator.REGISTRY_URL", "sqlite://"), \
+                patch("app.generator.EMBEDDINGS_DIR", os.path.join(tmp.name, "embeddings")):
+            from app.main import app
+        response = TestClient(app).get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain"))
+        self.assertIn('site_queue_depth{queue="jobs"} 0.0', response.text)
+        self.assertIn("site_generations_in_flight", response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
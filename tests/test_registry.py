@@ -0,0 +1,85 @@
+# tests/test_registry.py
+import unittest
+import os
+import tempfile
+from sqlalchemy import insert
+
+from app.registry import SiteRegistry, sites
+
+
+def make_record(n: int, topic: str, style: str = "educational", hour: str = "10") -> dict:
+    return {
+        "site_id": f"site{n}",
+        "topic": topic,
+        "style": style,
+        "title": f"Title {n}",
+        "file_path": f"./sites/site_site{n}.html",
+        "temperature_used": 0.5,
+        "planning_tokens": 100,
+        "writing_tokens": 300,
+        "created_at": f"2025-10-15T{hour}:00:00Z",
+    }
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_incremental_stats_and_top_topics(self):
+        """Агрегати оновлюються при кожному записі, топ-k витісняє найменший топік."""
+        registry = SiteRegistry("sqlite://", top_k=2)
+        topics = ["A", "A", "B", "C", "C", "C"]
+        for n, topic in enumerate(topics):
+            registry.record_site(make_record(n, topic, hour="10" if n < 3 else "11"))
+        registry.record_request("A", "educational", 2, "2025-10-15T10:00:00Z")
+
+        stats = registry.stats()
+        self.assertEqual(stats["total_sites"], 6)
+        self.assertEqual(stats["total_requests"], 1)
+        self.assertEqual(stats["styles_distribution"], {"educational": 6})
+        self.assertEqual(stats["popular_topics"], {"C": 3, "A": 2})
+
+        hourly = registry.throughput("hour")
+        self.assertEqual([b["bucket"] for b in hourly], ["2025-10-15T10", "2025-10-15T11"])
+        self.assertEqual(hourly[1]["pages"], 3)
+        self.assertEqual(hourly[1]["writing_tokens"], 900)
+        self.assertEqual(hourly[0]["avg_temperature"], 0.5)
+
+    def test_aggregates_backfilled_for_existing_sites(self):
+        """Реєстр без агрегатів перераховує їх один раз при старті."""
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'registry.db')}"
+            registry = SiteRegistry(url)
+            with registry.engine.begin() as conn:
+                conn.execute(insert(sites).values(**make_record(1, "Legacy")))
+                conn.execute(insert(sites).values(**make_record(2, "Legacy", style="casual")))
+                conn.exec_driver_sql("DELETE FROM totals")
+            registry.engine.dispose()
+
+            reopened = SiteRegistry(url)
+            stats = reopened.stats()
+            self.assertEqual(stats["total_sites"], 2)
+            self.assertEqual(stats["popular_topics"], {"Legacy": 2})
+            self.assertEqual(reopened.throughput("day")[0]["pages"], 2)
+            reopened.engine.dispose()
+
+    def test_stats_pick_up_writes_from_other_workers(self):
+        """Статистика підхоплює записи інших процесів у ту саму базу після інтервалу оновлення."""
+        with tempfile.TemporaryDirectory() as tmp:
+            url = f"sqlite:///{os.path.join(tmp, 'registry.db')}"
+            reader = SiteRegistry(url, refresh_seconds=3600)
+            writer = SiteRegistry(url)
+            writer.record_site(make_record(1, "Shared", style="casual"))
+            writer.record_request("Shared", "casual", 1, "2025-10-15T10:00:00Z")
+
+            self.assertEqual(reader.stats()["total_sites"], 0)  # snapshot not yet stale
+            reader.refresh_seconds = 0
+            stats = reader.stats()
+            self.assertEqual(stats["total_sites"], 1)
+            self.assertEqual(stats["total_requests"], 1)
+            self.assertEqual(stats["styles_distribution"], {"casual": 1})
+            self.assertEqual(stats["popular_topics"], {"Shared": 1})
+            reader.engine.dispose()
+            writer.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
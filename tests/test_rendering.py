@@ -0,0 +1,46 @@
+# tests/test_rendering.py
+import unittest
+from bs4 import BeautifulSoup
+from jinja2 import Environment, FileSystemLoader
+
+from app.rendering import minify_html, template_for, precompile_templates, TEMPLATES_DIR, TEMPLATE_MAP
+from app.utils import get_site_content_from_html
+
+
+class TestRendering(unittest.TestCase):
+
+    def test_minify_keeps_content_and_verbatim_blocks(self):
+        """Мініфікація прибирає коментарі й відступи, але не чіпає <pre> та рядки в CSS."""
+        html = ("<div>\n  <!-- note -->\n  <p>a   b</p>\n  <pre>  x\n  y</pre>\n</div>\n"
+                "<style>\n  h1:before { content: ', '; }  /* c */\n</style>")
+        self.assertEqual(
+            minify_html(html),
+            "<div> <p>a b</p> <pre>  x\n  y</pre> </div> <style>h1:before{content:', ';}</style>"
+        )
+
+    def test_minify_keeps_words_between_inline_elements_apart(self):
+        """Пробіл між рядковими елементами зберігається, слова не злипаються."""
+        html = "<p>\n  <b>Bold</b>\n  <i>italic</i>\n  <a href='#'>link</a>\n</p>"
+        self.assertEqual(BeautifulSoup(minify_html(html), "html.parser").get_text().strip(), "Bold italic link")
+
+    def test_precompiled_templates_render_same_text(self):
+        """Шаблони компілюються один раз; мініфікований HTML менший, а текст той самий."""
+        plain = Environment(loader=FileSystemLoader(TEMPLATES_DIR))
+        context = dict(
+            title="Title", meta_description="Meta", image_path="/image/x.webp", image_sizes="100vw",
+            image_sources=[{"type": "image/webp", "srcset": "/image/x.webp 512w"}],
+            sections=[{"heading": "Intro", "content": "Hello."}, {"heading": "End", "content": "Bye."}],
+            generated_at="2026-01-01T00:00:00Z",
+        )
+        templates = precompile_templates()
+        self.assertIs(template_for("Technical"), templates["technical"])
+        self.assertIs(template_for("unknown"), templates["educational"])
+        for style, name in TEMPLATE_MAP.items():
+            original = plain.get_template(name).render(**context)
+            minified = template_for(style).render(**context)
+            self.assertLess(len(minified), len(original) * 0.8, style)
+            self.assertEqual(get_site_content_from_html(minified), get_site_content_from_html(original), style)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# tests/test_scheduler.py
+import unittest
+from unittest.mock import patch, MagicMock
+import asyncio
+import time
+
+from app.scheduler import Scheduler, InferenceError, call_with_retries, INTERACTIVE, BULK
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.response = MagicMock(status_code=status, headers={})
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_interactive_lane_goes_first(self):
+        """Інтерактивні запити обганяють фонові в черзі."""
+        order = []
+
+        async def run():
+            scheduler = Scheduler("test", requests_per_sec=0, tokens_per_min=0, max_inflight=1)
+
+            async def call(name, priority):
+                async with scheduler.slot(priority=priority):
+                    order.append(name)
+                    await asyncio.sleep(0.01)
+
+            blocker = asyncio.create_task(call("first", BULK))
+            await asyncio.sleep(0)
+            bulk = asyncio.create_task(call("bulk", BULK))
+            await asyncio.sleep(0)
+            interactive = asyncio.create_task(call("interactive", INTERACTIVE))
+            await asyncio.gather(blocker, bulk, interactive)
+
+        asyncio.run(run())
+        self.assertEqual(order, ["first", "interactive", "bulk"])
+
+    def test_request_rate_is_bounded(self):
+        """Понад burst виклики пропускаються зі швидкістю requests/sec."""
+        async def run():
+            scheduler = Scheduler("test", requests_per_sec=20, tokens_per_min=0, max_inflight=100)
+
+            async def call():
+                async with scheduler.slot():
+                    pass
+
+            start = time.monotonic()
+            await asyncio.gather(*(call() for _ in range(25)))
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(run()), 0.2)
+
+    @patch("app.scheduler.BACKOFF_BASE", 0.001)
+    def test_retries_transient_errors_only(self):
+        """429/5xx повторюються з backoff, 4xx — одразу InferenceError."""
+        async def run(failures):
+            scheduler = Scheduler("test", 0, 0, 1)
+            attempts = []
+
+            async def call():
+                attempts.append(1)
+                if len(attempts) <= len(failures):
+                    raise HTTPError(failures[len(attempts) - 1])
+                return "ok"
+
+            try:
+                return await call_with_retries(scheduler, 0, call, "Test call"), len(attempts)
+            except InferenceError:
+                return None, len(attempts)
+
+        self.assertEqual(asyncio.run(run([503, 429])), ("ok", 3))
+        self.assertEqual(asyncio.run(run([400])), (None, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
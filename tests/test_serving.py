@@ -0,0 +1,68 @@
+# tests/test_serving.py
+import unittest
+import os
+import gzip
+import tempfile
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.serving import compressed_variants, file_response, FileCache
+from app import serving
+
+
+class TestServing(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "site_x.html")
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("<html>" + "Привіт " * 500 + "</html>")
+        with open(self.path, "rb") as f:
+            variants = compressed_variants(f.read())
+        for suffix, body in variants.items():
+            with open(self.path + suffix, "wb") as f:
+                f.write(body)
+
+        app = FastAPI()
+
+        @app.get("/page")
+        async def page(request: Request):
+            return await file_response(request, self.path, "text/html; charset=utf-8")
+
+        self.client = TestClient(app)
+
+    def test_precompressed_variant_and_conditional_get(self):
+        """Клієнт з gzip отримує стиснений варіант, повторний запит з ETag — 304."""
+        first = self.client.get("/page", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.headers["content-encoding"], "gzip")
+        self.assertIn("Привіт", first.text)
+        with open(self.path + ".gz", "rb") as f:
+            self.assertEqual(gzip.decompress(f.read()), first.content)
+
+        again = self.client.get("/page", headers={
+            "Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]
+        })
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.content, b"")
+
+        plain = self.client.get("/page", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("content-encoding", plain.headers)
+        self.assertNotEqual(plain.headers["etag"], first.headers["etag"])
+
+    def test_large_files_bypass_memory_cache(self):
+        """Файли понад ліміт стрімляться з диска і не потрапляють у LRU."""
+        cache = FileCache(max_bytes=1024 * 1024, max_item_bytes=10)
+        original = serving.file_cache
+        serving.file_cache = cache
+        self.addCleanup(setattr, serving, "file_cache", original)
+
+        response = self.client.get("/page", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response.headers["content-length"]), os.path.getsize(self.path))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# tests/test_tokens.py
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import asyncio
+import threading
+
+from app.utils import TokenCounter
+from app.prompts import section_context, section_prompt
+from tests.helpers import make_generator
+
+
+class FakeTokenizer:
+    """Один токен на слово; запам'ятовує, що саме кодувалося."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts, add_special_tokens=False):
+        self.batches.append(list(texts))
+        return {"input_ids": [text.split() for text in texts]}
+
+
+class TestTokens(unittest.TestCase):
+
+    def test_static_fragments_are_encoded_once_in_batches(self):
+        """Спільні блоки промптів кодуються один раз, нові фрагменти — одним батчем."""
+        fake = FakeTokenizer()
+        counter = TokenCounter()
+        sections = [{"heading": h, "brief": f"About {h}"} for h in ("Intro", "Details", "Summary")]
+        context = section_context("Rust", "technical", "Title", sections)
+        prompts = [section_prompt(context, "technical", "Rust", s) for s in sections]
+
+        with patch("app.utils.tokenizer", MagicMock(get=MagicMock(return_value=fake))):
+            counts = counter.count_many(prompts)
+            again = counter.count(prompts[0])
+
+        self.assertEqual(counts, [len(p.split()) for p in prompts])
+        self.assertEqual(again, counts[0])
+        self.assertEqual(len(fake.batches), 1)  # другий виклик — лише з кешу
+        encoded = fake.batches[0]
+        self.assertEqual(len(encoded), len(set(encoded)))
+        self.assertLess(sum(len(f) for f in encoded), sum(len(p) for p in prompts))
+        self.assertGreater(counter.stats()["hits"], 0)
+
+        estimator = TokenCounter(mode="estimate")
+        with patch("app.utils.tokenizer") as tokenizer:
+            self.assertEqual(estimator.count("x" * 40), 10)
+        tokenizer.get.assert_not_called()
+
+    @patch('app.generator.count_tokens')
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_reported_usage_replaces_local_counting(self, mock_inference, mock_count):
+        """Якщо провайдер повернув usage, промпт не токенізується повторно."""
+        mock_inference.side_effect = [
+            {"generated_text": '{"title": "Usage", "sections": [{"heading": "Intro", "brief": "b"}]}',
+             "usage": {"prompt_tokens": 321, "completion_tokens": 40}},
+            {"generated_text": "### Intro\nText.", "usage": {"prompt_tokens": 654, "completion_tokens": 90}},
+        ]
+        record = asyncio.run(make_generator(self).generate_one_site(
+            "Usage", "casual", 0.7, 0.9, 1000, generate_image=False
+        ))
+        self.assertEqual((record["planning_tokens"], record["writing_tokens"]), (321, 654))
+        mock_count.assert_not_called()
+
+    @patch('app.generator.async_inference', new_callable=AsyncMock)
+    def test_tokenizer_loads_off_the_event_loop(self, mock_inference):
+        """Токенізатор завантажується й рахує не в потоці циклу подій."""
+        mock_inference.side_effect = [
+            {"generated_text": '{"title": "Offloaded", "sections": [{"heading": "Intro", "brief": "b"}]}'},
+            {"generated_text": "### Intro\nText."},
+        ]
+        threads = []
+
+        def encode(texts, add_special_tokens=False):
+            threads.append(threading.get_ident())
+            return {"input_ids": [[0] * len(text) for text in texts]}
+
+        with patch("app.utils.tokenizer") as tokenizer:
+            tokenizer.get.return_value = encode
+            asyncio.run(make_generator(self).generate_one_site(
+                "Tokenizer threads", "casual", 0.7, 0.9, 1000, generate_image=False
+            ))
+        self.assertTrue(threads)
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+if __name__ == '__main__':
+    unittest.main()